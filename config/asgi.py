@@ -5,6 +5,20 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Modo ASGI do sistema de ponto (PONTO_ASGI=1):
+    pip install uvicorn
+    PONTO_ASGI=1 WEB_CONCURRENCY=2 CACHE_BACKEND=django.core.cache.backends.redis.RedisCache \
+        CACHE_LOCATION=redis://... gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
+
+- /api/status/ e /api/registrar/ passam a usar core/views_async.py (ORM e cache
+  assíncronos), então cada worker atende centenas de requisições simultâneas;
+  as demais views continuam síncronas e rodam em thread, como no WSGI.
+- WhiteNoise sai do MIDDLEWARE (só síncrono); os estáticos do admin são servidos
+  pelo ASGIStaticFilesHandler abaixo.
+- Com mais de um worker o cache precisa ser compartilhado (manage.py check falha com LocMem).
+- Conexões persistentes ficam desligadas (CONN_MAX_AGE=0); em produção use um
+  pooler como o PgBouncer na frente do PostgreSQL.
 """
 
 import os
@@ -14,3 +28,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402 (settings só após o setup acima)
+
+if settings.PONTO_ASGI:
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    application = ASGIStaticFilesHandler(application)
@@ -46,7 +46,11 @@ INSTALLED_APPS = [
     'core',
 ]
 
+# Modo ASGI (config/asgi.py): views async de batida/status e middlewares todos assíncronos
+PONTO_ASGI = os.environ.get('PONTO_ASGI', '') == '1'
+
 MIDDLEWARE = [
+    'core.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,6 +60,10 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if PONTO_ASGI:
+    # WhiteNoise é só síncrono e obrigaria toda requisição a passar por uma thread;
+    # no modo ASGI os estáticos são servidos pelo handler de config/asgi.py
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'config.urls'
 
@@ -89,9 +97,63 @@ DATABASES = {
 }
 
 # Se o código perceber que tem um banco de dados na nuvem disponível, ele troca:
-db_from_env = dj_database_url.config(conn_max_age=600)
+# Conexões persistentes não são reaproveitadas em contexto async: no modo ASGI use um pooler (ex: PgBouncer)
+db_from_env = dj_database_url.config(conn_max_age=0 if PONTO_ASGI else 600)
 DATABASES['default'].update(db_from_env)
 
+# Réplica somente leitura opcional para relatórios/status (core/roteador.py).
+# Teste local com dois SQLite: migre o primário, copie o arquivo e aponte a réplica para a cópia:
+#   DATABASE_URL=sqlite:////tmp/primario.sqlite3 DATABASE_REPLICA_URL=sqlite:////tmp/replica.sqlite3
+if os.environ.get('DATABASE_REPLICA_URL'):
+    replica_from_env = dj_database_url.parse(os.environ['DATABASE_REPLICA_URL'], conn_max_age=0 if PONTO_ASGI else 600)
+    DATABASES['replica'] = {**replica_from_env, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['core.roteador.RoteadorReplica']
+
+# Por quantos segundos após uma batida o usuário lê do primário (atraso de replicação)
+PONTO_REPLICA_JANELA = int(os.environ.get('PONTO_REPLICA_JANELA', 30))
+
+# Cache (calendário das empresas, status do dia, ...)
+# Com vários workers, aponte para um backend compartilhado (ex: Redis/Memcached) via variáveis de ambiente
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# LocMem/Dummy: cada processo tem o seu cache (core/checks.py falha com WEB_CONCURRENCY > 1)
+PONTO_CACHE_COMPARTILHADO = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache',
+)
+# Processos servindo a aplicação (o gunicorn usa a mesma variável como padrão de -w)
+PONTO_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Batidas offline (/api/sincronizar/): até quantos dias atrás o app pode enviar e quantos
+# segundos de diferença no relógio do celular são aceitos para batidas "no futuro"
+PONTO_OFFLINE_JANELA_DIAS = int(os.environ.get('PONTO_OFFLINE_JANELA_DIAS', 7))
+PONTO_OFFLINE_TOLERANCIA_SEGUNDOS = int(os.environ.get('PONTO_OFFLINE_TOLERANCIA_SEGUNDOS', 300))
+
+# Fila de relatórios (core/relatorios.py): tarefa PROCESSANDO há mais que isso (segundos) é de um
+# worker que morreu e volta para a fila; depois de PONTO_RELATORIO_TENTATIVAS tentativas vira ERRO
+PONTO_RELATORIO_LEASE = int(os.environ.get('PONTO_RELATORIO_LEASE', 600))
+PONTO_RELATORIO_TENTATIVAS = int(os.environ.get('PONTO_RELATORIO_TENTATIVAS', 3))
+
+# Soma das horas no próprio banco (window functions) no painel da empresa
+PONTO_AGREGACAO_SQL = os.environ.get('PONTO_AGREGACAO_SQL', '') == '1'
+
+# Validade do token/usuário no cache da autenticação (core/autenticacao.py), em segundos
+PONTO_TOKEN_CACHE_TTL = int(os.environ.get('PONTO_TOKEN_CACHE_TTL', 300))
+
+# Meses fechados mantidos em RegistroPonto; os anteriores vão para ArquivoMensal (manage.py arquivar_pontos)
+PONTO_ARQUIVO_MESES = int(os.environ.get('PONTO_ARQUIVO_MESES', 12))
+
+# Cabeçalho do AFD exportado (core/exportacao.py): registro do programa no INPI e CNPJ do desenvolvedor
+PONTO_AFD_REGISTRO_INPI = os.environ.get('PONTO_AFD_REGISTRO_INPI', '')
+PONTO_AFD_CNPJ_DESENVOLVEDOR = os.environ.get('PONTO_AFD_CNPJ_DESENVOLVEDOR', '')
+
+# /api/metrics (Prometheus). Se definido, exige o header "Authorization: Bearer <token>"
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -128,6 +190,10 @@ STATIC_URL = 'static/'
 # Isso diz onde o WhiteNoise deve guardar os arquivos na nuvem
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Arquivos gerados (PDFs dos relatórios em background)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
 # Otimização do WhiteNoise
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
@@ -137,7 +203,7 @@ AUTH_USER_MODEL = 'core.Usuario'
 # Configuração do DRF para aceitar Login via App (Basic Auth) e ignorar CSRF
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',  # <--- ESSENCIAL PARA O APP
+        'core.autenticacao.TokenAuthenticationCache',  # <--- ESSENCIAL PARA O APP (token + usuário em cache)
         'rest_framework.authentication.SessionAuthentication', # <--- Importante para o navegador/Admin
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -1,11 +1,24 @@
-from django.contrib import admin
+import uuid
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Empresa, RegistroPonto, Escala, Feriado, Recesso
+from django.core.paginator import Paginator
+from django.db import connections
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
+from . import banco_horas, importacao
+from .apuracao import formatar_minutos
+from .models import Usuario, Empresa, LocalTrabalho, RegistroPonto, Escala, Feriado, Recesso, TarefaRelatorio, ArquivoMensal, Anomalia
 
 # --- CONFIGURAÇÃO DE ESCALA ---
 @admin.register(Escala)
 class EscalaAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'carga_horaria_diaria', 'trabalha_sabado', 'trabalha_domingo')
+    list_display = ('nome', 'carga_horaria_diaria', 'trabalha_sabado', 'trabalha_domingo', 'padrao_ciclo', 'inicio_ciclo')
     list_filter = ('trabalha_sabado', 'trabalha_domingo')
     search_fields = ('nome',)
 
@@ -23,16 +36,25 @@ class RecessoAdmin(admin.ModelAdmin):
     list_filter = ('empresa',)
     search_fields = ('nome',)    
 
+# --- CONFIGURAÇÃO DE LOCAIS DE TRABALHO ---
+@admin.register(LocalTrabalho)
+class LocalTrabalhoAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'empresa', 'latitude', 'longitude', 'raio_permitido_metros', 'ativo')
+    list_filter = ('empresa', 'ativo')
+    search_fields = ('nome',)
+
 # --- CONFIGURAÇÃO DE USUÁRIO ---
 class UsuarioAdmin(UserAdmin):
     model = Usuario
     
-    list_display = ('username', 'email', 'empresa', 'escala', 'usar_configuracao_individual', 'is_staff')
+    list_display = ('username', 'email', 'empresa', 'escala', 'banco_de_horas', 'usar_configuracao_individual', 'is_staff')
     list_filter = ('empresa', 'escala', 'usar_configuracao_individual', 'is_staff')
+    list_select_related = ('empresa', 'escala')
+    search_fields = UserAdmin.search_fields + ('cpf',)
 
     fieldsets = UserAdmin.fieldsets + (
         ('Informações Profissionais', {
-            'fields': ('empresa', 'tipo', 'carga_horaria_diaria', 'data_inicio_apuracao', 'trabalho_hibrido')
+            'fields': ('empresa', 'tipo', 'cpf', 'carga_horaria_diaria', 'data_inicio_apuracao', 'trabalho_hibrido')
         }),
         ('Configuração de Escala (Grupo)', {
             'fields': ('escala',),
@@ -48,10 +70,131 @@ class UsuarioAdmin(UserAdmin):
         }),
     )
 
+    def get_changelist_instance(self, request):
+        # Saldos da página inteira em uma query (não uma por linha)
+        changelist = super().get_changelist_instance(request)
+        changelist.result_list = list(changelist.result_list)
+        saldos = banco_horas.saldos_atuais([usuario.pk for usuario in changelist.result_list])
+        for usuario in changelist.result_list:
+            usuario.saldo_atual = saldos.get(usuario.pk)
+        return changelist
+
+    @admin.display(description='Banco de Horas')
+    def banco_de_horas(self, obj):
+        # Último dia materializado (atualizado quando o funcionário abre o histórico)
+        if not getattr(obj, 'saldo_atual', None):
+            return '-'
+        saldo, data = obj.saldo_atual
+        return f"{formatar_minutos(saldo)} (até {data.strftime('%d/%m/%Y')})"
+
 # --- CONFIGURAÇÃO DE PONTO ---
+class ImportarRelogioForm(forms.Form):
+    empresa = forms.ModelChoiceField(queryset=Empresa.objects.all())
+    arquivo = forms.FileField(help_text='AFD (.txt) ou CSV gerado pelo relógio de ponto')
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Sem filtros, usa a estimativa de linhas do PostgreSQL (pg_class.reltuples, mantida
+    pelo autovacuum) em vez de COUNT(*), que percorre a tabela inteira a cada página.
+    Com filtros, ou em outros bancos, conta normalmente.
+    """
+    MINIMO_PARA_ESTIMAR = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        conexao = connections[queryset.db]
+        if conexao.vendor == 'postgresql' and not queryset.query.where:
+            with conexao.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                linha = cursor.fetchone()
+            if linha and linha[0] >= self.MINIMO_PARA_ESTIMAR:
+                return int(linha[0])
+        return super().count
+
+
+class UsuarioAutocompleteFilter(admin.SimpleListFilter):
+    """Filtro por usuário com busca (autocomplete do admin) em vez de listar todos os usuários."""
+    title = 'usuário'
+    parameter_name = 'usuario'
+    template = 'admin/core/filtro_autocomplete.html'
+
+    def __init__(self, request, params, model, model_admin):
+        self.admin_site = model_admin.admin_site
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                usuario_id = uuid.UUID(self.value())
+            except ValueError:
+                # Mesmo tratamento dos filtros do admin: volta para a lista com ?e=1, sem 500
+                raise IncorrectLookupParameters(f'Usuário inválido: {self.value()}')
+            return queryset.filter(usuario_id=usuario_id)
+        return queryset
+
+    def choices(self, changelist):
+        widget = AutocompleteSelect(RegistroPonto._meta.get_field('usuario'), self.admin_site)
+        campo = forms.ModelChoiceField(queryset=Usuario.objects.all(), widget=widget, required=False)
+        valor = self.value() or ''
+        yield {
+            'selected': bool(valor),
+            'limpar': changelist.get_query_string(remove=[self.parameter_name]),
+            'parametro': self.parameter_name,
+            'campo': campo.widget.render(self.parameter_name, valor, attrs={'id': 'filtro-usuario'}),
+        }
+
+
 class RegistroPontoAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'tipo_formatado', 'data_hora_local', 'localizacao_valida')
-    list_filter = ('usuario', 'tipo', 'data_hora', 'localizacao_valida')
+    list_filter = (UsuarioAutocompleteFilter, 'tipo', 'localizacao_valida')
+    list_select_related = ('usuario',)
+    autocomplete_fields = ('usuario',)
+    # data_local: sem conversão de fuso no SQL das datas da navegação
+    date_hierarchy = 'data_local'
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(RegistroPonto._meta.get_field('usuario'), self.admin_site).media
+
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar_relogio), name='core_registroponto_importar'),
+        ] + super().get_urls()
+
+    def importar_relogio(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:core_registroponto_changelist')
+        form = ImportarRelogioForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            enviado = form.cleaned_data['arquivo']
+            try:
+                resultado = importacao.importar(
+                    enviado, form.cleaned_data['empresa'], importacao.detectar_formato(enviado.name),
+                    origem=f'Importado do relógio ({enviado.name})',
+                )
+            except importacao.ErroImportacao as e:
+                form.add_error('arquivo', str(e))
+            else:
+                messages.success(request, f'Importação concluída: {resultado}.')
+                if resultado.sem_usuario:
+                    messages.warning(request, 'CPFs sem usuário na empresa: ' + ', '.join(sorted(resultado.sem_usuario)))
+                return redirect('admin:core_registroponto_changelist')
+        return TemplateResponse(request, 'admin/core/registroponto/importar.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar arquivo do relógio',
+            'form': form,
+        })
     
     def data_hora_local(self, obj):
         from django.utils import timezone
@@ -62,6 +205,42 @@ class RegistroPontoAdmin(admin.ModelAdmin):
         return obj.get_tipo_display()
     tipo_formatado.short_description = 'Tipo'
 
+# --- FILA DE RELATÓRIOS ---
+@admin.register(TarefaRelatorio)
+class TarefaRelatorioAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'data_inicio', 'data_fim', 'status', 'tentativas', 'criado_em', 'concluido_em')
+    list_filter = ('status',)
+    readonly_fields = ('chave', 'arquivo', 'erro', 'iniciado_em', 'concluido_em')
+
+# --- ARQUIVO DE PERÍODOS FECHADOS (somente leitura: gerado por manage.py arquivar_pontos) ---
+@admin.register(ArquivoMensal)
+class ArquivoMensalAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'competencia', 'qtd_registros', 'dias_com_registro', 'minutos_trabalhados')
+    list_filter = ('competencia',)
+    search_fields = ('usuario__username',)
+    exclude = ('batidas',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# --- ANOMALIAS (somente leitura: geradas por manage.py verificar_anomalias) ---
+@admin.register(Anomalia)
+class AnomaliaAdmin(admin.ModelAdmin):
+    list_display = ('data', 'usuario', 'empresa', 'tipo', 'detalhe')
+    list_filter = ('tipo', 'empresa')
+    list_select_related = ('usuario', 'empresa')
+    search_fields = ('usuario__username',)
+    date_hierarchy = 'data'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Registros Finais
 admin.site.register(Usuario, UsuarioAdmin)
 admin.site.register(Empresa)
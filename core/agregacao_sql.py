@@ -0,0 +1,95 @@
+"""
+Soma das horas trabalhadas por usuário/dia dentro do banco, com window functions.
+
+Em vez de trazer cada batida para o Python, o banco:
+1. usa o dia local já gravado em data_local (índice usuario, data_local, data_hora),
+2. numera as batidas de cada (usuario, dia) e pega a próxima com LEAD(),
+3. soma (próxima - atual) das batidas ímpares (1ª-2ª, 3ª-4ª, ...),
+e devolve uma linha por usuário/dia. A regra de pareamento é a mesma de
+apuracao.apurar_periodo, então os resultados são idênticos.
+
+Funciona em SQLite (padrão) e PostgreSQL (dj_database_url). Em outros bancos suportado()
+é False e o painel soma em Python (manage.py check avisa se PONTO_AGREGACAO_SQL estiver ligado).
+"""
+import uuid
+from datetime import date
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+from django.db.models import Count, F, Window
+from django.db.models.functions import Lead, RowNumber
+
+from .models import RegistroPonto
+
+# Microssegundos do texto que o Django grava no SQLite ('AAAA-MM-DD HH:MM:SS[.ffffff]')
+_MICROS_SQLITE = "CAST(substr({0} || '.000000', 21, 6) AS INTEGER)"
+
+# Diferença exata, em microssegundos inteiros, entre duas colunas datetime, por banco.
+# Sem ponto flutuante: o corte em minutos bate com o do Python mesmo perto da virada do minuto.
+DIFERENCA_MICROSSEGUNDOS = {
+    # julianday() e strftime('%f') param nos milissegundos: segundos inteiros + microssegundos do texto
+    'sqlite': ("(CAST(strftime('%%s', proxima) AS INTEGER) - CAST(strftime('%%s', data_hora) AS INTEGER)) * 1000000"
+               f" + {_MICROS_SQLITE.format('proxima')} - {_MICROS_SQLITE.format('data_hora')}"),
+    'postgresql': "CAST(EXTRACT(EPOCH FROM (proxima - data_hora)) * 1000000 AS BIGINT)",
+}
+MICROSSEGUNDOS_POR_MINUTO = 60 * 1000000
+
+
+def _conexao():
+    # Mesmo banco que o ORM usaria (réplica dentro de leitura_replica, ver core/roteador.py)
+    alias = router.db_for_read(RegistroPonto)
+    return alias, connections[alias]
+
+
+def suportado():
+    return _conexao()[1].vendor in DIFERENCA_MICROSSEGUNDOS
+
+
+def _batidas_numeradas(usuario_ids, inicio, fim):
+    particao = {'partition_by': [F('usuario_id'), F('data_local')], 'order_by': F('data_hora').asc()}
+    return RegistroPonto.objects.filter(
+        usuario_id__in=usuario_ids,
+        data_local__gte=inicio,
+        data_local__lte=fim,
+    ).order_by().annotate(
+        dia=F('data_local'),
+        ordem=Window(RowNumber(), **particao),
+        total=Window(Count('id'), partition_by=particao['partition_by']),
+        proxima=Window(Lead('data_hora'), **particao),
+    ).values('usuario_id', 'data_hora', 'tipo', 'dia', 'ordem', 'total', 'proxima')
+
+
+def minutos_por_dia(usuario_ids, inicio, fim):
+    """
+    Retorna {usuario_id: {data: (minutos_trabalhados, tipo_da_ultima_batida)}}
+    pronto para apuracao.apurar_periodo_resumido.
+    """
+    usuario_ids = list(usuario_ids)
+    resultado = {}
+    if not usuario_ids:
+        return resultado
+
+    alias, connection = _conexao()
+    diferenca = DIFERENCA_MICROSSEGUNDOS.get(connection.vendor)
+    if diferenca is None:
+        raise ImproperlyConfigured(f"Agregação SQL não suportada para o banco '{connection.vendor}' (veja suportado()).")
+
+    interna, params = _batidas_numeradas(usuario_ids, inicio, fim).query.get_compiler(using=alias).as_sql()
+    sql = f"""
+        SELECT usuario_id, dia,
+               SUM(CASE WHEN ordem %% 2 = 1 AND proxima IS NOT NULL THEN {diferenca} ELSE 0 END) AS microssegundos,
+               MAX(CASE WHEN ordem = total THEN tipo END) AS ultimo_tipo
+        FROM ({interna}) AS batidas
+        GROUP BY usuario_id, dia
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for usuario_id, dia, microssegundos, ultimo_tipo in cursor.fetchall():
+            # SQLite devolve UUID e data como texto
+            if not isinstance(usuario_id, uuid.UUID):
+                usuario_id = uuid.UUID(str(usuario_id))
+            if isinstance(dia, str):
+                dia = date.fromisoformat(dia)
+            resultado.setdefault(usuario_id, {})[dia] = (int(microssegundos or 0) // MICROSSEGUNDOS_POR_MINUTO,
+                                                         ultimo_tipo)
+    return resultado
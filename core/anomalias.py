@@ -0,0 +1,128 @@
+"""
+Varredura de anomalias de ponto (manage.py verificar_anomalias, normalmente toda noite).
+
+Para cada usuário ativo e cada dia do período:
+- IMPAR: número ímpar de batidas;
+- SEM_SAIDA: o dia termina sem SAIDA;
+- FORA_DE_ORDEM: a sequência de tipos não segue ENTRADA -> (SAIDA_ALMOCO -> VOLTA_ALMOCO)* -> SAIDA;
+- FALTA: dia de trabalho (escala + calendário da empresa) sem nenhuma batida.
+
+Uma única query lê as batidas do período em ordem (usuario, data_local, data_hora), em blocos,
+e os dias são agrupados em uma passada: o custo acompanha o número de batidas. Para as faltas,
+os dias de trabalho são calculados uma vez por (jornada, empresa) e cada usuário só é
+percorrido dia a dia quando tem menos dias com batida do que dias de trabalho.
+
+Meses já arquivados (core/arquivo.py) não são varridos: são períodos fechados e as batidas
+deles não estão mais em RegistroPonto (sem isso, todo dia arquivado viraria FALTA).
+"""
+import bisect
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+
+from .apuracao import compilar_jornada, data_inicio
+from .calendario import obter_calendario
+from .models import Anomalia, RegistroPonto, Usuario
+
+LOTE_PADRAO = 5000
+
+# Tipo anterior -> tipos que podem vir em seguida (None = primeira batida do dia)
+PROXIMOS = {
+    None: {'ENTRADA'},
+    'ENTRADA': {'SAIDA_ALMOCO', 'SAIDA'},
+    'SAIDA_ALMOCO': {'VOLTA_ALMOCO'},
+    'VOLTA_ALMOCO': {'SAIDA_ALMOCO', 'SAIDA'},
+    'SAIDA': {'ENTRADA'},
+}
+ABREVIACOES = {'ENTRADA': 'E', 'SAIDA_ALMOCO': 'SA', 'VOLTA_ALMOCO': 'VA', 'SAIDA': 'S'}
+
+
+def anomalias_do_dia(tipos):
+    """Tipos de anomalia de um dia com batidas, dados os tipos em ordem cronológica."""
+    encontradas = []
+    if len(tipos) % 2:
+        encontradas.append('IMPAR')
+    if tipos[-1] != 'SAIDA':
+        encontradas.append('SEM_SAIDA')
+    if any(atual not in PROXIMOS[anterior] for anterior, atual in zip((None,) + tipos, tipos)):
+        encontradas.append('FORA_DE_ORDEM')
+    return encontradas
+
+
+def _dias_de_trabalho(jornada, calendario, inicio, fim):
+    dias = []
+    cursor = inicio
+    while cursor <= fim:
+        if jornada.meta_do_dia(cursor) and calendario.get(cursor) is None:
+            dias.append(cursor)
+        cursor += timedelta(days=1)
+    return dias
+
+
+def varrer(inicio, fim, empresa_id=None, lote=LOTE_PADRAO):
+    """Lista de Anomalia (não salvas) do período, para todos os usuários ativos com empresa."""
+    usuarios = Usuario.objects.filter(is_active=True, empresa__isnull=False).select_related('escala')
+    if empresa_id:
+        usuarios = usuarios.filter(empresa_id=empresa_id)
+    usuarios = {u.pk: u for u in usuarios}
+
+    # 1. Batidas do período em uma query, agrupadas por (usuário, dia) numa única passada
+    registros = RegistroPonto.objects.filter(data_local__gte=inicio, data_local__lte=fim)
+    if empresa_id:
+        registros = registros.filter(usuario__empresa_id=empresa_id)
+    linhas = registros.order_by('usuario_id', 'data_local', 'data_hora').values_list(
+        'usuario_id', 'data_local', 'tipo'
+    ).iterator(chunk_size=lote)
+
+    anomalias = []
+    dias_com_batida = defaultdict(set)
+    for (usuario_id, dia), grupo in groupby(linhas, key=itemgetter(0, 1)):
+        usuario = usuarios.get(usuario_id)
+        if usuario is None:
+            continue
+        tipos = tuple(tipo for _, _, tipo in grupo)
+        dias_com_batida[usuario_id].add(dia)
+        for tipo in anomalias_do_dia(tipos):
+            anomalias.append(Anomalia(empresa_id=usuario.empresa_id, usuario=usuario, data=dia, tipo=tipo,
+                                      detalhe=' '.join(ABREVIACOES[t] for t in tipos)))
+
+    # 2. Faltas: dias de trabalho de cada regra (jornada + calendário) calculados uma vez
+    calendarios = {}
+    dias_trabalho = {}
+    for usuario in usuarios.values():
+        jornada = compilar_jornada(usuario)
+        chave = (jornada, usuario.empresa_id)
+        if chave not in dias_trabalho:
+            if usuario.empresa_id not in calendarios:
+                calendarios[usuario.empresa_id] = obter_calendario(usuario.empresa_id)
+            lista = _dias_de_trabalho(jornada, calendarios[usuario.empresa_id], inicio, fim)
+            dias_trabalho[chave] = (lista, frozenset(lista))
+        esperados, conjunto = dias_trabalho[chave]
+        primeiro = data_inicio(usuario)
+        if usuario.arquivado_ate and usuario.arquivado_ate >= primeiro:
+            primeiro = usuario.arquivado_ate + timedelta(days=1)
+        a_partir = bisect.bisect_left(esperados, primeiro)
+        presentes = dias_com_batida.get(usuario.pk, set())
+        # Conta só os dias com batida (proporcional às batidas); percorre o período só se faltar algum
+        if sum(1 for d in presentes if d >= primeiro and d in conjunto) == len(esperados) - a_partir:
+            continue
+        anomalias.extend(
+            Anomalia(empresa_id=usuario.empresa_id, usuario=usuario, data=dia, tipo='FALTA')
+            for dia in esperados[a_partir:] if dia not in presentes
+        )
+    return anomalias
+
+
+def registrar(inicio, fim, empresa_id=None, lote=LOTE_PADRAO):
+    """Substitui as anomalias do período pelo resultado de uma nova varredura. Retorna as anomalias gravadas."""
+    anomalias = varrer(inicio, fim, empresa_id, lote)
+    antigas = Anomalia.objects.filter(data__gte=inicio, data__lte=fim)
+    if empresa_id:
+        antigas = antigas.filter(empresa_id=empresa_id)
+    with transaction.atomic():
+        antigas.delete()
+        Anomalia.objects.bulk_create(anomalias, batch_size=1000)
+    return anomalias
@@ -0,0 +1,216 @@
+"""
+Motor único de apuração de jornada.
+
+Usado pelo histórico (JSON), pelo PDF e pelo banco de horas materializado:
+- resolver_jornada(): regras do usuário compiladas em uma Jornada (meta de qualquer data em O(1)),
+  guardada no cache e descartada pelos signals quando a escala ou a configuração individual mudam.
+- apurar_periodo(): percorre o período em uma única passada linear sobre as batidas
+  já ordenadas (lista ou iterador) e devolve um DiaApurado (registro compacto) por dia.
+"""
+import heapq
+from datetime import date, timedelta
+from operator import itemgetter
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import arquivo
+from .calendario import obter_calendario
+from .models import RegistroPonto
+
+DATA_INICIO_PADRAO = date(2025, 1, 1)  # Data de segurança antiga
+META_PADRAO = 480  # 8 horas em minutos
+DIAS_TRABALHO_PADRAO = (True, True, True, True, True, False, False)  # Seg-Sex
+SEGUNDA = date(2024, 1, 1).toordinal()  # Âncora do ciclo semanal (posição 0 = segunda-feira)
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class Jornada(NamedTuple):
+    """Escala compilada: meta (minutos) de cada posição do ciclo, a partir do dia `ancora` (ordinal)."""
+    metas: tuple
+    ancora: int
+
+    def meta_do_dia(self, dia):
+        return self.metas[(dia.toordinal() - self.ancora) % len(self.metas)]
+
+
+class DiaApurado(NamedTuple):
+    data: date
+    tipo_dia: str              # TRABALHO, FOLGA, FERIADO, RECESSO ou FALTA
+    minutos_trabalhados: int
+    minutos_meta: int
+    batidas: tuple             # ((hora_local, tipo), ...) em ordem cronológica
+    em_andamento: bool         # Hoje, ainda sem SAIDA: saldo não entra no banco
+
+    @property
+    def saldo_dia(self):
+        return self.minutos_trabalhados - self.minutos_meta
+
+    @property
+    def saldo_contabilizado(self):
+        return 0 if self.em_andamento else self.saldo_dia
+
+    @property
+    def eh_folga(self):
+        return self.tipo_dia in ('FERIADO', 'RECESSO')
+
+
+def data_inicio(usuario):
+    return usuario.data_inicio_apuracao or DATA_INICIO_PADRAO
+
+
+def formatar_minutos(minutos, sinal=True):
+    """Formata minutos como HH:MM (com +/- quando sinal=True)."""
+    prefixo = ("+" if minutos >= 0 else "-") if sinal else ""
+    minutos_abs = abs(minutos)
+    return f"{prefixo}{int(minutos_abs//60):02d}:{int(minutos_abs%60):02d}"
+
+
+def _minutos(duracao):
+    return int(duracao.total_seconds() // 60)
+
+
+def compilar_jornada(usuario):
+    """Dias de trabalho e meta diária: configuração individual > escala (semanal ou cíclica) > padrão Seg-Sex/8h."""
+    ciclo = DIAS_TRABALHO_PADRAO
+    ancora = SEGUNDA
+    meta = META_PADRAO
+
+    if usuario.usar_configuracao_individual:
+        ciclo = (usuario.trab_seg, usuario.trab_ter, usuario.trab_qua, usuario.trab_qui,
+                 usuario.trab_sex, usuario.trab_sab, usuario.trab_dom)
+    elif usuario.escala:
+        esc = usuario.escala
+        if esc.padrao_ciclo and esc.inicio_ciclo:
+            ciclo = tuple(c == '1' for c in esc.padrao_ciclo)
+            ancora = esc.inicio_ciclo.toordinal()
+        else:
+            ciclo = (esc.trabalha_segunda, esc.trabalha_terca, esc.trabalha_quarta, esc.trabalha_quinta,
+                     esc.trabalha_sexta, esc.trabalha_sabado, esc.trabalha_domingo)
+        if esc.carga_horaria_diaria:
+            meta = _minutos(esc.carga_horaria_diaria)
+
+    if usuario.carga_horaria_diaria:
+        meta = _minutos(usuario.carga_horaria_diaria)
+
+    return Jornada(tuple(meta if trabalha else 0 for trabalha in ciclo), ancora)
+
+
+def _chave_jornada(usuario_id):
+    return f'jornada:{usuario_id}'
+
+
+def resolver_jornada(usuario):
+    chave = _chave_jornada(usuario.pk)
+    jornada = cache.get(chave)
+    if jornada is None:
+        jornada = compilar_jornada(usuario)
+        cache.set(chave, jornada, CACHE_TIMEOUT)
+    return jornada
+
+
+def invalidar_jornadas(usuario_ids):
+    cache.delete_many([_chave_jornada(pk) for pk in usuario_ids])
+
+
+def _batidas_vivas(usuario, inicio, fim):
+    return RegistroPonto.objects.filter(
+        usuario=usuario,
+        data_local__gte=inicio,
+        data_local__lte=fim,
+    ).order_by('data_hora').values_list('data_hora', 'tipo')
+
+
+def _com_arquivo(usuario, inicio, fim, vivas):
+    """Intercala as batidas dos meses arquivados (core/arquivo.py) com as da tabela viva."""
+    if not arquivo.cobre(usuario, inicio):
+        return vivas
+    arquivadas = arquivo.batidas_arquivadas(usuario.pk, inicio, min(fim, usuario.arquivado_ate))
+    return heapq.merge(arquivadas, vivas, key=itemgetter(0))
+
+
+def carregar_batidas(usuario, inicio, fim):
+    """Batidas do período como (data_hora, tipo), em ordem cronológica (inclusive as arquivadas)."""
+    return _com_arquivo(usuario, inicio, fim, _batidas_vivas(usuario, inicio, fim))
+
+
+def iterar_batidas(usuario, inicio, fim, chunk_size=2000):
+    """Como carregar_batidas, mas lendo do banco em blocos (memória constante em períodos longos)."""
+    return _com_arquivo(usuario, inicio, fim, _batidas_vivas(usuario, inicio, fim).iterator(chunk_size=chunk_size))
+
+
+def _montar_dia(cursor, minutos, batidas, ultimo_tipo, hoje, jornada, calendario):
+    tipo_dia = calendario.get(cursor)
+    meta_dia = 0
+    if tipo_dia is None:
+        meta_dia = jornada.meta_do_dia(cursor)
+        if meta_dia == 0:
+            tipo_dia = 'FOLGA'
+        elif minutos == 0 and cursor < hoje:
+            tipo_dia = 'FALTA'
+        else:
+            tipo_dia = 'TRABALHO'
+
+    # Regra para HOJE: só entra no saldo depois da SAIDA
+    em_andamento = cursor == hoje and ultimo_tipo != 'SAIDA'
+
+    return DiaApurado(cursor, tipo_dia, minutos, meta_dia, batidas, em_andamento)
+
+
+def apurar_periodo(usuario, inicio, fim, hoje=None, jornada=None, batidas=None, calendario=None):
+    """
+    Gera um DiaApurado para cada dia entre inicio e fim (inclusive).
+
+    `batidas` deve estar em ordem cronológica; é consumida uma única vez, sem montar
+    dicionário por dia, então pode ser um iterador (ver iterar_batidas). Jornada, batidas
+    e calendário podem ser passados prontos quando o chamador já os tiver
+    (ex.: vários usuários da mesma empresa).
+    """
+    hoje = hoje or timezone.localdate()
+    jornada = jornada or resolver_jornada(usuario)
+    if batidas is None:
+        batidas = carregar_batidas(usuario, inicio, fim)
+    if calendario is None:
+        calendario = obter_calendario(usuario.empresa_id)
+
+    # Consumo preguiçoso: funciona tanto com listas quanto com iteradores em blocos
+    locais = ((timezone.localtime(data_hora), tipo) for data_hora, tipo in batidas)
+    proxima = next(locais, None)
+    while proxima is not None and proxima[0].date() < inicio:
+        proxima = next(locais, None)
+
+    cursor = inicio
+    while cursor <= fim:
+        do_dia = []
+        while proxima is not None and proxima[0].date() == cursor:
+            do_dia.append(proxima)
+            proxima = next(locais, None)
+        do_dia = tuple(do_dia)
+
+        # Soma em timedelta (inteiro, em microssegundos): sem arredondamento de float na virada do minuto
+        trabalhado = timedelta()
+        for i in range(0, len(do_dia) - 1, 2):
+            trabalhado += do_dia[i + 1][0] - do_dia[i][0]
+        minutos = trabalhado // arquivo.UM_MINUTO
+
+        ultimo_tipo = do_dia[-1][1] if do_dia else None
+        yield _montar_dia(cursor, minutos, do_dia, ultimo_tipo, hoje, jornada, calendario)
+        cursor += timedelta(days=1)
+
+
+def apurar_periodo_resumido(usuario, inicio, fim, resumo, hoje=None, jornada=None, calendario=None):
+    """
+    Mesma apuração, a partir de minutos já somados por dia (ver core/agregacao_sql.py).
+    `resumo` é {data: (minutos, ultimo_tipo)}; os DiaApurado saem com `batidas` vazio.
+    """
+    hoje = hoje or timezone.localdate()
+    jornada = jornada or resolver_jornada(usuario)
+    if calendario is None:
+        calendario = obter_calendario(usuario.empresa_id)
+
+    cursor = inicio
+    while cursor <= fim:
+        minutos, ultimo_tipo = resumo.get(cursor, (0, None))
+        yield _montar_dia(cursor, minutos, (), ultimo_tipo, hoje, jornada, calendario)
+        cursor += timedelta(days=1)
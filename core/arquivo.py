@@ -0,0 +1,181 @@
+"""
+Arquivamento de períodos fechados: RegistroPonto -> ArquivoMensal.
+
+Cada mês fechado de um usuário vira uma linha com as batidas empacotadas
+(8 bytes de instante em µs + 1 byte de tipo por batida) e os totais do mês.
+Saem do arquivo: coordenadas, observação, id_cliente e auditoria de cada batida;
+o que a apuração usa (instante e tipo) é preservado sem perda.
+
+Usuario.arquivado_ate diz até que dia existe arquivo, então períodos recentes
+(status, mês atual) não fazem nenhuma query extra.
+"""
+import struct
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.db import connections, router, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from . import autenticacao
+from .models import ArquivoMensal, RegistroPonto, Usuario
+
+TIPOS = tuple(tipo for tipo, _ in RegistroPonto.TIPO_BATIDA)
+CODIGOS = {tipo: i for i, tipo in enumerate(TIPOS)}
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+UM_MINUTO = timedelta(minutes=1)
+# Ids por DELETE (o SQLite antigo aceita até 999 parâmetros por comando)
+LOTE_EXCLUSAO = 500
+
+
+# --- FORMATO ---
+def empacotar(batidas):
+    """[(data_hora, tipo), ...] -> bytes. Instantes em µs desde 1970 seguidos dos códigos de tipo."""
+    n = len(batidas)
+    instantes = [(data_hora - EPOCA) // timedelta(microseconds=1) for data_hora, _ in batidas]
+    return struct.pack(f'<{n}q{n}B', *instantes, *(CODIGOS[tipo] for _, tipo in batidas))
+
+
+def desempacotar(dados):
+    dados = bytes(dados)
+    n = len(dados) // 9
+    valores = struct.unpack(f'<{n}q{n}B', dados)
+    return [(EPOCA + timedelta(microseconds=valores[i]), TIPOS[valores[n + i]]) for i in range(n)]
+
+
+def resumir(batidas):
+    """{data_local: (minutos, ultimo_tipo)} com o pareamento de apuracao.apurar_periodo (1ª-2ª, 3ª-4ª, ...)."""
+    por_dia = defaultdict(list)
+    for data_hora, tipo in batidas:
+        local = timezone.localtime(data_hora)
+        por_dia[local.date()].append((local, tipo))
+    resumo = {}
+    for dia, do_dia in por_dia.items():
+        trabalhado = sum((do_dia[i + 1][0] - do_dia[i][0] for i in range(0, len(do_dia) - 1, 2)), timedelta())
+        resumo[dia] = (trabalhado // UM_MINUTO, do_dia[-1][1])
+    return resumo
+
+
+# --- LEITURA (motor de apuração) ---
+def _competencias(inicio, fim):
+    return ArquivoMensal.objects.filter(competencia__gte=inicio.replace(day=1), competencia__lte=fim)
+
+
+def _no_periodo(batidas, inicio, fim):
+    return [(d, t) for d, t in batidas if inicio <= timezone.localtime(d).date() <= fim]
+
+
+def batidas_arquivadas(usuario_id, inicio, fim):
+    """Batidas arquivadas do usuário com data local entre inicio e fim, em ordem cronológica."""
+    batidas = []
+    for dados in _competencias(inicio, fim).filter(usuario_id=usuario_id).values_list('batidas', flat=True):
+        batidas.extend(desempacotar(dados))
+    return _no_periodo(batidas, inicio, fim)
+
+
+def batidas_arquivadas_em_lote(usuario_ids, inicio, fim):
+    """Como batidas_arquivadas, para vários usuários em uma única query: {usuario_id: [...]}."""
+    resultado = defaultdict(list)
+    for usuario_id, dados in _competencias(inicio, fim).filter(
+        usuario_id__in=usuario_ids
+    ).values_list('usuario_id', 'batidas'):
+        resultado[usuario_id].extend(desempacotar(dados))
+    return {pk: _no_periodo(batidas, inicio, fim) for pk, batidas in resultado.items()}
+
+
+def versao(usuario_id, inicio, fim):
+    """Quantidade e última alteração das batidas arquivadas no período (cache de relatórios)."""
+    return _competencias(inicio, fim).filter(usuario_id=usuario_id).aggregate(
+        n=Sum('qtd_registros'), ultima=Max('atualizado_em'),
+    )
+
+
+def cobre(usuario, inicio):
+    return usuario.arquivado_ate is not None and inicio <= usuario.arquivado_ate
+
+
+# --- ESCRITA (comando arquivar_pontos) ---
+def limite_fechamento(meses, hoje=None):
+    """Primeiro dia ainda vivo: o início do mês `meses` meses antes do atual."""
+    hoje = hoje or timezone.localdate()
+    total = hoje.year * 12 + hoje.month - 1 - meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _apagar_vivas(pks, lote=LOTE_EXCLUSAO):
+    """
+    DELETE em SQL puro (QuerySet.delete() dispararia post_delete para cada batida), só das
+    batidas lidas: uma batida retroativa gravada durante o arquivamento (sincronização
+    offline, importação) continua viva em vez de sumir sem ter sido arquivada.
+    """
+    conexao = connections[router.db_for_write(RegistroPonto)]
+    meta = RegistroPonto._meta
+    tabela, coluna = conexao.ops.quote_name(meta.db_table), conexao.ops.quote_name(meta.pk.column)
+    with conexao.cursor() as cursor:
+        for i in range(0, len(pks), lote):
+            parte = [meta.pk.get_db_prep_value(pk, conexao) for pk in pks[i:i + lote]]
+            cursor.execute(f'DELETE FROM {tabela} WHERE {coluna} IN ({", ".join(["%s"] * len(parte))})', parte)
+
+
+def arquivar_usuario(usuario, limite):
+    """
+    Move as batidas do usuário com data local anterior a `limite` (1º dia de um mês) para o arquivo.
+    Meses já arquivados que receberam batidas novas (ex: ajuste do admin) são reempacotados.
+    Retorna (meses, batidas) arquivados.
+    """
+    with transaction.atomic():
+        vivas = RegistroPonto.objects.filter(usuario=usuario, data_local__lt=limite)
+        por_mes = defaultdict(list)
+        pks = []
+        for pk, data_hora, tipo, data_local in vivas.order_by('data_hora').values_list(
+            'pk', 'data_hora', 'tipo', 'data_local'
+        ):
+            por_mes[data_local.replace(day=1)].append((data_hora, tipo))
+            pks.append(pk)
+        if not por_mes:
+            return 0, 0
+
+        existentes = {
+            a.competencia: a for a in
+            ArquivoMensal.objects.select_for_update().filter(usuario=usuario, competencia__in=list(por_mes))
+        }
+        novos = []
+        total = 0
+        for competencia, batidas in por_mes.items():
+            total += len(batidas)
+            arquivo = existentes.get(competencia)
+            if arquivo:
+                batidas = sorted(desempacotar(arquivo.batidas) + batidas, key=lambda b: b[0])
+            resumo = resumir(batidas)
+            campos = {
+                'batidas': empacotar(batidas),
+                'qtd_registros': len(batidas),
+                'dias_com_registro': len(resumo),
+                'minutos_trabalhados': sum(minutos for minutos, _ in resumo.values()),
+            }
+            if arquivo:
+                for campo, valor in campos.items():
+                    setattr(arquivo, campo, valor)
+                arquivo.save()
+            else:
+                novos.append(ArquivoMensal(usuario=usuario, competencia=competencia, **campos))
+        ArquivoMensal.objects.bulk_create(novos)
+
+        # DELETE direto, sem signals: as batidas continuam existindo (no arquivo), então
+        # o banco de horas e o status não mudam e não devem ser recalculados
+        _apagar_vivas(pks)
+
+        arquivado_ate = max(d for d in (limite - timedelta(days=1), usuario.arquivado_ate) if d)
+        Usuario.objects.filter(pk=usuario.pk).update(arquivado_ate=arquivado_ate)
+        usuario.arquivado_ate = arquivado_ate
+
+    # update() não dispara signals: o usuário em cache na autenticação precisa do novo arquivado_ate
+    autenticacao.invalidar_usuarios(user_id=usuario.pk)
+    return len(por_mes), total
+
+
+def usuarios_com_batidas_antigas(limite, empresa_id=None):
+    usuarios = Usuario.objects.filter(registros__data_local__lt=limite)
+    if empresa_id:
+        usuarios = usuarios.filter(empresa_id=empresa_id)
+    return usuarios.distinct().order_by('username')
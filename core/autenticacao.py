@@ -0,0 +1,70 @@
+"""
+Autenticação por token com cache.
+
+O TokenAuthentication padrão faz uma query no authtoken + usuário a cada requisição,
+e as views ainda carregam usuario.empresa e usuario.escala sob demanda. Aqui o token
+é resolvido uma vez com select_related (usuário, empresa e escala) e guardado no cache:
+a requisição comum não faz nenhuma query de autenticação.
+
+Os signals invalidam a entrada quando o token, o usuário, a empresa ou a escala mudam.
+Com cache local (LocMem) e vários processos, o TTL limita quanto tempo outro worker
+pode ver dados antigos; com cache compartilhado a invalidação vale para todos.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _chave(key):
+    # O token em si não vai para a chave do cache
+    return 'token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _tokens():
+    return Token.objects.select_related('user__empresa', 'user__escala')
+
+
+def obter_token(key):
+    chave = _chave(key)
+    token = cache.get(chave)
+    if token is None:
+        token = _tokens().filter(key=key).first()
+        if token is None:
+            return None
+        cache.set(chave, token, settings.PONTO_TOKEN_CACHE_TTL)
+    return token
+
+
+async def aobter_token(key):
+    chave = _chave(key)
+    token = await cache.aget(chave)
+    if token is None:
+        token = await _tokens().filter(key=key).afirst()
+        if token is None:
+            return None
+        await cache.aset(chave, token, settings.PONTO_TOKEN_CACHE_TTL)
+    return token
+
+
+def invalidar(keys):
+    cache.delete_many([_chave(key) for key in keys])
+
+
+def invalidar_usuarios(**filtros):
+    """Ex: invalidar_usuarios(user__empresa_id=...) descarta os tokens de todos os usuários da empresa."""
+    invalidar(Token.objects.filter(**filtros).values_list('key', flat=True))
+
+
+class TokenAuthenticationCache(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        token = obter_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
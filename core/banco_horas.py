@@ -0,0 +1,109 @@
+"""
+Banco de horas materializado.
+
+Em vez de reprocessar todas as batidas desde a data de apuração a cada requisição,
+mantemos uma linha de SaldoDiario por usuário/dia com o saldo acumulado.
+
+- sincronizar(): completa os dias que ainda não foram materializados (normalmente só ontem/hoje).
+- atualizar_dia(): recalcula um único dia após uma batida ser criada/editada/apagada
+  e desloca o saldo acumulado dos dias seguintes com um único UPDATE.
+- invalidar(): descarta linhas quando regras (feriado, recesso, escala) mudam;
+  elas são reconstruídas na próxima sincronização.
+- saldos_atuais(): último saldo materializado de vários usuários em uma query (admin).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from . import metricas
+from .apuracao import apurar_periodo, data_inicio
+from .models import SaldoDiario, Usuario
+
+
+def _campos(dia, hoje):
+    return {
+        'data': dia.data,
+        'tipo_dia': dia.tipo_dia,
+        'minutos_trabalhados': dia.minutos_trabalhados,
+        'minutos_meta': dia.minutos_meta,
+        'saldo_dia': dia.saldo_dia,
+        'qtd_registros': len(dia.batidas),
+        'em_andamento': dia.em_andamento,
+        'fechado': dia.data < hoje,
+    }
+
+
+@metricas.cronometrado('banco_horas_sincronizar')
+def sincronizar(usuario, hoje=None):
+    """Materializa os dias que faltam até hoje. Custo proporcional aos dias novos, não ao histórico."""
+    hoje = hoje or timezone.localdate()
+    saldos = SaldoDiario.objects.filter(usuario=usuario)
+
+    with transaction.atomic():
+        # Um pedido por usuário de cada vez: dois primeiros acessos simultâneos (ex: PDF e relatório
+        # mensal) calculariam os mesmos dias e o segundo bulk_create violaria (usuario, data)
+        Usuario.objects.select_for_update().filter(pk=usuario.pk).values_list('pk').first()
+
+        # Linhas provisórias de dias que já passaram precisam ser recalculadas (podem virar Falta)
+        saldos.filter(fechado=False, data__lt=hoje).delete()
+
+        ultimo = saldos.order_by('-data').values('data', 'saldo_acumulado').first()
+        if ultimo:
+            inicio = ultimo['data'] + timedelta(days=1)
+            acumulado = ultimo['saldo_acumulado']
+        else:
+            inicio = data_inicio(usuario)
+            acumulado = 0
+
+        if inicio > hoje:
+            return
+
+        novos = []
+        for dia in apurar_periodo(usuario, inicio, hoje, hoje):
+            acumulado += dia.saldo_contabilizado
+            novos.append(SaldoDiario(usuario=usuario, saldo_acumulado=acumulado, **_campos(dia, hoje)))
+        SaldoDiario.objects.bulk_create(novos, batch_size=500)
+
+
+@metricas.cronometrado('banco_horas_atualizar_dia')
+def atualizar_dia(usuario, data, hoje=None):
+    """
+    Recalcula um único dia já materializado e propaga a diferença para os dias seguintes.
+    Dias ainda não materializados são deixados para a próxima sincronização.
+    """
+    hoje = hoje or timezone.localdate()
+    with transaction.atomic():
+        linha = SaldoDiario.objects.select_for_update().filter(usuario=usuario, data=data).first()
+        if linha is None:
+            return
+
+        dia = next(apurar_periodo(usuario, data, data, hoje))
+        antes = 0 if linha.em_andamento else linha.saldo_dia
+        diferenca = dia.saldo_contabilizado - antes
+
+        for campo, valor in _campos(dia, hoje).items():
+            setattr(linha, campo, valor)
+        linha.saldo_acumulado += diferenca
+        linha.save()
+
+        if diferenca:
+            SaldoDiario.objects.filter(usuario=usuario, data__gt=data).update(
+                saldo_acumulado=F('saldo_acumulado') + diferenca
+            )
+
+
+def invalidar(usuarios, a_partir_de=None):
+    """Descarta o banco materializado dos usuários (a partir de uma data, se informada)."""
+    saldos = SaldoDiario.objects.filter(usuario__in=usuarios)
+    if a_partir_de:
+        saldos = saldos.filter(data__gte=a_partir_de)
+    saldos.delete()
+
+
+def saldos_atuais(usuario_ids):
+    """{usuario_id: (saldo_acumulado, data)} da última linha materializada de cada usuário, em uma query."""
+    ultima_data = SaldoDiario.objects.filter(usuario=OuterRef('usuario')).order_by('-data').values('data')[:1]
+    linhas = SaldoDiario.objects.filter(usuario_id__in=usuario_ids, data=Subquery(ultima_data))
+    return {pk: (saldo, data) for pk, saldo, data in linhas.values_list('usuario_id', 'saldo_acumulado', 'data')}
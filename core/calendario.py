@@ -0,0 +1,108 @@
+"""
+Calendário pré-calculado por empresa (feriados e recessos).
+
+Cada ano vira um CalendarioAno: um bytearray indexado pelo dia do ano (0 = normal,
+1 = feriado, 2 = recesso) + um dicionário com o nome da exceção. A consulta de uma
+data é O(1) e o ano é montado uma única vez (2 queries) e guardado no cache,
+compartilhado por todos os funcionários da empresa.
+
+A invalidação é feita pelos signals de Feriado/Recesso (core/signals.py), que
+incrementam a versão do calendário da empresa.
+"""
+from datetime import date, timedelta
+
+from django.core.cache import cache
+
+from .models import Feriado, Recesso
+
+NORMAL, FERIADO, RECESSO = 0, 1, 2
+TIPOS = {FERIADO: 'FERIADO', RECESSO: 'RECESSO'}
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class CalendarioAno:
+    __slots__ = ('ano', 'tipos', 'nomes')
+
+    def __init__(self, ano, tipos, nomes):
+        self.ano = ano
+        self.tipos = tipos
+        self.nomes = nomes
+
+    @classmethod
+    def montar(cls, empresa_id, ano):
+        primeiro, ultimo = date(ano, 1, 1), date(ano, 12, 31)
+        tipos = bytearray((ultimo - primeiro).days + 1)
+        nomes = {}
+
+        for ini, fim, nome in Recesso.objects.filter(
+            empresa_id=empresa_id, data_inicio__lte=ultimo, data_fim__gte=primeiro
+        ).values_list('data_inicio', 'data_fim', 'nome'):
+            cursor = max(ini, primeiro)
+            while cursor <= min(fim, ultimo):
+                i = cursor.timetuple().tm_yday - 1
+                tipos[i] = RECESSO
+                nomes[i] = nome
+                cursor += timedelta(days=1)
+
+        # Feriado tem prioridade sobre recesso
+        for dia, nome in Feriado.objects.filter(
+            empresa_id=empresa_id, data__year=ano
+        ).values_list('data', 'nome'):
+            i = dia.timetuple().tm_yday - 1
+            tipos[i] = FERIADO
+            nomes[i] = nome
+
+        return cls(ano, tipos, nomes)
+
+
+class CalendarioEmpresa:
+    """Consulta 'feriado ou recesso, e qual' para qualquer data da empresa."""
+
+    def __init__(self, empresa_id):
+        self.empresa_id = empresa_id
+        self._anos = {}
+        self._versao = None
+
+    def _ano(self, ano):
+        calendario = self._anos.get(ano)
+        if calendario is None:
+            if self.empresa_id is None:
+                calendario = CalendarioAno(ano, bytearray(366), {})
+            else:
+                if self._versao is None:
+                    self._versao = cache.get_or_set(_chave_versao(self.empresa_id), 1, None)
+                chave = f'calendario:{self.empresa_id}:{self._versao}:{ano}'
+                calendario = cache.get(chave)
+                if calendario is None:
+                    calendario = CalendarioAno.montar(self.empresa_id, ano)
+                    cache.set(chave, calendario, CACHE_TIMEOUT)
+            self._anos[ano] = calendario
+        return calendario
+
+    def get(self, data, default=None):
+        """'FERIADO', 'RECESSO' ou default (mesma interface de um dict)."""
+        tipo = self._ano(data.year).tipos[data.timetuple().tm_yday - 1]
+        return TIPOS.get(tipo, default)
+
+    def nome(self, data):
+        ano = self._ano(data.year)
+        return ano.nomes.get(data.timetuple().tm_yday - 1, "")
+
+
+def _chave_versao(empresa_id):
+    return f'calendario:{empresa_id}:versao'
+
+
+def obter_calendario(empresa_id):
+    return CalendarioEmpresa(empresa_id)
+
+
+def invalidar(empresa_id):
+    """Chamado quando um Feriado/Recesso da empresa muda: as chaves antigas deixam de ser usadas."""
+    chave = _chave_versao(empresa_id)
+    cache.add(chave, 1, None)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, 2, None)
@@ -0,0 +1,39 @@
+"""
+Checagens do `manage.py check` específicas do sistema de ponto.
+
+Vários recursos guardam no cache estado que precisa ser o mesmo para todos os processos
+(status do dia, versões dos ETags, janela de leitura no primário após uma batida). Com LocMemCache cada worker tem o seu: uma batida atendida por um
+worker não chega aos outros.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+def cache_coerente():
+    """True se todos os processos enxergam o mesmo cache: backend compartilhado ou um único worker."""
+    return settings.PONTO_CACHE_COMPARTILHADO or settings.PONTO_WORKERS <= 1
+
+
+@register(Tags.caches)
+def verificar_cache_compartilhado(app_configs, **kwargs):
+    if cache_coerente():
+        return []
+    return [Error(
+        f'{settings.PONTO_WORKERS} workers (WEB_CONCURRENCY) com cache local por processo '
+        f"({settings.CACHES['default']['BACKEND']}).",
+        hint='O status do dia em cache, os ETags (304) e a janela da réplica precisam de um cache compartilhado: '
+             'defina CACHE_BACKEND/CACHE_LOCATION (ex: Redis ou Memcached) ou use WEB_CONCURRENCY=1.',
+        id='core.E001',
+    )]
+
+
+@register()
+def verificar_agregacao_sql(app_configs, **kwargs):
+    from .agregacao_sql import suportado  # models só depois do carregamento dos apps
+    if not settings.PONTO_AGREGACAO_SQL or suportado():
+        return []
+    return [Warning(
+        'PONTO_AGREGACAO_SQL=1, mas o banco de leitura não tem a agregação SQL (só SQLite e PostgreSQL).',
+        hint='O painel vai somar as horas em Python; desligue PONTO_AGREGACAO_SQL para remover o aviso.',
+        id='core.W001',
+    )]
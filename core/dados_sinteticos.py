@@ -0,0 +1,151 @@
+"""
+Geração de dados sintéticos (empresas, escalas, usuários, feriados, recessos e batidas).
+
+Usado pelo comando popular_pontos e pelo benchmark. Os dados são aleatórios mas
+realistas (atrasos, almoço, hora extra, faltas) e reprodutíveis pela seed.
+Cada usuário só bate ponto nos dias de trabalho da sua escala, fora de feriados
+e recessos da empresa. Tudo é inserido com bulk_create em lotes dentro de uma
+transação por empresa, sem uma query por batida.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Empresa, Escala, Usuario, Feriado, Recesso, RegistroPonto
+
+TAMANHO_LOTE = 5000
+# Usernames e nomes de escala levam o prefixo: o limite garante que caibam nas colunas
+TAMANHO_MAX_PREFIXO = 20
+
+# Feriados nacionais de data fixa (dia, mês, nome)
+FERIADOS_FIXOS = (
+    (1, 1, 'Confraternização Universal'),
+    (21, 4, 'Tiradentes'),
+    (1, 5, 'Dia do Trabalho'),
+    (7, 9, 'Independência'),
+    (12, 10, 'Nossa Senhora Aparecida'),
+    (2, 11, 'Finados'),
+    (15, 11, 'Proclamação da República'),
+    (20, 11, 'Consciência Negra'),
+    (25, 12, 'Natal'),
+)
+
+# (nome, carga diária, dias de trabalho Seg..Dom)
+ESCALAS_PADRAO = (
+    ('Administrativo (Seg-Sex)', timedelta(hours=8), (True, True, True, True, True, False, False)),
+    ('Comércio (Seg-Sáb)', timedelta(hours=7, minutes=20), (True, True, True, True, True, True, False)),
+    ('Meio Período', timedelta(hours=4), (True, True, True, True, True, False, False)),
+)
+
+
+def nome_usuario(prefixo, indice, i):
+    return f'{prefixo}{indice}u{i}'
+
+
+def _nome_escala(nome, prefixo, indice):
+    # Escala.nome é único: o sufixo identifica a empresa e o nome-base é cortado para caber
+    sufixo = f' - {prefixo}{indice}'
+    return nome[:Escala._meta.get_field('nome').max_length - len(sufixo)] + sufixo
+
+
+def _batidas_do_dia(usuario, dia, carga, aleatorio):
+    """Entrada ~08:00 com atraso/adiantamento, almoço de 30-70 min em jornadas acima de 6h e saída com hora extra."""
+    entrada = datetime.combine(dia, time(8, 0)) + timedelta(minutes=aleatorio.randint(-20, 30), seconds=aleatorio.randint(0, 59))
+    saida = entrada + carga + timedelta(minutes=aleatorio.randint(-30, 45), seconds=aleatorio.randint(0, 59))
+
+    momentos = [(entrada, 'ENTRADA')]
+    if carga > timedelta(hours=6):
+        saida_almoco = entrada + carga / 2 + timedelta(minutes=aleatorio.randint(-30, 30))
+        volta_almoco = saida_almoco + timedelta(minutes=aleatorio.randint(30, 70))
+        saida += volta_almoco - saida_almoco
+        momentos += [(saida_almoco, 'SAIDA_ALMOCO'), (volta_almoco, 'VOLTA_ALMOCO')]
+    momentos.append((saida, 'SAIDA'))
+
+    for momento, tipo in momentos:
+        yield RegistroPonto(
+            usuario=usuario,
+            tipo=tipo,
+            data_hora=timezone.make_aware(momento),
+            localizacao_valida=True,
+        )
+
+
+def gerar_empresa(indice, n_usuarios, inicio, fim, seed=0, prob_falta=0.03, prefixo='sint',
+                  tamanho_lote=TAMANHO_LOTE):
+    """Cria uma empresa completa e retorna (empresa, usuarios, total_batidas)."""
+    if len(prefixo) > TAMANHO_MAX_PREFIXO:
+        raise ValueError(f'Prefixo com mais de {TAMANHO_MAX_PREFIXO} caracteres: {prefixo}')
+    aleatorio = random.Random(f'{seed}-{indice}')
+    anos = range(inicio.year, fim.year + 1)
+
+    with transaction.atomic():
+        empresa = Empresa.objects.create(
+            nome=f'Empresa {prefixo} {indice}',
+            cnpj=f'{random.randrange(10 ** 14):014d}',  # fora da seed: não colide entre execuções
+        )
+        # Reaproveita as escalas de uma execução anterior com o mesmo prefixo
+        escalas = [
+            Escala.objects.get_or_create(nome=_nome_escala(nome, prefixo, indice), defaults=dict(
+                carga_horaria_diaria=carga,
+                trabalha_segunda=dias[0], trabalha_terca=dias[1], trabalha_quarta=dias[2],
+                trabalha_quinta=dias[3], trabalha_sexta=dias[4], trabalha_sabado=dias[5],
+                trabalha_domingo=dias[6],
+            ))[0]
+            for nome, carga, dias in ESCALAS_PADRAO
+        ]
+
+        feriados = Feriado.objects.bulk_create([
+            Feriado(empresa=empresa, data=date(ano, mes, dia), nome=nome)
+            for ano in anos for dia, mes, nome in FERIADOS_FIXOS
+        ])
+        recessos = Recesso.objects.bulk_create([
+            Recesso(empresa=empresa, nome='Recesso de Fim de Ano',
+                    data_inicio=date(ano, 12, 26), data_fim=date(ano, 12, 31))
+            for ano in anos
+        ])
+
+        senha = make_password('123')
+        # A maioria no administrativo, o resto distribuído
+        pesos = (6, 3, 1)
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(username=nome_usuario(prefixo, indice, i), password=senha, empresa=empresa,
+                    escala=aleatorio.choices(escalas, weights=pesos)[0], data_inicio_apuracao=inicio)
+            for i in range(n_usuarios)
+        ])
+
+        dias_folga = {f.data for f in feriados}
+        for recesso in recessos:
+            dias_folga.update(recesso.data_inicio + timedelta(days=d)
+                              for d in range((recesso.data_fim - recesso.data_inicio).days + 1))
+
+        # Dias úteis de cada escala calculados uma vez
+        dias_uteis = {}
+        for escala, (_, carga, dias) in zip(escalas, ESCALAS_PADRAO):
+            lista = []
+            dia = inicio
+            while dia <= fim:
+                if dias[dia.weekday()] and dia not in dias_folga:
+                    lista.append(dia)
+                dia += timedelta(days=1)
+            dias_uteis[escala.pk] = (lista, carga)
+
+        total = 0
+        lote = []
+        for usuario in usuarios:
+            lista, carga = dias_uteis[usuario.escala_id]
+            for dia in lista:
+                if aleatorio.random() < prob_falta:
+                    continue
+                lote.extend(_batidas_do_dia(usuario, dia, carga, aleatorio))
+                if len(lote) >= tamanho_lote:
+                    RegistroPonto.objects.bulk_create(lote)
+                    total += len(lote)
+                    lote = []
+        if lote:
+            RegistroPonto.objects.bulk_create(lote)
+            total += len(lote)
+
+    return empresa, usuarios, total
@@ -0,0 +1,170 @@
+"""
+Exportação das batidas de uma empresa: AFD (Portaria MTP 671/2021) e CSV.
+
+Uma única query RegistroPonto + Usuario é lida em blocos (iterator: cursor no servidor
+no PostgreSQL) e cada linha é formatada e entregue na hora, em pedaços de texto. A memória
+não cresce com o tamanho da exportação e o primeiro byte sai com o primeiro bloco lido.
+
+AFD no leiaute do REP-P (ponto por programa): cabeçalho (tipo 1), uma marcação por batida
+(tipo 7, com hash SHA-256 encadeado) e trailer (tipo 9). A assinatura digital (.p7s) exigida
+na entrega à fiscalização é feita sobre o arquivo gerado, fora daqui.
+"""
+import csv
+import hashlib
+import heapq
+from binascii import crc_hqx
+from collections import namedtuple
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import arquivo
+from .models import RegistroPonto, Usuario
+
+LOTE_PADRAO = 2000
+LINHAS_POR_PEDACO = 500
+
+Marcacao = namedtuple('Marcacao', 'data_hora tipo username cpf gravado_em offline editado arquivada')
+
+
+# --- LEITURA ---
+def _meses(inicio, fim):
+    while inicio <= fim:
+        proximo = (inicio.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield inicio, min(fim, proximo - timedelta(days=1))
+        inicio = proximo
+
+
+def _vivas(empresa_id, inicio, fim, lote):
+    linhas = RegistroPonto.objects.filter(
+        usuario__empresa_id=empresa_id, data_local__gte=inicio, data_local__lte=fim,
+    ).order_by('data_hora', 'id').values_list(
+        'data_hora', 'tipo', 'usuario__username', 'usuario__cpf', 'criado_em', 'id_cliente', 'editado_manualmente',
+    )
+    for data_hora, tipo, username, cpf, criado_em, id_cliente, editado in linhas.iterator(chunk_size=lote):
+        yield Marcacao(data_hora, tipo, username, cpf, criado_em, id_cliente is not None, editado, False)
+
+
+def _arquivadas(usuarios, inicio, fim):
+    marcacoes = [
+        Marcacao(data_hora, tipo, *usuarios[pk], data_hora, False, False, True)
+        for pk, batidas in arquivo.batidas_arquivadas_em_lote(list(usuarios), inicio, fim).items()
+        for data_hora, tipo in batidas
+    ]
+    marcacoes.sort(key=attrgetter('data_hora'))
+    return marcacoes
+
+
+def marcacoes(empresa_id, inicio, fim, lote=LOTE_PADRAO):
+    """
+    Batidas da empresa com data local entre inicio e fim, em ordem cronológica.
+    Se houver meses arquivados no período, eles são intercalados mês a mês: só um mês
+    de batidas arquivadas fica em memória por vez.
+    """
+    usuarios = {
+        pk: (username, cpf) for pk, username, cpf in
+        Usuario.objects.filter(empresa_id=empresa_id, arquivado_ate__gte=inicio).values_list('pk', 'username', 'cpf')
+    }
+    if not usuarios:
+        yield from _vivas(empresa_id, inicio, fim, lote)
+        return
+    for a, b in _meses(inicio, fim):
+        yield from heapq.merge(_vivas(empresa_id, a, b, lote), _arquivadas(usuarios, a, b),
+                               key=attrgetter('data_hora'))
+
+
+def _em_pedacos(linhas):
+    pedaco = []
+    for linha in linhas:
+        pedaco.append(linha)
+        if len(pedaco) >= LINHAS_POR_PEDACO:
+            yield ''.join(pedaco)
+            pedaco = []
+    if pedaco:
+        yield ''.join(pedaco)
+
+
+# --- AFD ---
+def _digitos(texto, tamanho):
+    return ''.join(c for c in (texto or '') if c.isdigit()).zfill(tamanho)[-tamanho:]
+
+
+def _data_hora_afd(momento, segundos=False):
+    # AAAA-MM-ddThh:mm:ss-0300; na marcação os segundos são sempre "00"
+    return timezone.localtime(momento).strftime('%Y-%m-%dT%H:%M:%S%z' if segundos else '%Y-%m-%dT%H:%M:00%z')
+
+
+def _crc(linha):
+    return f'{crc_hqx(linha.encode("latin-1", "replace"), 0):04X}'
+
+
+def _cabecalho(empresa, inicio, fim):
+    linha = (
+        '000000000' + '1' + '1' + _digitos(empresa.cnpj, 14) + ' ' * 14
+        + empresa.nome[:150].ljust(150)
+        + settings.PONTO_AFD_REGISTRO_INPI[:17].ljust(17)
+        + inicio.isoformat() + fim.isoformat()
+        + _data_hora_afd(timezone.now(), segundos=True)
+        + '003' + '1' + _digitos(settings.PONTO_AFD_CNPJ_DESENVOLVEDOR, 14) + ' ' * 30
+    )
+    return linha + _crc(linha) + '\r\n'
+
+
+def _linhas_afd(empresa, inicio, fim, lote):
+    yield _cabecalho(empresa, inicio, fim)
+    nsr = 0
+    hash_anterior = ''
+    for m in marcacoes(empresa.pk, inicio, fim, lote):
+        nsr += 1
+        linha = (
+            f'{nsr:09d}' + '7' + _data_hora_afd(m.data_hora) + _digitos(m.cpf, 12)
+            + _data_hora_afd(m.gravado_em, segundos=True)
+            + '01'  # coletor: aplicativo
+            + ('1' if m.offline else '0')
+        )
+        hash_anterior = hashlib.sha256((linha + hash_anterior).encode('latin-1', 'replace')).hexdigest()
+        yield linha + hash_anterior + '\r\n'
+    # Trailer: quantidade de registros dos tipos 2 a 7 (só há marcações, tipo 7)
+    yield '999999999' + '0' * 45 + f'{nsr:09d}' + '9' + '\r\n'
+
+
+def gerar_afd(empresa, inicio, fim, lote=LOTE_PADRAO):
+    """Texto do AFD em pedaços (ISO-8859-1 ao gravar)."""
+    return _em_pedacos(_linhas_afd(empresa, inicio, fim, lote))
+
+
+# --- CSV ---
+class _Eco:
+    """Buffer falso: o csv.writer devolve a linha formatada em vez de gravá-la."""
+    def write(self, valor):
+        return valor
+
+
+def _linhas_csv(empresa, inicio, fim, lote):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield escritor.writerow(['cpf', 'usuario', 'data', 'hora', 'tipo', 'data_hora', 'gravado_em', 'offline',
+                             'editado_manualmente', 'arquivada'])
+    for m in marcacoes(empresa.pk, inicio, fim, lote):
+        local = timezone.localtime(m.data_hora)
+        yield escritor.writerow([
+            m.cpf, m.username, local.strftime('%d/%m/%Y'), local.strftime('%H:%M'), m.tipo, local.isoformat(),
+            timezone.localtime(m.gravado_em).isoformat(), int(m.offline), int(m.editado), int(m.arquivada),
+        ])
+
+
+def gerar_csv(empresa, inicio, fim, lote=LOTE_PADRAO):
+    return _em_pedacos(_linhas_csv(empresa, inicio, fim, lote))
+
+
+FORMATOS = {
+    # formato: (gerador, content-type, extensão, encoding)
+    'afd': (gerar_afd, 'text/plain; charset=ISO-8859-1', 'txt', 'latin-1'),
+    'csv': (gerar_csv, 'text/csv; charset=utf-8', 'csv', 'utf-8'),
+}
+
+
+def nome_arquivo(empresa, formato, inicio, fim):
+    prefixo = 'AFD' if formato == 'afd' else 'batidas'
+    return f'{prefixo}_{_digitos(empresa.cnpj, 14)}_{inicio}_{fim}.{FORMATOS[formato][2]}'
@@ -0,0 +1,116 @@
+"""
+Validação de localização (geofence) das batidas.
+
+Cada empresa pode ter vários LocalTrabalho, além do escritório cadastrado na própria
+Empresa. Para não calcular a distância até todos os locais a cada batida, montamos
+um índice em grade: o mapa é dividido em células de CELULA_GRAUS e cada local é
+registrado em todas as células que o seu raio alcança. Uma batida só é comparada
+com os locais da sua célula.
+
+O índice é montado uma vez por empresa, guardado no cache e invalidado pelos
+signals de Empresa/LocalTrabalho (core/signals.py).
+"""
+import math
+
+from django.core.cache import cache
+
+from .models import Empresa, LocalTrabalho
+
+CELULA_GRAUS = 0.01          # ~1,1 km de latitude
+METROS_POR_GRAU = 111_320.0
+RAIO_TERRA_METROS = 6_371_000.0
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _celula(lat, lon):
+    return (math.floor(lat / CELULA_GRAUS), math.floor(lon / CELULA_GRAUS))
+
+
+def distancia_metros(lat1, lon1, lat2, lon2):
+    """Haversine."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RAIO_TERRA_METROS * math.asin(math.sqrt(a))
+
+
+class IndiceGeografico:
+    """{célula: ((lat, lon, raio), ...)} de uma empresa."""
+    __slots__ = ('celulas', 'total_locais')
+
+    def __init__(self, locais):
+        self.celulas = {}
+        self.total_locais = len(locais)
+        for lat, lon, raio in locais:
+            d_lat = raio / METROS_POR_GRAU
+            d_lon = raio / (METROS_POR_GRAU * max(math.cos(math.radians(lat)), 0.01))
+            lat_min, lon_min = _celula(lat - d_lat, lon - d_lon)
+            lat_max, lon_max = _celula(lat + d_lat, lon + d_lon)
+            for i in range(lat_min, lat_max + 1):
+                for j in range(lon_min, lon_max + 1):
+                    self.celulas.setdefault((i, j), []).append((lat, lon, raio))
+        self.celulas = {celula: tuple(itens) for celula, itens in self.celulas.items()}
+
+    @classmethod
+    def montar(cls, empresa_id):
+        locais = [
+            (float(lat), float(lon), raio)
+            for lat, lon, raio in LocalTrabalho.objects.filter(
+                empresa_id=empresa_id, ativo=True
+            ).values_list('latitude', 'longitude', 'raio_permitido_metros')
+        ]
+        escritorio = Empresa.objects.filter(pk=empresa_id).values_list(
+            'latitude_escritorio', 'longitude_escritorio', 'raio_permitido_metros'
+        ).first()
+        if escritorio and escritorio[0] is not None and escritorio[1] is not None:
+            locais.append((float(escritorio[0]), float(escritorio[1]), escritorio[2]))
+        return cls(locais)
+
+    def contem(self, lat, lon):
+        for lat_local, lon_local, raio in self.celulas.get(_celula(lat, lon), ()):
+            if distancia_metros(lat, lon, lat_local, lon_local) <= raio:
+                return True
+        return False
+
+
+def _chave(empresa_id):
+    return f'geofence:{empresa_id}'
+
+
+def obter_indice(empresa_id):
+    indice = cache.get(_chave(empresa_id))
+    if indice is None:
+        indice = IndiceGeografico.montar(empresa_id)
+        cache.set(_chave(empresa_id), indice, CACHE_TIMEOUT)
+    return indice
+
+
+def invalidar(empresa_id):
+    cache.delete(_chave(empresa_id))
+
+
+def localizacao_valida(usuario, latitude, longitude, indice=None):
+    """
+    Regras:
+    - Trabalho híbrido pode bater ponto de qualquer lugar.
+    - Empresa sem nenhum local cadastrado não restringe o ponto.
+    - Caso contrário, a batida precisa ter coordenadas dentro do raio de algum local.
+    """
+    return validar_coordenadas(usuario.empresa_id, usuario.trabalho_hibrido, latitude, longitude, indice)
+
+
+def validar_coordenadas(empresa_id, trabalho_hibrido, latitude, longitude, indice=None):
+    """Mesmas regras, a partir dos campos do usuário (ex: lidos com values_list, sem instanciar Usuario)."""
+    if trabalho_hibrido or not empresa_id:
+        return True
+    if indice is None:
+        indice = obter_indice(empresa_id)
+    if not indice.total_locais:
+        return True
+    if latitude is None or longitude is None:
+        return False
+    try:
+        return indice.contem(float(latitude), float(longitude))
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,247 @@
+"""
+Importação de arquivos de relógio de ponto (REP): AFD da Portaria 671 e CSV.
+
+O arquivo é lido linha a linha e processado em lotes de dias inteiros. Cada lote faz:
+- uma query para mapear os CPFs ainda não vistos para Usuario (só da empresa);
+- uma query para as batidas já gravadas desses usuários nesses dias (deduplicação por
+  (usuario, data_hora) e definição do tipo de cada batida nova);
+- um bulk_create.
+bulk_create não dispara signals: banco de horas, status, versões (ETag) e janela da
+réplica são atualizados aqui, uma vez por usuário afetado.
+
+Cada lote é uma transação. Se a importação parar no meio, reimportar o mesmo arquivo
+é seguro: o que já entrou é reconhecido como duplicado.
+"""
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import arquivo, banco_horas, roteador, status_dia, versoes
+from .models import RegistroPonto, Usuario
+
+LOTE_PADRAO = 5000
+TIPOS = {tipo for tipo, _ in RegistroPonto.TIPO_BATIDA}
+SEQUENCIA_PADRAO = ('ENTRADA', 'SAIDA_ALMOCO', 'VOLTA_ALMOCO', 'SAIDA')
+
+
+class ErroImportacao(ValueError):
+    pass
+
+
+class Resultado:
+    def __init__(self):
+        self.lidas = 0
+        self.criadas = 0
+        self.duplicadas = 0
+        self.sem_usuario = set()  # CPFs que não pertencem a nenhum funcionário da empresa
+        self.erros = []  # (número da linha, motivo)
+
+    def __str__(self):
+        return (f'{self.lidas} marcações lidas, {self.criadas} criadas, {self.duplicadas} duplicadas, '
+                f'{len(self.sem_usuario)} CPFs sem usuário, {len(self.erros)} linhas com erro')
+
+
+def _cpf(texto):
+    # O AFD usa 12 posições para o CPF (zero à esquerda)
+    return ''.join(c for c in texto if c.isdigit())[-11:].zfill(11)
+
+
+def _aware(momento):
+    return momento if timezone.is_aware(momento) else timezone.make_aware(momento)
+
+
+# --- LEITURA DOS FORMATOS ---
+# Geram (número da linha, cpf, data_hora, tipo ou None); linha inválida vem com cpf None e o motivo.
+def ler_afd(texto):
+    """Marcações (tipo 3 do REP-C e tipo 7 do REP-P); os demais registros são ignorados."""
+    for numero, linha in enumerate(texto, 1):
+        linha = linha.rstrip('\r\n')
+        if len(linha) < 46 or linha[9] not in '37' or not linha[:9].isdigit():
+            continue
+        try:
+            yield numero, _cpf(linha[34:46]), datetime.fromisoformat(linha[10:34]), None
+        except ValueError:
+            yield numero, None, None, 'Data/hora inválida'
+
+
+def _data_hora_csv(registro):
+    if registro.get('data_hora'):
+        return _aware(datetime.fromisoformat(registro['data_hora']))
+    data = registro['data']
+    formato = '%d/%m/%Y' if '/' in data else '%Y-%m-%d'
+    return _aware(datetime.strptime(f"{data} {registro['hora'][:5]}", f'{formato} %H:%M'))
+
+
+def ler_csv(texto):
+    """CSV com cabeçalho: cpf e data_hora (ISO) ou data + hora; tipo é opcional. Aceita ; ou ,."""
+    primeira = next(texto, '')
+    delimitador = ';' if primeira.count(';') >= primeira.count(',') else ','
+    colunas = [c.strip().lower() for c in next(csv.reader([primeira], delimiter=delimitador))]
+    if 'cpf' not in colunas or not ('data_hora' in colunas or {'data', 'hora'} <= set(colunas)):
+        raise ErroImportacao('O CSV precisa das colunas cpf e data_hora (ou data e hora).')
+
+    for numero, valores in enumerate(csv.reader(texto, delimiter=delimitador), 2):
+        if not any(valores):
+            continue
+        registro = dict(zip(colunas, (v.strip() for v in valores)))
+        tipo = registro.get('tipo') or None
+        try:
+            if tipo is not None and tipo not in TIPOS:
+                raise ValueError
+            yield numero, _cpf(registro['cpf']), _data_hora_csv(registro), tipo
+        except (KeyError, ValueError):
+            yield numero, None, None, 'Linha inválida'
+
+
+FORMATOS = {
+    # formato: (leitor, encoding)
+    'afd': (ler_afd, 'latin-1'),
+    'csv': (ler_csv, 'utf-8-sig'),
+}
+
+
+def detectar_formato(nome):
+    return 'csv' if nome.lower().endswith('.csv') else 'afd'
+
+
+# --- GRAVAÇÃO ---
+def _tipo_por_posicao(indice, total):
+    if total == len(SEQUENCIA_PADRAO):
+        return SEQUENCIA_PADRAO[indice]
+    return 'ENTRADA' if indice % 2 == 0 else 'SAIDA'
+
+
+class _Importador:
+    def __init__(self, empresa, origem, resultado):
+        self.empresa = empresa
+        self.origem = origem
+        self.resultado = resultado
+        self.usuarios = {}  # cpf -> (pk, arquivado_ate) ou None
+
+    def _mapear(self, cpfs):
+        novos = cpfs - self.usuarios.keys()
+        if novos:
+            encontrados = {
+                cpf: (pk, arquivado_ate) for cpf, pk, arquivado_ate in
+                Usuario.objects.filter(empresa=self.empresa, cpf__in=novos).values_list('cpf', 'pk', 'arquivado_ate')
+            }
+            for cpf in novos:
+                self.usuarios[cpf] = encontrados.get(cpf)
+
+    def _existentes(self, ids, inicio, fim):
+        """{(usuario_id, dia): [(data_hora, tipo), ...]} já gravadas, vivas ou arquivadas."""
+        por_dia = defaultdict(list)
+        for pk, data_hora, tipo, dia in RegistroPonto.objects.filter(
+            usuario_id__in=list(ids), data_local__gte=inicio, data_local__lte=fim,
+        ).order_by().values_list('usuario_id', 'data_hora', 'tipo', 'data_local'):
+            por_dia[(pk, dia)].append((data_hora, tipo))
+
+        arquivados = [pk for pk, arquivado_ate in ids.items() if arquivado_ate and arquivado_ate >= inicio]
+        if arquivados:
+            for pk, batidas in arquivo.batidas_arquivadas_em_lote(arquivados, inicio, fim).items():
+                for data_hora, tipo in batidas:
+                    por_dia[(pk, timezone.localtime(data_hora).date())].append((data_hora, tipo))
+        return por_dia
+
+    def gravar(self, marcacoes):
+        self._mapear({cpf for cpf, _, _ in marcacoes})
+        novas = defaultdict(dict)  # (usuario_id, dia) -> {data_hora: tipo}
+        ids = {}
+        for cpf, data_hora, tipo in marcacoes:
+            usuario = self.usuarios[cpf]
+            if usuario is None:
+                self.resultado.sem_usuario.add(cpf)
+                continue
+            ids[usuario[0]] = usuario[1]
+            do_dia = novas[(usuario[0], timezone.localtime(data_hora).date())]
+            if data_hora in do_dia:
+                self.resultado.duplicadas += 1  # repetida no próprio arquivo
+            else:
+                do_dia[data_hora] = tipo
+        if not novas:
+            return
+
+        dias = [dia for _, dia in novas]
+        existentes = self._existentes(ids, min(dias), max(dias))
+
+        registros = []
+        for (usuario_id, dia), do_dia in novas.items():
+            ja_gravadas = dict(existentes.get((usuario_id, dia), ()))
+            todas = sorted(ja_gravadas.keys() | do_dia.keys())
+            for indice, data_hora in enumerate(todas):
+                if data_hora in ja_gravadas:
+                    if data_hora in do_dia:
+                        self.resultado.duplicadas += 1
+                    continue
+                registros.append(RegistroPonto(
+                    usuario_id=usuario_id,
+                    data_hora=data_hora,
+                    # Relógio não informa o tipo: segue a posição da batida no dia
+                    tipo=do_dia[data_hora] or _tipo_por_posicao(indice, len(todas)),
+                    localizacao_valida=True,  # relógio físico instalado no local de trabalho
+                    observacao=self.origem or None,
+                ))
+
+        with transaction.atomic():
+            RegistroPonto.objects.bulk_create(registros, batch_size=1000)
+        self.resultado.criadas += len(registros)
+        self._apos_gravar(registros)
+
+    def _apos_gravar(self, registros):
+        """O que os signals de RegistroPonto fariam, agrupado por usuário."""
+        if not registros:
+            return
+        primeiro_dia = {}
+        for registro in registros:
+            dia = registro.data_local
+            if registro.usuario_id not in primeiro_dia or dia < primeiro_dia[registro.usuario_id]:
+                primeiro_dia[registro.usuario_id] = dia
+
+        por_dia = defaultdict(list)
+        for usuario_id, dia in primeiro_dia.items():
+            por_dia[dia].append(usuario_id)
+        for dia, usuario_ids in por_dia.items():
+            # Refaz o banco materializado a partir do dia mais antigo importado
+            banco_horas.invalidar(usuario_ids, a_partir_de=dia)
+
+        hoje = timezone.localdate()
+        for usuario_id in primeiro_dia:
+            status_dia.invalidar(usuario_id, hoje)
+            roteador.marcar_escrita(usuario_id)
+        versoes.incrementar_usuario(*primeiro_dia)
+
+
+def importar(binario, empresa, formato='afd', lote=LOTE_PADRAO, origem=''):
+    """
+    Importa as marcações do arquivo (aberto em modo binário) para os funcionários da empresa.
+    Os lotes fecham sempre ao fim de um dia: com o arquivo em ordem cronológica (como o
+    relógio gera), um dia nunca fica dividido entre dois lotes.
+    """
+    leitor, encoding = FORMATOS[formato]
+    resultado = Resultado()
+    importador = _Importador(empresa, origem, resultado)
+    texto = io.TextIOWrapper(binario, encoding=encoding, newline='')
+
+    pendentes = []
+    dia_atual = None
+    try:
+        for numero, cpf, data_hora, tipo in leitor(texto):
+            if cpf is None:
+                resultado.erros.append((numero, tipo))
+                continue
+            resultado.lidas += 1
+            dia = timezone.localtime(data_hora).date()
+            if len(pendentes) >= lote and dia != dia_atual:
+                importador.gravar(pendentes)
+                pendentes = []
+            dia_atual = dia
+            pendentes.append((cpf, data_hora, tipo))
+        if pendentes:
+            importador.gravar(pendentes)
+    finally:
+        texto.detach()  # o arquivo continua aberto para quem o passou
+    return resultado
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import arquivo
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = ('Move as batidas de meses fechados para o arquivo mensal compacto (ArquivoMensal), '
+            'mantendo RegistroPonto e seu índice pequenos. Relatórios continuam lendo esses meses.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=settings.PONTO_ARQUIVO_MESES,
+                            help='Meses completos mantidos na tabela viva, além do atual (padrão: PONTO_ARQUIVO_MESES)')
+        parser.add_argument('--empresa', help='CNPJ da empresa (padrão: todas)')
+        parser.add_argument('--dry-run', action='store_true', help='Só lista os usuários que seriam arquivados')
+
+    def handle(self, *args, **opts):
+        if opts['meses'] < 1:
+            raise CommandError('--meses deve ser pelo menos 1 (o mês anterior ainda pode receber ajustes).')
+
+        empresa_id = None
+        if opts['empresa']:
+            empresa_id = Empresa.objects.filter(cnpj=opts['empresa']).values_list('pk', flat=True).first()
+            if empresa_id is None:
+                raise CommandError(f"Empresa {opts['empresa']} não encontrada")
+
+        limite = arquivo.limite_fechamento(opts['meses'])
+        usuarios = arquivo.usuarios_com_batidas_antigas(limite, empresa_id)
+        self.stdout.write(f'--- Arquivando batidas anteriores a {limite.strftime("%d/%m/%Y")} ---')
+
+        if opts['dry_run']:
+            for usuario in usuarios:
+                self.stdout.write(f'{usuario.username}')
+            return
+
+        t0 = time.perf_counter()
+        total_meses = total_batidas = 0
+        for usuario in list(usuarios):
+            meses, batidas = arquivo.arquivar_usuario(usuario, limite)
+            total_meses += meses
+            total_batidas += batidas
+            self.stdout.write(f'{usuario.username}: {batidas} batidas em {meses} meses')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Concluído! {total_batidas} batidas movidas para {total_meses} meses arquivados '
+            f'em {time.perf_counter() - t0:.1f}s.'
+        ))
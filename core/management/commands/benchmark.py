@@ -0,0 +1,184 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from core.dados_sinteticos import gerar_empresa
+
+# Só o alias 'default' vai para o banco de teste: o resto do ambiente também é isolado
+ISOLAMENTO = {
+    # Os casos "frios" fazem cache.clear(): nunca no cache compartilhado (tokens, status, ETags) de produção
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}},
+    'PONTO_WORKERS': 1,
+    # Sem o roteador, nenhuma leitura vai para uma réplica configurada (que é a real, não a de teste)
+    'DATABASE_ROUTERS': [],
+}
+
+
+class Command(BaseCommand):
+    help = ('Benchmark dos endpoints de status, histórico, PDF e painel com dados sintéticos. '
+            'Roda em um banco de teste descartável e grava os resultados em JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=1)
+        parser.add_argument('--usuarios', type=int, default=20, help='Usuários por empresa')
+        parser.add_argument('--anos', type=int, default=1, help='Anos de histórico até hoje')
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--saida', help='Arquivo JSON de resultados (padrão: só imprime)')
+        parser.add_argument('--comparar', help='JSON de uma execução anterior: falha se algum caso piorar')
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help='Piora aceitável na mediana ao comparar (0.25 = 25%%)')
+
+    def handle(self, *args, **opts):
+        setup_test_environment()
+        nome_original = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(**ISOLAMENTO):
+                resultado = self._executar(opts)
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if opts['saida']:
+            with open(opts['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto)
+            self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {opts['saida']}"))
+        else:
+            self.stdout.write(texto)
+
+        if opts['comparar']:
+            self._comparar(resultado, opts['comparar'], opts['tolerancia'])
+
+    def _comparar(self, atual, caminho, tolerancia):
+        with open(caminho, encoding='utf-8') as arquivo:
+            anterior = {r['caso']: r for r in json.load(arquivo)['resultados']}
+
+        regressoes = []
+        for r in atual['resultados']:
+            base = anterior.get(r['caso'])
+            if not base:
+                continue
+            if r['mediana_ms'] > base['mediana_ms'] * (1 + tolerancia):
+                regressoes.append(f"{r['caso']}: {base['mediana_ms']} ms -> {r['mediana_ms']} ms")
+            if r['queries'] > base['queries']:
+                regressoes.append(f"{r['caso']}: {base['queries']} -> {r['queries']} queries")
+
+        if regressoes:
+            raise CommandError('Regressões encontradas:\n' + '\n'.join(regressoes))
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação a ' + caminho))
+
+    # --- DADOS ---
+    def _executar(self, opts):
+        hoje = timezone.localdate()
+        inicio = hoje - timedelta(days=365 * opts['anos'])
+
+        t0 = time.perf_counter()
+        empresas = []
+        total_batidas = 0
+        for i in range(opts['empresas']):
+            empresa, usuarios, batidas = gerar_empresa(i, opts['usuarios'], inicio, hoje, seed=opts['seed'])
+            empresas.append((empresa, usuarios))
+            total_batidas += batidas
+        self.stdout.write(f'{total_batidas} batidas geradas em {time.perf_counter() - t0:.1f}s')
+
+        empresa, usuarios = empresas[0]
+        usuario = usuarios[0]
+        admin = usuarios[-1]
+        admin.tipo = 'ADMIN'
+        admin.save(update_fields=['tipo'])
+
+        mes = {'data_inicio': hoje.replace(day=1).isoformat(), 'data_fim': hoje.isoformat()}
+        ano = {'data_inicio': inicio.isoformat(), 'data_fim': hoje.isoformat()}
+        casos = [
+            ('status_frio', usuario, 'get', '/api/status/', None, True),
+            ('status_quente', usuario, 'get', '/api/status/', None, False),
+            ('historico_frio', usuario, 'get', '/api/historico/', None, True),
+            ('historico_quente', usuario, 'get', '/api/historico/', None, False),
+            ('pdf_mes', usuario, 'post', '/api/relatorio-pdf/', mes, False),
+            ('pdf_periodo_total', usuario, 'post', '/api/relatorio-pdf/', ano, False),
+            ('painel_empresa_mes', admin, 'get', '/api/empresa/banco-horas/', mes, False),
+        ]
+
+        resultados = [self._medir(*caso, repeticoes=opts['repeticoes']) for caso in casos]
+        for r in resultados:
+            self.stdout.write(f"{r['caso']:<20} mediana {r['mediana_ms']:>9.1f} ms  "
+                              f"{r['queries']:>5} queries  pico {r['pico_memoria_kib']:>9.0f} KiB")
+
+        return {
+            'parametros': {k: opts[k] for k in ('empresas', 'usuarios', 'anos', 'repeticoes', 'seed')},
+            'ambiente': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'banco': connection.vendor,
+                'data': timezone.now().isoformat(),
+            },
+            'batidas': total_batidas,
+            'resultados': resultados,
+        }
+
+    # --- MEDIÇÃO ---
+    def _requisitar(self, cliente, metodo, url, dados):
+        resposta = getattr(cliente, metodo)(url, dados)
+        if resposta.streaming:
+            for _ in resposta.streaming_content:
+                pass
+        else:
+            resposta.content
+        return resposta
+
+    def _medir(self, nome, usuario, metodo, url, dados, frio, repeticoes):
+        """
+        frio=True: limpa o cache e o banco de horas materializado antes de cada repetição,
+        medindo o pior caso (primeira requisição do dia / após invalidação).
+        """
+        cliente = Client()
+        cliente.force_login(usuario)
+
+        def preparar():
+            if frio:
+                cache.clear()
+                usuario.saldos_diarios.all().delete()
+
+        preparar()
+        self._requisitar(cliente, metodo, url, dados)  # aquecimento (imports, conexões)
+
+        tempos = []
+        queries = 0
+        status_http = None
+        for _ in range(repeticoes):
+            preparar()
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                status_http = self._requisitar(cliente, metodo, url, dados).status_code
+                tempos.append((time.perf_counter() - t0) * 1000)
+            queries = len(ctx.captured_queries)
+
+        # Memória medida numa execução separada (tracemalloc distorce o tempo)
+        preparar()
+        tracemalloc.start()
+        self._requisitar(cliente, metodo, url, dados)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'caso': nome,
+            'url': url,
+            'status': status_http,
+            'min_ms': round(min(tempos), 2),
+            'mediana_ms': round(statistics.median(tempos), 2),
+            'max_ms': round(max(tempos), 2),
+            'queries': queries,
+            'pico_memoria_kib': round(pico / 1024, 1),
+        }
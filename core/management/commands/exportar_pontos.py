@@ -0,0 +1,47 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import exportacao
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = 'Exporta as batidas de uma empresa no período, em AFD (Portaria 671) ou CSV, sem carregar tudo em memória'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', required=True, help='CNPJ da empresa')
+        parser.add_argument('--desde', help='Data inicial AAAA-MM-DD (padrão: início do mês atual)')
+        parser.add_argument('--ate', help='Data final AAAA-MM-DD (padrão: hoje)')
+        parser.add_argument('--formato', choices=sorted(exportacao.FORMATOS), default='afd')
+        parser.add_argument('--saida', help='Arquivo de saída (padrão: nome padrão no diretório atual; "-" para stdout)')
+        parser.add_argument('--lote', type=int, default=exportacao.LOTE_PADRAO, help='Linhas lidas do banco por vez')
+
+    def handle(self, *args, **opts):
+        empresa = Empresa.objects.filter(cnpj=opts['empresa']).first()
+        if empresa is None:
+            raise CommandError(f"Empresa {opts['empresa']} não encontrada")
+        hoje = timezone.localdate()
+        inicio = self._data(opts['desde']) if opts['desde'] else hoje.replace(day=1)
+        fim = self._data(opts['ate']) if opts['ate'] else hoje
+
+        gerador, _, _, encoding = exportacao.FORMATOS[opts['formato']]
+        pedacos = gerador(empresa, inicio, fim, opts['lote'])
+        if opts['saida'] == '-':
+            for pedaco in pedacos:
+                sys.stdout.buffer.write(pedaco.encode(encoding, 'replace'))
+            return
+
+        caminho = opts['saida'] or exportacao.nome_arquivo(empresa, opts['formato'], inicio, fim)
+        with open(caminho, 'w', encoding=encoding, errors='replace', newline='') as saida:
+            for pedaco in pedacos:
+                saida.write(pedaco)
+        self.stdout.write(self.style.SUCCESS(f'Exportado para {caminho}'))
+
+    def _data(self, texto):
+        try:
+            return datetime.strptime(texto, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Data inválida: {texto} (use AAAA-MM-DD)')
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importacao
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = ('Importa marcações de relógio de ponto (AFD da Portaria 671 ou CSV) para os funcionários da empresa, '
+            'ignorando as que já existem')
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo AFD (.txt) ou CSV')
+        parser.add_argument('--empresa', required=True, help='CNPJ da empresa')
+        parser.add_argument('--formato', choices=sorted(importacao.FORMATOS), help='Padrão: pela extensão do arquivo')
+        parser.add_argument('--lote', type=int, default=importacao.LOTE_PADRAO, help='Marcações por lote de gravação')
+
+    def handle(self, *args, **opts):
+        empresa = Empresa.objects.filter(cnpj=opts['empresa']).first()
+        if empresa is None:
+            raise CommandError(f"Empresa {opts['empresa']} não encontrada")
+        formato = opts['formato'] or importacao.detectar_formato(opts['arquivo'])
+
+        t0 = time.perf_counter()
+        try:
+            with open(opts['arquivo'], 'rb') as binario:
+                resultado = importacao.importar(binario, empresa, formato, opts['lote'],
+                                                origem=f"Importado do relógio ({opts['arquivo']})")
+        except (OSError, importacao.ErroImportacao) as e:
+            raise CommandError(str(e))
+
+        for numero, motivo in resultado.erros[:20]:
+            self.stderr.write(f'Linha {numero}: {motivo}')
+        if resultado.sem_usuario:
+            self.stderr.write(f"CPFs sem usuário na empresa: {', '.join(sorted(resultado.sem_usuario))}")
+        self.stdout.write(self.style.SUCCESS(f'{resultado} em {time.perf_counter() - t0:.1f}s.'))
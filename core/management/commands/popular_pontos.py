@@ -1,140 +1,58 @@
-from django.core.management.base import BaseCommand
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from core.models import Usuario, RegistroPonto, Empresa
-from datetime import datetime, timedelta, time, date
 
-class Command(BaseCommand):
-    help = 'Popula o banco com sequencia de dias uteis para Kleisley'
+from core.dados_sinteticos import TAMANHO_LOTE, TAMANHO_MAX_PREFIXO, gerar_empresa, nome_usuario
+from core.models import Usuario
 
-    def handle(self, *args, **kwargs):
-        # === CONFIGURAÇÕES ===
-        USERNAME = 'kleisley'
-        DATA_INICIAL = date(2025, 11, 1) # Começa 1 de Novembro
-        
-        # Lista de Feriados para pular (Formato AAAA-MM-DD)
-        FERIADOS = [
-            date(2025, 11, 2),  # Finados (Caiu domingo, mas bom prevenir)
-            date(2025, 11, 15), # Proclamação (Sábado)
-            date(2025, 11, 20), # Consciência Negra (Quinta) - PULAR
-            date(2025, 12, 8),  # Imaculada Conceição (Segunda) - PULAR
-            date(2025, 12, 25), # Natal
-        ]
-        # =====================
 
-        # 1. Busca ou Cria o Usuário
+class Command(BaseCommand):
+    help = ('Popula o banco com dados sintéticos: empresas, escalas, usuários, feriados, recessos '
+            'e anos de batidas realistas (respeita fins de semana, feriados e recessos)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=1)
+        parser.add_argument('--usuarios', type=int, default=10, help='Usuários por empresa')
+        parser.add_argument('--anos', type=float, default=1, help='Anos de histórico até ontem')
+        parser.add_argument('--inicio', help='Data inicial AAAA-MM-DD (ignora --anos)')
+        parser.add_argument('--fim', help='Data final AAAA-MM-DD (padrão: ontem)')
+        parser.add_argument('--seed', type=int, default=0, help='Mesma seed = mesmos dados')
+        parser.add_argument('--prob-falta', type=float, default=0.03, help='Probabilidade de falta por dia útil')
+        parser.add_argument('--prefixo', default='sint', help='Prefixo dos usernames/escalas (evita colisões)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Tamanho do lote do bulk_create')
+
+    def handle(self, *args, **opts):
+        fim = self._data(opts['fim']) if opts['fim'] else timezone.localdate() - timedelta(days=1)
+        inicio = self._data(opts['inicio']) if opts['inicio'] else fim - timedelta(days=int(365 * opts['anos']))
+        if inicio > fim:
+            raise CommandError('Data inicial posterior à final.')
+        if len(opts['prefixo']) > TAMANHO_MAX_PREFIXO:
+            raise CommandError(f'--prefixo aceita no máximo {TAMANHO_MAX_PREFIXO} caracteres.')
+        # Usernames são únicos: rodar de novo com o mesmo prefixo colidiria no bulk_create
+        if Usuario.objects.filter(username__in=[nome_usuario(opts['prefixo'], i, 0) for i in range(opts['empresas'])]).exists():
+            raise CommandError(f"Já existem usuários com o prefixo {opts['prefixo']!r}: use outro --prefixo.")
+
+        self.stdout.write(f'--- Gerando de {inicio.strftime("%d/%m/%Y")} a {fim.strftime("%d/%m/%Y")} ---')
+        t0 = time.perf_counter()
+        total = 0
+        for i in range(opts['empresas']):
+            empresa, usuarios, batidas = gerar_empresa(
+                i, opts['usuarios'], inicio, fim,
+                seed=opts['seed'], prob_falta=opts['prob_falta'],
+                prefixo=opts['prefixo'], tamanho_lote=opts['lote'],
+            )
+            total += batidas
+            self.stdout.write(f'{empresa.nome}: {len(usuarios)} usuários, {batidas} batidas')
+
+        duracao = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f'Concluído! {total} batidas em {duracao:.1f}s ({total / max(duracao, 0.001):.0f} batidas/s).'
+        ))
+
+    def _data(self, texto):
         try:
-            usuario = Usuario.objects.filter(username__iexact=USERNAME).first()
-            if not usuario:
-                self.stdout.write(self.style.WARNING(f'Criando usuário {USERNAME}...'))
-                usuario = Usuario.objects.create_user(username=USERNAME, password='123', email='kleisley@exemplo.com')
-                empresa = Empresa.objects.first()
-                if empresa:
-                    usuario.empresa = empresa
-                    usuario.save()
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Erro usuário: {str(e)}'))
-            return
-
-        # 2. Dados Limpos (Entrada, Minutos Almoço, Saída)
-        # Ordem sequencial de dias trabalhados
-        dados_trabalho = [
-            ("08:30", 20, "17:57"), # Dia 01
-            ("08:30", 25, "17:24"), # Dia 02
-            ("08:30", 30, "15:50"), # Dia 03
-            ("08:30", 30, "15:45"), # ...
-            ("08:30", 20, "17:23"),
-            ("08:30", 25, "17:05"),
-            ("12:56", 0,  "17:00"), # Dia 07 (Sem almoço)
-            ("08:33", 30, "15:15"),
-            ("08:32", 22, "16:33"),
-            ("08:25", 23, "15:55"),
-            ("08:30", 30, "16:02"),
-            ("08:23", 20, "15:06"),
-            ("08:32", 30, "15:45"),
-            ("08:11", 10, "15:00"),
-            ("08:26", 20, "16:01"),
-            ("08:37", 17, "17:00"),
-            ("08:05", 0,  "14:05"), # Dia 19 (Sem almoço)
-            ("08:30", 25, "17:06"),
-            ("08:20", 30, "15:50"),
-            ("08:26", 12, "16:27"),
-            ("08:30", 30, "15:15"), # Dia 23 (Estimado tratado como normal)
-            ("08:28", 30, "15:55"),
-            ("08:36", 20, "15:15"),
-            ("08:28", 20, "16:00"),
-            ("08:24", 26, "17:05"),
-            ("08:30", 10, "17:15"),
-            ("08:30", 20, "15:35"),
-            ("08:30", 20, "17:00"),
-            ("08:30", 20, "17:05")  # Dia 31 (Último registro)
-        ]
-
-        # 3. Processamento Inteligente
-        data_cursor = DATA_INICIAL
-        contador = 0
-
-        self.stdout.write(f'--- Iniciando importação a partir de {data_cursor.strftime("%d/%m/%Y")} ---')
-
-        for str_ent, min_almoco, str_sai in dados_trabalho:
-            
-            # --- LOOP PARA ENCONTRAR O PRÓXIMO DIA ÚTIL ---
-            while True:
-                # 0=Seg, 5=Sab, 6=Dom
-                eh_fim_de_semana = data_cursor.weekday() >= 5
-                eh_feriado = data_cursor in FERIADOS
-
-                if eh_fim_de_semana or eh_feriado:
-                    motivo = "Fim de Semana" if eh_fim_de_semana else "Feriado"
-                    # self.stdout.write(f'Pulando {data_cursor} ({motivo})') # Descomente se quiser ver o log pulando
-                    data_cursor += timedelta(days=1)
-                else:
-                    # Achamos um dia útil!
-                    break
-            # -----------------------------------------------
-
-            self.stdout.write(f'Gravando dados no dia: {data_cursor.strftime("%d/%m/%Y")}')
-
-            # Parse das horas
-            h_ent, m_ent = map(int, str_ent.split(':'))
-            h_sai, m_sai = map(int, str_sai.split(':'))
-
-            # 1. ENTRADA
-            dt_entrada = timezone.make_aware(datetime.combine(data_cursor, time(h_ent, m_ent)))
-            self._criar_ponto(usuario, dt_entrada, 'ENTRADA')
-            contador += 1
-
-            # 2. ALMOÇO (Se houver)
-            if min_almoco > 0:
-                # Define Saída almoço padrão as 12:00
-                hora_almoco = 12
-                # Se a pessoa chegou depois das 12:00, ajusta almoço (não deve acontecer nesses dados, mas previne erro)
-                if h_ent >= 12: 
-                    hora_almoco = h_ent + 1
-
-                dt_saida_almoco = timezone.make_aware(datetime.combine(data_cursor, time(hora_almoco, 0)))
-                dt_volta_almoco = dt_saida_almoco + timedelta(minutes=min_almoco)
-
-                self._criar_ponto(usuario, dt_saida_almoco, 'SAIDA_ALMOCO')
-                self._criar_ponto(usuario, dt_volta_almoco, 'VOLTA_ALMOCO')
-                contador += 2
-
-            # 3. SAÍDA
-            dt_saida = timezone.make_aware(datetime.combine(data_cursor, time(h_sai, m_sai)))
-            self._criar_ponto(usuario, dt_saida, 'SAIDA')
-            contador += 1
-            
-            # Avança o cursor para o dia seguinte antes da próxima iteração
-            data_cursor += timedelta(days=1)
-
-        self.stdout.write(self.style.SUCCESS(f'Concluído! {contador} batidas registradas.'))
-
-    def _criar_ponto(self, usuario, data_hora, tipo):
-        if not RegistroPonto.objects.filter(usuario=usuario, data_hora=data_hora).exists():
-            RegistroPonto.objects.create(
-                usuario=usuario,
-                tipo=tipo,
-                data_hora=data_hora,
-                localizacao_valida=True,
-                editado_manualmente=True,
-                observacao="Importação Automática"
-            )
\ No newline at end of file
+            return datetime.strptime(texto, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Data inválida: {texto} (use AAAA-MM-DD)')
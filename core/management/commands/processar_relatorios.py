@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import relatorios
+
+
+class Command(BaseCommand):
+    help = 'Worker da fila de relatórios: gera os PDFs pendentes fora da requisição'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help='Processa o que estiver pendente e sai')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera com a fila vazia')
+
+    def handle(self, *args, **opts):
+        self.stdout.write('Worker de relatórios iniciado.')
+        while True:
+            tarefa = relatorios.reservar_proxima()
+            if tarefa is None:
+                if opts['uma_vez']:
+                    break
+                time.sleep(opts['intervalo'])
+                continue
+
+            tarefa = relatorios.processar(tarefa)
+            if tarefa.status == 'CONCLUIDO':
+                self.stdout.write(self.style.SUCCESS(f'OK {tarefa}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'ERRO {tarefa}: {tarefa.erro}'))
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import geofence, roteador, status_dia, versoes
+from core.models import Usuario, RegistroPonto
+
+
+class Command(BaseCommand):
+    help = 'Recalcula localizacao_valida das batidas com base nos locais de trabalho atuais das empresas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='CNPJ da empresa (padrão: todas)')
+        parser.add_argument('--desde', help='Data inicial AAAA-MM-DD')
+        parser.add_argument('--ate', help='Data final AAAA-MM-DD')
+        parser.add_argument('--lote', type=int, default=2000, help='Tamanho do lote de leitura/atualização')
+        parser.add_argument('--dry-run', action='store_true', help='Só conta o que mudaria')
+
+    def handle(self, *args, **opts):
+        registros = RegistroPonto.objects.all()
+        if opts['empresa']:
+            if not Usuario.objects.filter(empresa__cnpj=opts['empresa']).exists():
+                raise CommandError(f"Nenhum usuário para a empresa {opts['empresa']}")
+            registros = registros.filter(usuario__empresa__cnpj=opts['empresa'])
+        if opts['desde']:
+            registros = registros.filter(data_hora__gte=self._data(opts['desde']))
+        if opts['ate']:
+            registros = registros.filter(data_hora__lt=self._data(opts['ate'], fim=True))
+
+        indices = {}
+        mudancas = {True: [], False: []}  # valida -> [(pk, usuario_id, data_local)]
+        lidos = alterados = 0
+
+        # Os campos do usuário vêm no mesmo JOIN: nada de carregar todos os usuários em memória
+        linhas = registros.order_by().values_list(
+            'id', 'usuario_id', 'data_local', 'latitude', 'longitude', 'localizacao_valida',
+            'usuario__empresa_id', 'usuario__trabalho_hibrido',
+        )
+        for pk, usuario_id, dia, lat, lon, valida_atual, empresa_id, hibrido in linhas.iterator(chunk_size=opts['lote']):
+            lidos += 1
+            indice = None
+            if empresa_id:
+                indice = indices.get(empresa_id)
+                if indice is None:
+                    indice = indices[empresa_id] = geofence.IndiceGeografico.montar(empresa_id)
+
+            valida = geofence.validar_coordenadas(empresa_id, hibrido, lat, lon, indice)
+            if valida != valida_atual:
+                mudancas[valida].append((pk, usuario_id, dia))
+                alterados += 1
+                if len(mudancas[valida]) >= opts['lote']:
+                    self._gravar(mudancas, valida, opts['dry_run'])
+
+        for valida in (True, False):
+            self._gravar(mudancas, valida, opts['dry_run'])
+
+        prefixo = '[dry-run] ' if opts['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefixo}{lidos} batidas verificadas, {alterados} alteradas.'))
+
+    def _gravar(self, mudancas, valida, dry_run):
+        if mudancas[valida] and not dry_run:
+            RegistroPonto.objects.filter(pk__in=[pk for pk, _, _ in mudancas[valida]]).update(
+                localizacao_valida=valida, atualizado_em=timezone.now(),
+            )
+            # update() não dispara signals: status do dia (e ETags) mostram localizacao_valida
+            usuario_ids = set()
+            for _, usuario_id, dia in mudancas[valida]:
+                status_dia.invalidar(usuario_id, dia)
+                usuario_ids.add(usuario_id)
+            for usuario_id in usuario_ids:
+                roteador.marcar_escrita(usuario_id)
+            versoes.incrementar_usuario(*usuario_ids)
+        mudancas[valida] = []
+
+    def _data(self, texto, fim=False):
+        try:
+            dia = datetime.strptime(texto, '%Y-%m-%d')
+        except ValueError:
+            raise CommandError(f'Data inválida: {texto} (use AAAA-MM-DD)')
+        if fim:
+            dia += timedelta(days=1)
+        return timezone.make_aware(dia)
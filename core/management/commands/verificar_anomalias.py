@@ -0,0 +1,57 @@
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import anomalias
+from core.models import Anomalia, Empresa
+
+
+class Command(BaseCommand):
+    help = ('Procura dias com batidas ímpares, sem SAIDA, fora de ordem ou faltas em dias de trabalho '
+            'e grava as anomalias (para rodar toda noite; padrão: ontem)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Data inicial AAAA-MM-DD (padrão: ontem)')
+        parser.add_argument('--ate', help='Data final AAAA-MM-DD (padrão: ontem)')
+        parser.add_argument('--empresa', help='CNPJ da empresa (padrão: todas)')
+        parser.add_argument('--lote', type=int, default=anomalias.LOTE_PADRAO, help='Batidas lidas do banco por vez')
+        parser.add_argument('--dry-run', action='store_true', help='Só conta, sem gravar')
+
+    def handle(self, *args, **opts):
+        ontem = timezone.localdate() - timedelta(days=1)
+        inicio = self._data(opts['desde']) if opts['desde'] else ontem
+        fim = self._data(opts['ate']) if opts['ate'] else ontem
+        if inicio > fim:
+            raise CommandError('Data inicial posterior à final.')
+        if fim >= timezone.localdate():
+            raise CommandError('O dia de hoje ainda está em andamento: use --ate até ontem.')
+
+        empresa_id = None
+        if opts['empresa']:
+            empresa_id = Empresa.objects.filter(cnpj=opts['empresa']).values_list('pk', flat=True).first()
+            if empresa_id is None:
+                raise CommandError(f"Empresa {opts['empresa']} não encontrada")
+
+        t0 = time.perf_counter()
+        if opts['dry_run']:
+            encontradas = anomalias.varrer(inicio, fim, empresa_id, opts['lote'])
+        else:
+            encontradas = anomalias.registrar(inicio, fim, empresa_id, opts['lote'])
+
+        nomes = dict(Anomalia.TIPO_ANOMALIA)
+        for tipo, quantidade in sorted(Counter(a.tipo for a in encontradas).items()):
+            self.stdout.write(f'{nomes[tipo]}: {quantidade}')
+        prefixo = '[dry-run] ' if opts['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixo}{len(encontradas)} anomalias de {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')} "
+            f"em {time.perf_counter() - t0:.1f}s."
+        ))
+
+    def _data(self, texto):
+        try:
+            return datetime.strptime(texto, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Data inválida: {texto} (use AAAA-MM-DD)')
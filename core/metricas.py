@@ -0,0 +1,123 @@
+"""
+Métricas em memória no formato texto do Prometheus (exposto em /api/metrics).
+
+Contadores e histogramas simples, protegidos por lock, sem dependência externa.
+Os valores são por processo: com vários workers do gunicorn, cada um expõe os seus
+(o Prometheus agrega pelas labels de instância).
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRO = []
+
+
+def _formatar_labels(chave):
+    if not chave:
+        return ''
+    conteudo = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in chave)
+    return '{' + conteudo + '}'
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores = {}
+        self._lock = threading.Lock()
+        _REGISTRO.append(self)
+
+    def inc(self, valor=1, **labels):
+        chave = tuple(sorted(labels.items()))
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def amostras(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        for chave, valor in itens:
+            yield f'{self.nome}{_formatar_labels(chave)} {valor}'
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, buckets=BUCKETS_PADRAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = tuple(buckets)
+        self._valores = {}  # chave -> [contagem por bucket..., soma, total]
+        self._lock = threading.Lock()
+        _REGISTRO.append(self)
+
+    def observar(self, valor, **labels):
+        chave = tuple(sorted(labels.items()))
+        with self._lock:
+            estado = self._valores.get(chave)
+            if estado is None:
+                estado = self._valores[chave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    estado[i] += 1
+            estado[-2] += valor
+            estado[-1] += 1
+
+    def amostras(self):
+        with self._lock:
+            itens = [(chave, list(estado)) for chave, estado in self._valores.items()]
+        for chave, estado in itens:
+            for limite, contagem in zip(self.buckets, estado):
+                yield f'{self.nome}_bucket{_formatar_labels(chave + (("le", limite),))} {contagem}'
+            yield f'{self.nome}_bucket{_formatar_labels(chave + (("le", "+Inf"),))} {estado[-1]}'
+            yield f'{self.nome}_sum{_formatar_labels(chave)} {estado[-2]}'
+            yield f'{self.nome}_count{_formatar_labels(chave)} {estado[-1]}'
+
+
+def exportar():
+    linhas = []
+    for metrica in _REGISTRO:
+        linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+        linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+        linhas.extend(metrica.amostras())
+    return '\n'.join(linhas) + '\n'
+
+
+# --- MÉTRICAS DA APLICAÇÃO ---
+REQUISICOES = Contador('ponto_http_requisicoes_total', 'Requisições HTTP por rota, método e status')
+LATENCIA = Histograma('ponto_http_latencia_segundos', 'Latência das requisições HTTP por rota')
+QUERIES = Contador('ponto_db_queries_total', 'Queries SQL executadas, por rota')
+TEMPO_DB = Contador('ponto_db_tempo_segundos_total', 'Tempo gasto em queries SQL, por rota')
+QUERIES_POR_REQUISICAO = Histograma('ponto_db_queries_por_requisicao', 'Queries SQL por requisição',
+                                    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 1000))
+ETAPAS = Histograma('ponto_etapa_segundos', 'Duração de etapas internas (apuração, PDF, ...)')
+
+
+@contextmanager
+def cronometro(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        ETAPAS.observar(time.perf_counter() - inicio, etapa=etapa)
+
+
+def cronometrado(etapa):
+    """Decorator: mede a função inteira como a etapa informada."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with cronometro(etapa):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cronometrar_gerador(etapa, gerador):
+    """Mede um gerador do primeiro ao último item (ex: PDF em streaming)."""
+    with cronometro(etapa):
+        yield from gerador
@@ -0,0 +1,88 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metricas
+
+# [queries, segundos] da requisição em andamento. Um ContextVar (e não a conexão da thread
+# do middleware) porque no ASGI as queries rodam em threads do sync_to_async, que herdam o contexto.
+_contagem = ContextVar('metricas_contagem', default=None)
+
+
+def _medir_query(execute, sql, params, many, context):
+    contagem = _contagem.get()
+    if contagem is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        contagem[0] += 1
+        contagem[1] += time.perf_counter() - inicio
+
+
+@receiver(connection_created)
+def instalar_medicao(sender, connection, **kwargs):
+    """Toda conexão, em qualquer thread, passa pelo contador ao ser aberta."""
+    if _medir_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_query)
+
+
+class MetricasMiddleware:
+    """
+    Conta requisições, latência e queries SQL por rota (padrão da URL, não o caminho,
+    para manter a cardinalidade baixa). As queries são medidas com execute_wrapper,
+    sem depender de DEBUG, instalado em cada conexão ao abrir (connection_created).
+    Funciona em WSGI e ASGI (não força views async para thread).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        contagem = [0, 0.0]
+        inicio = time.perf_counter()
+        with self._medir_queries(contagem):
+            response = self.get_response(request)
+        self._registrar(request, response, time.perf_counter() - inicio, contagem)
+        return response
+
+    async def _acall(self, request):
+        contagem = [0, 0.0]
+        inicio = time.perf_counter()
+        with self._medir_queries(contagem):
+            response = await self.get_response(request)
+        self._registrar(request, response, time.perf_counter() - inicio, contagem)
+        return response
+
+    @contextmanager
+    def _medir_queries(self, contagem):
+        """contagem = [queries, segundos], acumulada em todas as conexões e threads da requisição."""
+        # Conexões desta thread abertas antes do app carregar não passaram pelo signal
+        for conexao in connections.all(initialized_only=True):
+            instalar_medicao(None, conexao)
+        token = _contagem.set(contagem)
+        try:
+            yield
+        finally:
+            _contagem.reset(token)
+
+    def _registrar(self, request, response, duracao, contagem):
+        match = getattr(request, 'resolver_match', None)
+        rota = '/' + match.route if match and match.route else 'desconhecida'
+        metricas.REQUISICOES.inc(rota=rota, metodo=request.method, status=response.status_code)
+        metricas.LATENCIA.observar(duracao, rota=rota)
+        metricas.QUERIES.inc(contagem[0], rota=rota)
+        metricas.TEMPO_DB.inc(contagem[1], rota=rota)
+        metricas.QUERIES_POR_REQUISICAO.observar(contagem[0], rota=rota)
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:47
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recesso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiario',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('data', models.DateField()),
+                ('tipo_dia', models.CharField(choices=[('TRABALHO', 'Dia de Trabalho'), ('FOLGA', 'Folga'), ('FERIADO', 'Feriado'), ('RECESSO', 'Recesso'), ('FALTA', 'Falta')], max_length=10)),
+                ('minutos_trabalhados', models.IntegerField(default=0)),
+                ('minutos_meta', models.IntegerField(default=0)),
+                ('saldo_dia', models.IntegerField(default=0, help_text='Trabalhado - Meta, em minutos')),
+                ('saldo_acumulado', models.IntegerField(default=0, help_text='Banco de horas até este dia (inclusive), em minutos')),
+                ('qtd_registros', models.PositiveSmallIntegerField(default=0)),
+                ('em_andamento', models.BooleanField(default=False)),
+                ('fechado', models.BooleanField(default=False)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário',
+                'verbose_name_plural': 'Saldos Diários',
+                'ordering': ['data'],
+                'unique_together': {('usuario', 'data')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_saldodiario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroponto',
+            name='id_cliente',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='registroponto',
+            unique_together={('usuario', 'id_cliente')},
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:50
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_registroponto_id_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocalTrabalho',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('nome', models.CharField(help_text='Ex: Filial Centro, Obra Av. Brasil', max_length=100)),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('raio_permitido_metros', models.IntegerField(default=50, help_text='Raio em metros para permitir o ponto')),
+                ('ativo', models.BooleanField(default=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locais', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Local de Trabalho',
+                'verbose_name_plural': 'Locais de Trabalho',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:14
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tarefarelatorio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='arquivado_ate',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArquivoMensal',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês')),
+                ('batidas', models.BinaryField(help_text='Instantes (µs desde 1970, UTC) e tipos empacotados')),
+                ('qtd_registros', models.PositiveIntegerField(default=0)),
+                ('dias_com_registro', models.PositiveSmallIntegerField(default=0)),
+                ('minutos_trabalhados', models.PositiveIntegerField(default=0)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arquivos_mensais', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Arquivo Mensal',
+                'verbose_name_plural': 'Arquivos Mensais',
+                'ordering': ['competencia'],
+                'unique_together': {('usuario', 'competencia')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:17
+
+import core.models
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_data_local(apps, schema_editor):
+    """Backfill em lotes: data local (TIME_ZONE) de cada batida existente."""
+    RegistroPonto = apps.get_model('core', 'RegistroPonto')
+    banco = schema_editor.connection.alias
+    registros = RegistroPonto.objects.using(banco).only('id', 'data_hora').order_by('pk')
+    ultimo = None
+    while True:
+        # Paginação pela PK: cada lote é um range scan, sem reler o que já foi preenchido
+        lote = list((registros.filter(pk__gt=ultimo) if ultimo else registros)[:2000])
+        if not lote:
+            break
+        for registro in lote:
+            registro.data_local = timezone.localtime(registro.data_hora).date()
+        RegistroPonto.objects.using(banco).bulk_update(lote, ['data_local'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_arquivomensal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroponto',
+            name='data_local',
+            field=core.models.DataLocalField(null=True),
+        ),
+        migrations.RunPython(preencher_data_local, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='registroponto',
+            name='data_local',
+            field=core.models.DataLocalField(),
+        ),
+        migrations.AddIndex(
+            model_name='registroponto',
+            index=models.Index(fields=['usuario', 'data_local', 'data_hora'], name='core_regist_usuario_7def4f_idx'),
+        ),
+    ]
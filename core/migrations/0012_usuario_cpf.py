@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_registroponto_data_local'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='cpf',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Somente números. Identifica o funcionário no AFD (Portaria 671)', max_length=11),
+        ),
+    ]
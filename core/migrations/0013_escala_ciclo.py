@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-17 22:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_usuario_cpf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escala',
+            name='inicio_ciclo',
+            field=models.DateField(blank=True, help_text='Data do primeiro dia do padrão do ciclo', null=True),
+        ),
+        migrations.AddField(
+            model_name='escala',
+            name='padrao_ciclo',
+            field=models.CharField(blank=True, default='', help_text='Dias do ciclo a partir de inicio_ciclo: 1 = trabalha, 0 = folga. Ex: 12x36 = 10, 6x1 = 1111110, sábado sim/sábado não = 11111101111100. Vazio = dias da semana.', max_length=62, validators=[django.core.validators.RegexValidator('^[01]+$', 'Use apenas 1 (trabalha) e 0 (folga).')]),
+        ),
+    ]
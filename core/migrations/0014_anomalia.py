@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_escala_ciclo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Anomalia',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('data', models.DateField()),
+                ('tipo', models.CharField(choices=[('IMPAR', 'Número ímpar de batidas'), ('SEM_SAIDA', 'Dia sem SAIDA'), ('FORA_DE_ORDEM', 'Batidas fora de ordem'), ('FALTA', 'Falta em dia de trabalho')], max_length=20)),
+                ('detalhe', models.CharField(blank=True, help_text='Ex: sequência de batidas do dia', max_length=255)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalias', to='core.empresa')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Anomalia',
+                'verbose_name_plural': 'Anomalias',
+                'ordering': ['data'],
+                'indexes': [models.Index(fields=['empresa', 'data'], name='core_anomal_empresa_ccab0e_idx')],
+                'unique_together': {('usuario', 'data', 'tipo')},
+            },
+        ),
+    ]
@@ -1,6 +1,9 @@
 import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from datetime import timedelta
 
@@ -13,6 +16,30 @@ class ModeloBase(models.Model):
     class Meta:
         abstract = True
 
+class DataLocalField(models.DateField):
+    """
+    Data local (TIME_ZONE) de um campo datetime do mesmo modelo, gravada junto com ele.
+    Calculada no pre_save do campo, que roda tanto no save() quanto no bulk_create().
+    """
+    def __init__(self, *args, origem='data_hora', **kwargs):
+        self.origem = origem
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.origem != 'data_hora':
+            kwargs['origem'] = self.origem
+        if kwargs.get('editable') is False:
+            del kwargs['editable']
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        momento = getattr(model_instance, self.origem)
+        valor = timezone.localtime(momento).date() if momento else None
+        setattr(model_instance, self.attname, valor)
+        return valor
+
 # --- 2. EMPRESA ---
 class Empresa(ModeloBase):
     nome = models.CharField(max_length=255)
@@ -24,6 +51,22 @@ class Empresa(ModeloBase):
     def __str__(self):
         return self.nome
 
+# --- 2.1 LOCAIS DE TRABALHO (Filiais / Obras) ---
+class LocalTrabalho(ModeloBase):
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='locais')
+    nome = models.CharField(max_length=100, help_text="Ex: Filial Centro, Obra Av. Brasil")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    raio_permitido_metros = models.IntegerField(default=50, help_text="Raio em metros para permitir o ponto")
+    ativo = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = 'Local de Trabalho'
+        verbose_name_plural = 'Locais de Trabalho'
+
+    def __str__(self):
+        return f"{self.nome} ({self.empresa})"
+
 # --- 3. ESCALA (Grupo de Configuração) ---
 class Escala(ModeloBase):
     nome = models.CharField(max_length=50, unique=True, help_text="Ex: Administrativo (Seg-Sex), Escala 12x36")
@@ -39,6 +82,19 @@ class Escala(ModeloBase):
     trabalha_sabado = models.BooleanField(default=False)
     trabalha_domingo = models.BooleanField(default=False)
 
+    # Escalas cíclicas (12x36, 6x1, semanas alternadas): substituem os dias da semana acima
+    padrao_ciclo = models.CharField(
+        max_length=62, blank=True, default='',
+        validators=[RegexValidator(r'^[01]+$', 'Use apenas 1 (trabalha) e 0 (folga).')],
+        help_text="Dias do ciclo a partir de inicio_ciclo: 1 = trabalha, 0 = folga. "
+                  "Ex: 12x36 = 10, 6x1 = 1111110, sábado sim/sábado não = 11111101111100. Vazio = dias da semana."
+    )
+    inicio_ciclo = models.DateField(null=True, blank=True, help_text="Data do primeiro dia do padrão do ciclo")
+
+    def clean(self):
+        if self.padrao_ciclo and not self.inicio_ciclo:
+            raise ValidationError({'inicio_ciclo': 'Informe a data de início do ciclo.'})
+
     def __str__(self):
         return self.nome
 
@@ -52,6 +108,8 @@ class Usuario(AbstractUser):
         ('FUNCIONARIO', 'Funcionário'),
     )
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='FUNCIONARIO')
+    cpf = models.CharField(max_length=11, blank=True, default='', db_index=True,
+                           help_text="Somente números. Identifica o funcionário no AFD (Portaria 671)")
     
     # --- CONFIGURAÇÃO DE JORNADA ---
     # CAMPO PADRONIZADO: carga_horaria_diaria
@@ -77,6 +135,9 @@ class Usuario(AbstractUser):
     trab_sab = models.BooleanField(default=False, verbose_name="Indiv. Sábado")
     trab_dom = models.BooleanField(default=False, verbose_name="Indiv. Domingo")
 
+    # Preenchido pelo comando arquivar_pontos: batidas até esta data estão em ArquivoMensal
+    arquivado_ate = models.DateField(null=True, blank=True, editable=False)
+
     class Meta:
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
@@ -115,6 +176,8 @@ class RegistroPonto(ModeloBase):
 
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='registros')
     data_hora = models.DateTimeField(help_text="Data e hora exata do registro")
+    # Dia de trabalho no fuso de TIME_ZONE: filtros por dia viram range scan no índice, sem converter data_hora
+    data_local = DataLocalField(origem='data_hora')
     tipo = models.CharField(max_length=20, choices=TIPO_BATIDA)
     
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -124,11 +187,146 @@ class RegistroPonto(ModeloBase):
     editado_manualmente = models.BooleanField(default=False)
     observacao = models.TextField(blank=True, null=True)
 
+    # Gerado pelo app para batidas feitas offline: garante que reenviar o lote não duplique
+    id_cliente = models.UUIDField(null=True, blank=True, editable=False)
+
     class Meta:
         ordering = ['-data_hora']
         indexes = [
             models.Index(fields=['usuario', 'data_hora']),
+            # data_hora no fim: o mesmo índice já entrega as batidas de cada dia em ordem
+            models.Index(fields=['usuario', 'data_local', 'data_hora']),
+        ]
+        unique_together = ('usuario', 'id_cliente')
+
+    def __str__(self):
+        return f"{self.usuario.username} - {self.get_tipo_display()} - {self.data_hora}"
+
+# --- 6. SALDO DIÁRIO (Banco de Horas Materializado) ---
+class SaldoDiario(ModeloBase):
+    """
+    Resumo de um dia de um usuário. É mantido incrementalmente (ver core/banco_horas.py)
+    para que o histórico não precise reprocessar todas as batidas a cada requisição.
+    """
+    TIPO_DIA = (
+        ('TRABALHO', 'Dia de Trabalho'),
+        ('FOLGA', 'Folga'),
+        ('FERIADO', 'Feriado'),
+        ('RECESSO', 'Recesso'),
+        ('FALTA', 'Falta'),
+    )
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    tipo_dia = models.CharField(max_length=10, choices=TIPO_DIA)
+
+    minutos_trabalhados = models.IntegerField(default=0)
+    minutos_meta = models.IntegerField(default=0)
+    saldo_dia = models.IntegerField(default=0, help_text="Trabalhado - Meta, em minutos")
+    saldo_acumulado = models.IntegerField(default=0, help_text="Banco de horas até este dia (inclusive), em minutos")
+    qtd_registros = models.PositiveSmallIntegerField(default=0)
+
+    # Dia de hoje ainda sem SAIDA: o saldo do dia não entra no acumulado
+    em_andamento = models.BooleanField(default=False)
+    # False = linha provisória (dia corrente no momento do cálculo), será recalculada
+    fechado = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['data']
+        unique_together = ('usuario', 'data')
+        verbose_name = 'Saldo Diário'
+        verbose_name_plural = 'Saldos Diários'
+
+    def __str__(self):
+        return f"{self.usuario.username} - {self.data.strftime('%d/%m/%Y')} ({self.saldo_dia:+d} min)"
+
+
+# --- 7. TAREFAS DE RELATÓRIO (Fila em Banco) ---
+class TarefaRelatorio(ModeloBase):
+    """Pedido de espelho de ponto em PDF, processado fora da requisição (manage.py processar_relatorios)."""
+    STATUS_CHOICES = (
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    )
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='tarefas_relatorio')
+    data_inicio = models.DateField()
+    data_fim = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+
+    # Hash de (usuário, período, versão dos dados): PDFs iguais compartilham o mesmo arquivo
+    chave = models.CharField(max_length=64)
+    arquivo = models.CharField(max_length=255, blank=True, help_text="Caminho no storage padrão")
+    erro = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['criado_em']
+        indexes = [
+            models.Index(fields=['status', 'criado_em']),
+            models.Index(fields=['chave']),
+        ]
+        verbose_name = 'Tarefa de Relatório'
+        verbose_name_plural = 'Tarefas de Relatório'
+
+    def __str__(self):
+        return f"{self.usuario.username} {self.data_inicio} a {self.data_fim} ({self.status})"
+
+
+# --- 8. ARQUIVO MENSAL (Batidas de Períodos Fechados) ---
+class ArquivoMensal(ModeloBase):
+    """
+    Todas as batidas de um usuário em um mês fechado numa única linha, compactadas
+    (ver core/arquivo.py). Mantém RegistroPonto e seu índice pequenos; o motor de
+    apuração lê os meses arquivados de forma transparente.
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='arquivos_mensais')
+    competencia = models.DateField(help_text="Primeiro dia do mês")
+    batidas = models.BinaryField(help_text="Instantes (µs desde 1970, UTC) e tipos empacotados")
+
+    # Totais do mês, para consulta sem desempacotar
+    qtd_registros = models.PositiveIntegerField(default=0)
+    dias_com_registro = models.PositiveSmallIntegerField(default=0)
+    minutos_trabalhados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['competencia']
+        unique_together = ('usuario', 'competencia')
+        verbose_name = 'Arquivo Mensal'
+        verbose_name_plural = 'Arquivos Mensais'
+
+    def __str__(self):
+        return f"{self.usuario.username} - {self.competencia.strftime('%m/%Y')}"
+
+
+# --- 9. ANOMALIAS DE PONTO (Varredura Noturna) ---
+class Anomalia(ModeloBase):
+    """Dia com batidas inconsistentes ou falta, encontrado por manage.py verificar_anomalias."""
+    TIPO_ANOMALIA = (
+        ('IMPAR', 'Número ímpar de batidas'),
+        ('SEM_SAIDA', 'Dia sem SAIDA'),
+        ('FORA_DE_ORDEM', 'Batidas fora de ordem'),
+        ('FALTA', 'Falta em dia de trabalho'),
+    )
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='anomalias')
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='anomalias')
+    data = models.DateField()
+    tipo = models.CharField(max_length=20, choices=TIPO_ANOMALIA)
+    detalhe = models.CharField(max_length=255, blank=True, help_text="Ex: sequência de batidas do dia")
+
+    class Meta:
+        ordering = ['data']
+        unique_together = ('usuario', 'data', 'tipo')
+        indexes = [
+            models.Index(fields=['empresa', 'data']),
         ]
+        verbose_name = 'Anomalia'
+        verbose_name_plural = 'Anomalias'
 
     def __str__(self):
-        return f"{self.usuario.username} - {self.get_tipo_display()} - {self.data_hora}"
\ No newline at end of file
+        return f"{self.usuario.username} - {self.data.strftime('%d/%m/%Y')} - {self.get_tipo_display()}"
@@ -0,0 +1,46 @@
+"""
+Paginação por cursor (keyset) em (data_hora, id), do mais recente para o mais antigo.
+
+Cada página é "WHERE (data_hora, id) < cursor ORDER BY data_hora DESC, id DESC LIMIT n",
+um range scan no índice de RegistroPonto: o custo é o mesmo na primeira página ou na
+milésima, ao contrário de OFFSET, que lê e descarta todas as linhas anteriores.
+"""
+import base64
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(registro):
+    bruto = f'{registro.data_hora.isoformat()}|{registro.pk}'
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(texto):
+    try:
+        bruto = base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4)).decode()
+        data_hora, pk = bruto.split('|')
+        return datetime.fromisoformat(data_hora), uuid.UUID(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise CursorInvalido(str(e))
+
+
+def paginar(queryset, cursor=None, limite=LIMITE_PADRAO):
+    """Retorna (registros, proximo_cursor). proximo_cursor é None na última página."""
+    queryset = queryset.order_by('-data_hora', '-id')
+    if cursor:
+        data_hora, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(Q(data_hora__lt=data_hora) | Q(data_hora=data_hora, id__lt=pk))
+    # Um a mais para saber se existe próxima página sem COUNT
+    registros = list(queryset[:limite + 1])
+    if len(registros) > limite:
+        return registros[:limite], codificar_cursor(registros[limite - 1])
+    return registros, None
@@ -0,0 +1,107 @@
+"""
+Painel do banco de horas da empresa inteira.
+
+Calculado em conjunto: uma query traz as batidas de todos os funcionários no período,
+o calendário da empresa é montado uma vez e a jornada é resolvida uma vez por regra
+(escala/configuração), sendo reaproveitada entre os usuários que a compartilham.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+import heapq
+from operator import itemgetter
+
+from . import agregacao_sql, arquivo, metricas
+from .apuracao import apurar_periodo, apurar_periodo_resumido, resolver_jornada
+from .calendario import obter_calendario
+from .models import RegistroPonto, Usuario
+
+
+def _chave_jornada(usuario):
+    if usuario.usar_configuracao_individual:
+        return ('individual', usuario.trab_seg, usuario.trab_ter, usuario.trab_qua, usuario.trab_qui,
+                usuario.trab_sex, usuario.trab_sab, usuario.trab_dom, usuario.carga_horaria_diaria)
+    return ('escala', usuario.escala_id, usuario.carga_horaria_diaria)
+
+
+@metricas.cronometrado('painel_banco_horas')
+def banco_horas_empresa(empresa_id, d_inicio, d_fim, hoje=None, via_sql=None):
+    """
+    via_sql=True soma as horas no próprio banco (core/agregacao_sql.py) em vez de
+    trazer as batidas para o Python. Padrão: settings.PONTO_AGREGACAO_SQL.
+    Dias depois de hoje não entram (ainda não há o que apurar, só a meta negativa).
+    """
+    hoje = hoje or timezone.localdate()
+    d_fim = min(d_fim, hoje)
+    if via_sql is None:
+        via_sql = settings.PONTO_AGREGACAO_SQL
+    if via_sql and not agregacao_sql.suportado():
+        via_sql = False  # banco sem a expressão SQL: mesma soma em Python
+    usuarios = list(Usuario.objects.filter(empresa_id=empresa_id, is_active=True)
+                    .select_related('escala').order_by('username'))
+    ids = [u.pk for u in usuarios]
+
+    # 1. Todas as batidas do período em uma única query, agrupadas por usuário
+    resumos = {}
+    batidas_por_usuario = {pk: [] for pk in ids}
+    if via_sql:
+        resumos = agregacao_sql.minutos_por_dia(ids, d_inicio, d_fim)
+    else:
+        for usuario_id, data_hora, tipo in RegistroPonto.objects.filter(
+            usuario_id__in=ids,
+            data_local__gte=d_inicio,
+            data_local__lte=d_fim,
+        ).order_by('usuario_id', 'data_hora').values_list('usuario_id', 'data_hora', 'tipo').iterator(chunk_size=5000):
+            batidas_por_usuario[usuario_id].append((data_hora, tipo))
+
+    # 1.1 Meses arquivados (core/arquivo.py): uma query para todos os usuários com arquivo no período
+    com_arquivo = [u for u in usuarios if arquivo.cobre(u, d_inicio)]
+    if com_arquivo:
+        fim_arquivo = min(d_fim, max(u.arquivado_ate for u in com_arquivo))
+        ids_arquivo = [u.pk for u in com_arquivo]
+        arquivadas = arquivo.batidas_arquivadas_em_lote(ids_arquivo, d_inicio, fim_arquivo)
+        if via_sql:
+            # Dias arquivados são somados em Python com todas as batidas do dia (arquivo + eventuais vivas)
+            for usuario_id, data_hora, tipo in RegistroPonto.objects.filter(
+                usuario_id__in=ids_arquivo,
+                data_local__gte=d_inicio,
+                data_local__lte=fim_arquivo,
+            ).order_by('usuario_id', 'data_hora').values_list('usuario_id', 'data_hora', 'tipo'):
+                batidas_por_usuario[usuario_id].append((data_hora, tipo))
+        for pk, batidas in arquivadas.items():
+            juntas = list(heapq.merge(batidas, batidas_por_usuario[pk], key=itemgetter(0)))
+            if via_sql:
+                resumos.setdefault(pk, {}).update(arquivo.resumir(juntas))
+            else:
+                batidas_por_usuario[pk] = juntas
+
+    # 2. Calendário e regras de jornada compartilhados
+    calendario = obter_calendario(empresa_id)
+    jornadas = {}
+
+    resultado = []
+    for usuario in usuarios:
+        chave = _chave_jornada(usuario)
+        if chave not in jornadas:
+            jornadas[chave] = resolver_jornada(usuario)
+
+        inicio = max(d_inicio, usuario.data_inicio_apuracao) if usuario.data_inicio_apuracao else d_inicio
+        trabalhados = saldo = faltas = 0
+        if via_sql:
+            dias = apurar_periodo_resumido(usuario, inicio, d_fim, resumos.get(usuario.pk, {}), hoje=hoje,
+                                           jornada=jornadas[chave], calendario=calendario)
+        else:
+            dias = apurar_periodo(usuario, inicio, d_fim, hoje=hoje, jornada=jornadas[chave],
+                                  batidas=batidas_por_usuario[usuario.pk], calendario=calendario)
+        for dia in dias:
+            trabalhados += dia.minutos_trabalhados
+            saldo += dia.saldo_contabilizado
+            faltas += dia.tipo_dia == 'FALTA'
+
+        resultado.append({
+            'usuario': usuario,
+            'minutos_trabalhados': trabalhados,
+            'saldo_minutos': saldo,
+            'faltas': faltas,
+        })
+    return resultado
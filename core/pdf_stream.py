@@ -0,0 +1,149 @@
+"""
+Escritor de PDF em streaming para o espelho de ponto.
+
+O canvas do ReportLab monta o documento inteiro em memória antes do save().
+Aqui cada página é serializada e enviada assim que fica pronta: só o número e o
+deslocamento (offset) de cada objeto ficam guardados para a tabela xref final,
+então o consumo de memória não depende do tamanho do período.
+
+O layout é o mesmo do relatório em ReportLab (A4, Helvetica, mesmas colunas).
+"""
+import zlib
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+
+LARGURA, ALTURA = A4
+
+# Objetos fixos; as páginas começam a partir de PRIMEIRO_OBJETO_PAGINA
+OBJ_PAGINAS, OBJ_CATALOGO, OBJ_FONTE, OBJ_FONTE_NEGRITO = 1, 2, 3, 4
+PRIMEIRO_OBJETO_PAGINA = 5
+
+
+def _texto(valor):
+    """String PDF literal em WinAnsi (acentos do português)."""
+    bruto = str(valor).encode('cp1252', errors='replace')
+    return b'(' + bruto.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class _Pagina:
+    def __init__(self):
+        self.ops = []
+
+    def fonte(self, negrito, tamanho):
+        self.ops.append(b'/%s %d Tf' % (b'F2' if negrito else b'F1', tamanho))
+
+    def cor(self, cor):
+        self.ops.append(b'%g %g %g rg' % cor.rgb())
+
+    def texto(self, x, y, valor):
+        self.ops.append(b'BT %g %g Td %s Tj ET' % (x, y, _texto(valor)))
+
+    def linha(self, x1, y1, x2, y2):
+        self.ops.append(b'%g %g m %g %g l S' % (x1, y1, x2, y2))
+
+    def conteudo(self):
+        return zlib.compress(b'\n'.join(self.ops))
+
+
+class EspelhoPontoStream:
+    """
+    Uso:
+        pdf = EspelhoPontoStream(titulo, periodo)
+        for pedaco in pdf.gerar(linhas):  # linhas: (data, batidas, trab, saldo, cor reportlab)
+            ...
+    """
+
+    def __init__(self, titulo, periodo):
+        self.titulo = titulo
+        self.periodo = periodo
+        self._offset = 0
+        self._offsets = {}
+        self._paginas = []
+        self._proximo_objeto = PRIMEIRO_OBJETO_PAGINA
+
+    def _objeto(self, numero, corpo):
+        self._offsets[numero] = self._offset
+        dados = b'%d 0 obj\n' % numero + corpo + b'\nendobj\n'
+        self._offset += len(dados)
+        return dados
+
+    def _emitir(self, dados):
+        self._offset += len(dados)
+        return dados
+
+    def _fechar_pagina(self, pagina):
+        conteudo = pagina.conteudo()
+        obj_conteudo = self._proximo_objeto
+        obj_pagina = obj_conteudo + 1
+        self._proximo_objeto += 2
+        self._paginas.append(obj_pagina)
+
+        dados = self._objeto(
+            obj_conteudo,
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(conteudo) + conteudo + b'\nendstream'
+        )
+        dados += self._objeto(
+            obj_pagina,
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %g %g] '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>'
+            % (OBJ_PAGINAS, LARGURA, ALTURA, OBJ_FONTE, OBJ_FONTE_NEGRITO, obj_conteudo)
+        )
+        return dados
+
+    def gerar(self, linhas):
+        yield self._emitir(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        fonte = b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+        yield self._objeto(OBJ_FONTE, fonte % b'Helvetica') + self._objeto(OBJ_FONTE_NEGRITO, fonte % b'Helvetica-Bold')
+
+        # --- 1. CABEÇALHO (só na primeira página) ---
+        p = _Pagina()
+        y = ALTURA - 50
+        p.fonte(True, 16)
+        p.texto(50, y, self.titulo)
+        y -= 25
+        p.fonte(False, 12)
+        p.texto(50, y, self.periodo)
+        y -= 30
+
+        # --- 2. COLUNAS ---
+        p.fonte(True, 10)
+        p.texto(40, y, "Data")
+        p.texto(110, y, "Entrada/Saídas")
+        p.texto(380, y, "Trab.")
+        p.texto(450, y, "Saldo")
+        y -= 10
+        p.linha(40, y, 550, y)
+        y -= 15
+        p.fonte(False, 9)
+
+        # --- 3. LINHAS (uma página é enviada assim que enche) ---
+        for str_data, str_batidas, str_trab, str_saldo, cor in linhas:
+            if y < 50:
+                yield self._fechar_pagina(p)
+                p = _Pagina()
+                p.fonte(False, 9)
+                y = ALTURA - 50
+
+            p.cor(cor)
+            p.texto(40, y, str_data)
+            p.texto(110, y, str_batidas[:55])
+            p.texto(380, y, str_trab)
+            p.texto(450, y, str_saldo)
+            y -= 15
+            p.cor(colors.black)
+            p.linha(40, y + 12, 550, y + 12)
+
+        yield self._fechar_pagina(p)
+
+        # --- 4. ÍNDICE (árvore de páginas, catálogo, xref) ---
+        kids = b' '.join(b'%d 0 R' % n for n in self._paginas)
+        yield self._objeto(OBJ_PAGINAS, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._paginas)))
+        yield self._objeto(OBJ_CATALOGO, b'<< /Type /Catalog /Pages %d 0 R >>' % OBJ_PAGINAS)
+
+        total = self._proximo_objeto
+        inicio_xref = self._offset
+        xref = [b'xref\n0 %d\n' % total, b'0000000000 65535 f \n']
+        xref += [b'%010d 00000 n \n' % self._offsets[n] for n in range(1, total)]
+        xref.append(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (total, OBJ_CATALOGO, inicio_xref))
+        yield b''.join(xref)
@@ -0,0 +1,10 @@
+from rest_framework.permissions import BasePermission
+
+
+class IsAdminEmpresa(BasePermission):
+    """Usuário ADMIN vinculado a uma empresa (vê os dados dos funcionários dela)."""
+    message = 'Apenas administradores da empresa podem acessar.'
+
+    def has_permission(self, request, view):
+        usuario = request.user
+        return bool(usuario and usuario.is_authenticated and usuario.tipo == 'ADMIN' and usuario.empresa_id)
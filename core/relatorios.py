@@ -0,0 +1,157 @@
+"""
+Espelho de ponto: linhas do relatório, fila de geração em background e cache de PDFs.
+
+Os PDFs são guardados no storage padrão com o nome derivado de uma chave
+(usuário + período + versão dos dados). Enquanto nenhuma batida, feriado, recesso
+ou regra de jornada mudar, um novo pedido igual reaproveita o arquivo já gerado.
+"""
+import hashlib
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from reportlab.lib import colors
+
+from . import arquivo, metricas
+from .apuracao import apurar_periodo, formatar_minutos, iterar_batidas, resolver_jornada
+from .models import RegistroPonto, Feriado, Recesso, TarefaRelatorio
+from .pdf_stream import EspelhoPontoStream
+
+PASTA_RELATORIOS = 'relatorios'
+
+
+def linhas_espelho(usuario, d_inicio, d_fim, batidas=None):
+    """Linhas do espelho de ponto: (data, batidas, trabalhado, saldo, cor)."""
+    for dia in apurar_periodo(usuario, d_inicio, d_fim, hoje=timezone.localdate(), batidas=batidas):
+        str_data = dia.data.strftime('%d/%m/%Y')
+        str_batidas = " | ".join(hora.strftime('%H:%M') for hora, _ in dia.batidas)
+        str_trab = formatar_minutos(dia.minutos_trabalhados, sinal=False)
+        str_saldo = formatar_minutos(dia.saldo_dia)
+
+        # Ajustes Visuais para Exceções
+        cor_linha = colors.black
+        if dia.eh_folga:
+            str_batidas = "(Feriado)" if dia.tipo_dia == 'FERIADO' else "(Recesso)"
+            str_trab = "-"
+            str_saldo = "-"
+            cor_linha = colors.blue
+        elif dia.tipo_dia == 'FALTA':
+            str_batidas = "FALTA"
+            str_trab = "00:00"
+            # Saldo já calculado como negativo (meta do dia)
+            cor_linha = colors.red
+
+        yield str_data, str_batidas, str_trab, str_saldo, cor_linha
+
+
+def gerar_pdf(usuario, d_inicio, d_fim):
+    """PDF do espelho em pedaços de bytes (streaming, memória constante)."""
+    titulo = f"Espelho de Ponto: {usuario.username}"
+    periodo = f"Período: {d_inicio.strftime('%d/%m/%Y')} a {d_fim.strftime('%d/%m/%Y')}"
+    linhas = linhas_espelho(usuario, d_inicio, d_fim, batidas=iterar_batidas(usuario, d_inicio, d_fim))
+    return metricas.cronometrar_gerador('pdf_stream', EspelhoPontoStream(titulo, periodo).gerar(linhas))
+
+
+# --- CACHE ENDEREÇADO POR CONTEÚDO ---
+def versao_dados(usuario, d_inicio, d_fim):
+    """Impressão digital de tudo que altera o PDF do período (3 queries agregadas, +1 com meses arquivados)."""
+    batidas = RegistroPonto.objects.filter(
+        usuario=usuario, data_local__gte=d_inicio, data_local__lte=d_fim
+    ).aggregate(n=Count('id'), ultima=Max('atualizado_em'))
+    partes = [batidas['n'], batidas['ultima'], resolver_jornada(usuario)]
+    if arquivo.cobre(usuario, d_inicio):
+        arquivadas = arquivo.versao(usuario.pk, d_inicio, d_fim)
+        partes += [arquivadas['n'], arquivadas['ultima']]
+
+    if usuario.empresa_id:
+        for modelo in (Feriado, Recesso):
+            excecoes = modelo.objects.filter(empresa_id=usuario.empresa_id).aggregate(
+                n=Count('id'), ultima=Max('atualizado_em')
+            )
+            partes += [excecoes['n'], excecoes['ultima']]
+
+    # Faltas dependem de "hoje" enquanto o período não terminou
+    hoje = timezone.localdate()
+    if d_fim >= hoje:
+        partes.append(hoje)
+    return repr(partes)
+
+
+def chave_relatorio(usuario, d_inicio, d_fim):
+    bruto = f"{usuario.pk}|{d_inicio}|{d_fim}|{versao_dados(usuario, d_inicio, d_fim)}"
+    return hashlib.sha256(bruto.encode()).hexdigest()
+
+
+def caminho_arquivo(chave):
+    return f"{PASTA_RELATORIOS}/{chave}.pdf"
+
+
+def solicitar(usuario, d_inicio, d_fim):
+    """
+    Retorna a tarefa do pedido: já concluída se o PDF estiver em cache, a mesma tarefa
+    se um pedido igual ainda estiver na fila, ou uma nova tarefa PENDENTE.
+    """
+    chave = chave_relatorio(usuario, d_inicio, d_fim)
+    caminho = caminho_arquivo(chave)
+
+    if default_storage.exists(caminho):
+        return TarefaRelatorio.objects.create(
+            usuario=usuario, data_inicio=d_inicio, data_fim=d_fim, chave=chave,
+            status='CONCLUIDO', arquivo=caminho, concluido_em=timezone.now(),
+        )
+
+    em_andamento = TarefaRelatorio.objects.filter(
+        chave=chave, status__in=('PENDENTE', 'PROCESSANDO')
+    ).first()
+    if em_andamento:
+        return em_andamento
+
+    return TarefaRelatorio.objects.create(usuario=usuario, data_inicio=d_inicio, data_fim=d_fim, chave=chave)
+
+
+# --- WORKER ---
+def reservar_proxima():
+    """
+    Pega a tarefa pendente mais antiga. O UPDATE condicional evita que dois workers peguem a mesma.
+    Tarefas PROCESSANDO iniciadas há mais de PONTO_RELATORIO_LEASE segundos são de um worker que
+    morreu no meio: voltam a ser reservadas, até PONTO_RELATORIO_TENTATIVAS tentativas (depois, ERRO).
+    """
+    agora = timezone.now()
+    abandonadas = Q(status='PROCESSANDO', iniciado_em__lt=agora - timedelta(seconds=settings.PONTO_RELATORIO_LEASE))
+    TarefaRelatorio.objects.filter(abandonadas, tentativas__gte=settings.PONTO_RELATORIO_TENTATIVAS).update(
+        status='ERRO', erro='Worker parou sem concluir a tarefa em todas as tentativas.', concluido_em=agora,
+    )
+    for tarefa in TarefaRelatorio.objects.filter(Q(status='PENDENTE') | abandonadas).order_by('criado_em')[:10]:
+        # iniciado_em muda a cada reserva: dois workers não retomam a mesma tarefa abandonada
+        reservada = TarefaRelatorio.objects.filter(
+            pk=tarefa.pk, status=tarefa.status, iniciado_em=tarefa.iniciado_em,
+        ).update(status='PROCESSANDO', iniciado_em=agora, tentativas=tarefa.tentativas + 1)
+        if reservada:
+            tarefa.refresh_from_db()
+            return tarefa
+    return None
+
+
+def processar(tarefa):
+    caminho = caminho_arquivo(tarefa.chave)
+    try:
+        if not default_storage.exists(caminho):
+            with tempfile.TemporaryFile() as tmp, metricas.cronometro('pdf_fila'):
+                for pedaco in gerar_pdf(tarefa.usuario, tarefa.data_inicio, tarefa.data_fim):
+                    tmp.write(pedaco)
+                tmp.seek(0)
+                caminho = default_storage.save(caminho, File(tmp))
+    except Exception as e:
+        tarefa.status = 'ERRO'
+        tarefa.erro = str(e)
+    else:
+        tarefa.status = 'CONCLUIDO'
+        tarefa.arquivo = caminho
+        tarefa.erro = ''
+    tarefa.concluido_em = timezone.now()
+    tarefa.save()
+    return tarefa
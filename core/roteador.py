@@ -0,0 +1,116 @@
+"""
+Roteamento leitura/escrita com réplica opcional (alias 'replica', via DATABASE_REPLICA_URL).
+
+- Escritas sempre no primário ('default').
+- Leituras só vão para a réplica dentro de leitura_replica() / @usar_replica
+  (relatórios, status, painel); o resto da aplicação lê do primário.
+- Mesmo nessas views, ficam no primário:
+  * leituras dentro de uma transação de escrita (ex: banco_horas.sincronizar);
+  * tabelas mantidas pela própria aplicação (banco de horas, fila de relatórios)
+    e as de autenticação/sessão;
+  * o usuário que gravou batidas há menos de PONTO_REPLICA_JANELA segundos
+    (lê as próprias escritas mesmo com atraso de replicação). A marca fica no cache:
+    com cache local por processo e vários workers (ver core/checks.py) ela não seria
+    vista pelos outros workers, então as leituras de um usuário ficam sempre no primário.
+
+Sem réplica configurada tudo vira no-op e as queries seguem para o 'default'.
+"""
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .checks import cache_coerente
+
+ALIAS_REPLICA = 'replica'
+
+# Lidos sempre do primário, mesmo em views de leitura
+MODELOS_PRIMARIO = {'core.SaldoDiario', 'core.TarefaRelatorio'}
+
+_leitura_replica = ContextVar('leitura_replica', default=False)
+
+
+def replica_configurada():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def _chave_escrita(usuario_id):
+    return f'escrita_recente:{usuario_id}'
+
+
+def marcar_escrita(usuario_id):
+    """Chamado após gravar batidas do usuário: as leituras dele ficam no primário por um tempo."""
+    if replica_configurada():
+        cache.set(_chave_escrita(usuario_id), True, settings.PONTO_REPLICA_JANELA)
+
+
+def _pode_usar_replica(usuario):
+    if not replica_configurada():
+        return False
+    if usuario is None:
+        return True
+    return cache_coerente() and not cache.get(_chave_escrita(usuario.pk))
+
+
+@contextmanager
+def _ativar(ativa):
+    token = _leitura_replica.set(ativa)
+    try:
+        yield
+    finally:
+        _leitura_replica.reset(token)
+
+
+def leitura_replica(usuario=None):
+    return _ativar(_pode_usar_replica(usuario))
+
+
+def iterar_na_replica(iteravel, usuario=None):
+    """
+    Para respostas em streaming, consumidas depois que a view retorna: cada pedaço
+    é gerado dentro do contexto (no ASGI cada next() pode rodar em outro contexto).
+    """
+    ativa = _pode_usar_replica(usuario)
+    iterador = iter(iteravel)
+    while True:
+        with _ativar(ativa):
+            try:
+                pedaco = next(iterador)
+            except StopIteration:
+                return
+        yield pedaco
+
+
+def usar_replica(view):
+    """Decorator para views já autenticadas (em métodos, via method_decorator)."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with leitura_replica(request.user):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class RoteadorReplica:
+    def db_for_read(self, model, **hints):
+        if not _leitura_replica.get():
+            return None
+        if model._meta.app_label != 'core' or model._meta.label in MODELOS_PRIMARIO:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return ALIAS_REPLICA
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sem isso o Django gravaria no banco de onde a instância foi lida
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e primário têm os mesmos dados
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS_REPLICA, None}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o schema pela replicação
+        return db != ALIAS_REPLICA
@@ -1,5 +1,9 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Usuario, Empresa, RegistroPonto
+from .models import Usuario, Empresa, RegistroPonto, TarefaRelatorio
 
 class EmpresaSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,4 +21,41 @@ class RegistroPontoSerializer(serializers.ModelSerializer):
     class Meta:
         model = RegistroPonto
         fields = ['id', 'data_hora', 'tipo', 'latitude', 'longitude', 'localizacao_valida']
-        read_only_fields = ['localizacao_valida'] # O backend calcula isso, o usuário não envia
\ No newline at end of file
+        read_only_fields = ['localizacao_valida'] # O backend calcula isso, o usuário não envia
+
+class BatidaHistoricoSerializer(serializers.ModelSerializer):
+    """Linha do histórico paginado (inclui o funcionário para a visão do admin)."""
+    usuario = serializers.UUIDField(source='usuario_id', read_only=True)
+    username = serializers.CharField(source='usuario.username', read_only=True)
+
+    class Meta:
+        model = RegistroPonto
+        fields = ['id', 'usuario', 'username', 'data_hora', 'data_local', 'tipo', 'latitude', 'longitude',
+                  'localizacao_valida', 'editado_manualmente']
+
+class RegistroOfflineSerializer(serializers.Serializer):
+    """Batida capturada pelo app sem sinal e enviada depois, em lote."""
+    id_cliente = serializers.UUIDField()
+    tipo = serializers.ChoiceField(choices=RegistroPonto.TIPO_BATIDA)
+    data_hora = serializers.DateTimeField(help_text="Momento da captura no dispositivo")
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6, required=False, allow_null=True)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6, required=False, allow_null=True)
+
+    def validate_data_hora(self, valor):
+        # O horário vem do celular: sem limites, o app reescreveria o banco de horas de qualquer período
+        agora = timezone.now()
+        if valor > agora + timedelta(seconds=settings.PONTO_OFFLINE_TOLERANCIA_SEGUNDOS):
+            raise serializers.ValidationError('Batida no futuro: confira o relógio do aparelho.')
+        if valor < agora - timedelta(days=settings.PONTO_OFFLINE_JANELA_DIAS):
+            raise serializers.ValidationError(
+                f'Batida com mais de {settings.PONTO_OFFLINE_JANELA_DIAS} dias: peça o ajuste ao administrador.')
+        usuario = self.context.get('usuario')
+        if usuario and usuario.arquivado_ate and timezone.localtime(valor).date() <= usuario.arquivado_ate:
+            raise serializers.ValidationError('Período já fechado (arquivado): peça o ajuste ao administrador.')
+        return valor
+
+
+class TarefaRelatorioSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TarefaRelatorio
+        fields = ['id', 'data_inicio', 'data_fim', 'status', 'erro', 'criado_em', 'concluido_em']
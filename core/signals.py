@@ -0,0 +1,117 @@
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import apuracao, autenticacao, banco_horas, roteador, versoes, calendario, geofence, status_dia
+from .models import Usuario, Empresa, LocalTrabalho, Escala, Feriado, Recesso, RegistroPonto
+
+
+# --- BATIDAS: atualiza o banco de horas do dia afetado ---
+@receiver(pre_save, sender=RegistroPonto)
+def guardar_data_anterior(sender, instance, **kwargs):
+    # Edição no admin pode mover a batida para outro dia: os dois dias precisam ser recalculados
+    instance._data_anterior = None
+    if not instance._state.adding:
+        instance._data_anterior = sender.objects.filter(pk=instance.pk).values_list('data_local', flat=True).first()
+
+
+@receiver(post_save, sender=RegistroPonto)
+def registro_salvo(sender, instance, **kwargs):
+    roteador.marcar_escrita(instance.usuario_id)
+    versoes.incrementar_usuario(instance.usuario_id)
+    data = instance.data_local
+    banco_horas.atualizar_dia(instance.usuario, data)
+    status_dia.invalidar(instance.usuario_id, data)
+    anterior = getattr(instance, '_data_anterior', None)
+    if anterior and anterior != data:
+        banco_horas.atualizar_dia(instance.usuario, anterior)
+        status_dia.invalidar(instance.usuario_id, anterior)
+
+
+@receiver(post_delete, sender=RegistroPonto)
+def registro_apagado(sender, instance, **kwargs):
+    roteador.marcar_escrita(instance.usuario_id)
+    versoes.incrementar_usuario(instance.usuario_id)
+    data = instance.data_local
+    banco_horas.atualizar_dia(instance.usuario, data)
+    status_dia.invalidar(instance.usuario_id, data)
+
+
+# --- REGRAS DE JORNADA: descarta o banco materializado ---
+# Campos do usuário que mudam o saldo: meta, dias de trabalho, início da apuração e calendário (empresa)
+CAMPOS_JORNADA = (
+    'empresa', 'escala', 'data_inicio_apuracao', 'carga_horaria_diaria', 'usar_configuracao_individual',
+    'trab_seg', 'trab_ter', 'trab_qua', 'trab_qui', 'trab_sex', 'trab_sab', 'trab_dom',
+)
+
+
+def _valores_jornada(usuario):
+    return tuple(getattr(usuario, Usuario._meta.get_field(campo).attname) for campo in CAMPOS_JORNADA)
+
+
+@receiver(pre_save, sender=Usuario)
+def guardar_jornada_anterior(sender, instance, update_fields=None, **kwargs):
+    instance._jornada_anterior = None
+    if instance._state.adding or (update_fields and not set(update_fields) & set(CAMPOS_JORNADA)):
+        return
+    anterior = sender.objects.filter(pk=instance.pk).first()
+    instance._jornada_anterior = _valores_jornada(anterior) if anterior else None
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_salvo(sender, instance, created, update_fields=None, **kwargs):
+    # O login só atualiza last_login: não mexe em nada que esteja em cache
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    # Nome, e-mail, senha, is_active... não mudam o saldo: o banco materializado só é
+    # refeito quando uma regra de jornada muda de fato
+    anterior = getattr(instance, '_jornada_anterior', None)
+    if anterior is not None and anterior != _valores_jornada(instance):
+        banco_horas.invalidar([instance])
+        apuracao.invalidar_jornadas([instance.pk])
+    autenticacao.invalidar_usuarios(user_id=instance.pk)
+    versoes.incrementar_usuario(instance.pk)
+
+
+@receiver([post_save, pre_delete], sender=Escala)
+def escala_alterada(sender, instance, **kwargs):
+    # pre_delete: depois da remoção os usuários já estão com escala nula (SET_NULL sem signal)
+    banco_horas.invalidar(instance.usuarios.all())
+    apuracao.invalidar_jornadas(instance.usuarios.values_list('pk', flat=True))
+    autenticacao.invalidar_usuarios(user__escala_id=instance.pk)
+    versoes.incrementar_escala(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Feriado)
+def feriado_alterado(sender, instance, created=False, **kwargs):
+    # Na criação/remoção só os dias a partir do feriado mudam; numa edição a data antiga é desconhecida
+    calendario.invalidar(instance.empresa_id)
+    versoes.incrementar_empresa(instance.empresa_id)
+    a_partir_de = instance.data if created or kwargs['signal'] is post_delete else None
+    banco_horas.invalidar(Usuario.objects.filter(empresa_id=instance.empresa_id), a_partir_de)
+
+
+@receiver([post_save, post_delete], sender=Recesso)
+def recesso_alterado(sender, instance, created=False, **kwargs):
+    calendario.invalidar(instance.empresa_id)
+    versoes.incrementar_empresa(instance.empresa_id)
+    a_partir_de = instance.data_inicio if created or kwargs['signal'] is post_delete else None
+    banco_horas.invalidar(Usuario.objects.filter(empresa_id=instance.empresa_id), a_partir_de)
+
+
+# --- GEOFENCE: índice espacial da empresa ---
+@receiver([post_save, post_delete], sender=Empresa)
+def empresa_alterada(sender, instance, **kwargs):
+    geofence.invalidar(instance.pk)
+    autenticacao.invalidar_usuarios(user__empresa_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=LocalTrabalho)
+def local_alterado(sender, instance, **kwargs):
+    geofence.invalidar(instance.empresa_id)
+
+
+# --- TOKENS: cache da autenticação (core/autenticacao.py) ---
+@receiver([post_save, post_delete], sender=Token)
+def token_alterado(sender, instance, **kwargs):
+    autenticacao.invalidar([instance.key])
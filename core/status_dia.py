@@ -0,0 +1,126 @@
+"""
+Status do dia (tela principal do app), em cache por usuário e data local.
+
+O app consulta StatusPontoView o tempo todo; o payload só muda quando uma batida do
+dia é criada/editada/apagada. RegistrarPontoView grava o novo status no cache
+(write-through) e os signals de RegistroPonto invalidam edições feitas pelo admin.
+
+A escrita/invalidação só vale para todos os workers com cache compartilhado; com cache
+local e vários workers (ver core/checks.py) o status fica em cache só por alguns segundos.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import metricas
+from .checks import cache_coerente
+from .models import RegistroPonto
+from .serializers import RegistroPontoSerializer
+
+CACHE_TIMEOUT = 60 * 60 * 24
+CACHE_TIMEOUT_LOCAL = 5
+
+
+def _timeout():
+    return CACHE_TIMEOUT if cache_coerente() else CACHE_TIMEOUT_LOCAL
+
+PROXIMA_ACAO = {
+    None: ('ENTRADA', 'Registrar Entrada'),
+    'ENTRADA': ('SAIDA_ALMOCO', 'Sair para o Almoço'),
+    'SAIDA_ALMOCO': ('VOLTA_ALMOCO', 'Voltar do Almoço'),
+    'VOLTA_ALMOCO': ('SAIDA', 'Encerrar Expediente'),
+}
+FIM_DO_DIA = ('FIM_DO_DIA', 'Expediente Finalizado')
+
+
+def _chave(usuario_id, data):
+    return f'status_dia:{usuario_id}:{data.isoformat()}'
+
+
+def _registros_do_dia(usuario, hoje):
+    return RegistroPonto.objects.filter(
+        usuario=usuario,
+        data_local=hoje
+    ).order_by('data_hora')
+
+
+def _montar(registros_hoje):
+    horas_trabalhadas = timedelta(0)
+    entrada_temp = None
+
+    for registro in registros_hoje:
+        if registro.tipo in ['ENTRADA', 'VOLTA_ALMOCO']:
+            entrada_temp = registro.data_hora
+        elif registro.tipo in ['SAIDA_ALMOCO', 'SAIDA']:
+            if entrada_temp:
+                horas_trabalhadas += registro.data_hora - entrada_temp
+                entrada_temp = None
+
+    total_segundos = int(horas_trabalhadas.total_seconds())
+    horas, remainder = divmod(total_segundos, 3600)
+    minutos, _ = divmod(remainder, 60)
+
+    ultimo_tipo = registros_hoje[-1].tipo if registros_hoje else None
+    proximo, mensagem = PROXIMA_ACAO.get(ultimo_tipo, FIM_DO_DIA)
+
+    historico = [dict(item) for item in RegistroPontoSerializer(registros_hoje, many=True).data]
+
+    return {
+        'historico': historico,
+        'ultimo_registro': historico[-1] if historico else None,
+        'proxima_acao': proximo,
+        'texto_botao': mensagem,
+        'horas_trabalhadas': f"{horas:02}:{minutos:02}",
+    }
+
+
+@metricas.cronometrado('status_dia_calcular')
+def calcular(usuario, hoje):
+    # Uma única query; a última batida sai da própria lista
+    return _montar(list(_registros_do_dia(usuario, hoje)))
+
+
+def obter(usuario):
+    hoje = timezone.localdate()
+    chave = _chave(usuario.pk, hoje)
+    payload = cache.get(chave)
+    if payload is None:
+        payload = calcular(usuario, hoje)
+        cache.set(chave, payload, _timeout())
+    return payload
+
+
+def atualizar(usuario):
+    """Write-through: recalcula e grava o status de hoje logo após uma batida."""
+    hoje = timezone.localdate()
+    payload = calcular(usuario, hoje)
+    cache.set(_chave(usuario.pk, hoje), payload, _timeout())
+    return payload
+
+
+def invalidar(usuario_id, data):
+    cache.delete(_chave(usuario_id, data))
+
+
+# --- VERSÕES ASSÍNCRONAS (views_async, modo ASGI) ---
+async def acalcular(usuario, hoje):
+    with metricas.cronometro('status_dia_calcular'):
+        return _montar([registro async for registro in _registros_do_dia(usuario, hoje)])
+
+
+async def aobter(usuario):
+    hoje = timezone.localdate()
+    chave = _chave(usuario.pk, hoje)
+    payload = await cache.aget(chave)
+    if payload is None:
+        payload = await acalcular(usuario, hoje)
+        await cache.aset(chave, payload, _timeout())
+    return payload
+
+
+async def aatualizar(usuario):
+    hoje = timezone.localdate()
+    payload = await acalcular(usuario, hoje)
+    await cache.aset(_chave(usuario.pk, hoje), payload, _timeout())
+    return payload
@@ -1,3 +1,1081 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import random
+import tempfile
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError, SystemCheckError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.utils import ConnectionDoesNotExist
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from . import (agregacao_sql, anomalias, arquivo, banco_horas, checks, geofence, metricas, painel, relatorios,
+               roteador, status_dia, views_async)
+from .apuracao import Jornada, apurar_periodo, resolver_jornada
+from .calendario import obter_calendario
+from .dados_sinteticos import gerar_empresa
+from .middleware import MetricasMiddleware
+from .models import (Usuario, Empresa, LocalTrabalho, Escala, Feriado, Recesso, RegistroPonto, SaldoDiario,
+                     ArquivoMensal, Anomalia, TarefaRelatorio)
+
+
+def batida(usuario, dia, hora, minuto, tipo):
+    return RegistroPonto.objects.create(
+        usuario=usuario,
+        tipo=tipo,
+        data_hora=timezone.make_aware(datetime.combine(dia, time(hora, minuto))),
+    )
+
+
+def jornada_completa(usuario, dia, saida=(17, 0)):
+    batida(usuario, dia, 8, 0, 'ENTRADA')
+    batida(usuario, dia, 12, 0, 'SAIDA_ALMOCO')
+    batida(usuario, dia, 13, 0, 'VOLTA_ALMOCO')
+    batida(usuario, dia, saida[0], saida[1], 'SAIDA')
+
+
+class BancoHorasTests(TestCase):
+    # Segunda-feira, 02/03/2026 a sexta-feira, 06/03/2026
+    SEGUNDA = date(2026, 3, 2)
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Empresa', cnpj='00.000.000/0001-00')
+        self.usuario = Usuario.objects.create_user(
+            username='ana', password='123', empresa=self.empresa, data_inicio_apuracao=self.SEGUNDA
+        )
+
+    def saldo(self, data):
+        return SaldoDiario.objects.get(usuario=self.usuario, data=data)
+
+    def test_sincronizar_materializa_dias_e_faltas(self):
+        jornada_completa(self.usuario, self.SEGUNDA, saida=(18, 0))  # +60
+        hoje = self.SEGUNDA + timedelta(days=2)
+
+        banco_horas.sincronizar(self.usuario, hoje)
+
+        self.assertEqual(self.saldo(self.SEGUNDA).saldo_dia, 60)
+        self.assertEqual(self.saldo(self.SEGUNDA + timedelta(days=1)).tipo_dia, 'FALTA')
+        self.assertTrue(self.saldo(hoje).em_andamento)
+        self.assertEqual(self.saldo(hoje).saldo_acumulado, 60 - 480)
+
+    def test_so_regras_de_jornada_refazem_o_banco(self):
+        banco_horas.sincronizar(self.usuario, self.SEGUNDA + timedelta(days=2))
+        self.usuario.first_name = 'Ana'
+        self.usuario.is_active = False
+        self.usuario.set_password('456')
+        self.usuario.save()
+        self.assertEqual(SaldoDiario.objects.filter(usuario=self.usuario).count(), 3)
+
+        self.usuario.carga_horaria_diaria = timedelta(hours=6)
+        self.usuario.save()
+        self.assertFalse(SaldoDiario.objects.filter(usuario=self.usuario).exists())
+
+    def test_historico_so_mascara_banco_indisponivel(self):
+        self.client.force_login(self.usuario)
+        with mock.patch.object(banco_horas, 'sincronizar', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('core.views', 'ERROR'):
+            self.assertEqual(self.client.get('/api/historico/').json()['saldo_banco_horas'], 'ERRO')
+        with mock.patch.object(banco_horas, 'sincronizar', side_effect=IntegrityError('saldo duplicado')), \
+                self.assertRaises(IntegrityError):
+            self.client.get('/api/historico/')
+
+    def test_edicao_de_batida_propaga_para_dias_seguintes(self):
+        hoje = self.SEGUNDA + timedelta(days=3)
+        for i in range(3):
+            jornada_completa(self.usuario, self.SEGUNDA + timedelta(days=i))
+        banco_horas.sincronizar(self.usuario, hoje)
+        self.assertEqual(self.saldo(hoje).saldo_acumulado, 0)
+
+        saida = RegistroPonto.objects.get(usuario=self.usuario, tipo='SAIDA', data_local=self.SEGUNDA)
+        saida.data_hora += timedelta(minutes=30)
+        saida.save()
+
+        self.assertEqual(self.saldo(self.SEGUNDA).saldo_dia, 30)
+        self.assertEqual(self.saldo(hoje).saldo_acumulado, 30)
+
+    def test_feriado_invalida_banco(self):
+        hoje = self.SEGUNDA + timedelta(days=2)
+        banco_horas.sincronizar(self.usuario, hoje)
+        Feriado.objects.create(empresa=self.empresa, data=self.SEGUNDA, nome='Carnaval')
+
+        banco_horas.sincronizar(self.usuario, hoje)
+
+        self.assertEqual(self.saldo(self.SEGUNDA).tipo_dia, 'FERIADO')
+        self.assertEqual(self.saldo(hoje).saldo_acumulado, -480)
+
+
+class ApuracaoTests(TestCase):
+    SEGUNDA = date(2026, 3, 2)
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Empresa', cnpj='00.000.000/0001-00')
+        self.escala = Escala.objects.create(nome='6h', carga_horaria_diaria=timedelta(hours=6), trabalha_sabado=True)
+        self.usuario = Usuario.objects.create_user(username='bia', password='123', empresa=self.empresa, escala=self.escala)
+
+    def semana(self, jornada):
+        return [jornada.meta_do_dia(self.SEGUNDA + timedelta(days=i)) for i in range(7)]
+
+    def test_resolver_jornada_pela_escala(self):
+        self.assertEqual(self.semana(resolver_jornada(self.usuario)), [360] * 6 + [0])
+
+        self.usuario.usar_configuracao_individual = True
+        self.usuario.carga_horaria_diaria = timedelta(hours=4)
+        self.usuario.save()
+        self.assertEqual(self.semana(resolver_jornada(self.usuario)), [240] * 5 + [0, 0])
+
+    def test_escalas_ciclicas_ancoradas_no_inicio(self):
+        self.escala.padrao_ciclo = '10'  # 12x36 a partir da terça
+        self.escala.inicio_ciclo = self.SEGUNDA + timedelta(days=1)
+        self.escala.carga_horaria_diaria = timedelta(hours=12)
+        self.escala.save()
+        jornada = resolver_jornada(self.usuario)
+        self.assertEqual(self.semana(jornada), [0, 720, 0, 720, 0, 720, 0])
+        self.assertEqual(jornada.meta_do_dia(self.SEGUNDA - timedelta(days=365)), 720)  # antes da âncora também
+
+        self.escala.padrao_ciclo = '11111101111100'  # sábado sim, sábado não
+        self.escala.inicio_ciclo = self.SEGUNDA
+        self.escala.save()
+        self.usuario.refresh_from_db()
+        metas = [resolver_jornada(self.usuario).meta_do_dia(self.SEGUNDA + timedelta(days=i)) for i in range(21)]
+        self.assertEqual([metas[5], metas[12], metas[19]], [720, 0, 720])
+        self.assertEqual(Jornada((1, 0), 10).meta_do_dia(date.fromordinal(13)), 0)
+
+    def test_apurar_periodo_classifica_dias(self):
+        Feriado.objects.create(empresa=self.empresa, data=self.SEGUNDA, nome='Carnaval')
+        Recesso.objects.create(empresa=self.empresa, nome='Recesso', data_inicio=self.SEGUNDA,
+                               data_fim=self.SEGUNDA + timedelta(days=1))
+        jornada_completa(self.usuario, self.SEGUNDA + timedelta(days=2))
+
+        dias = list(apurar_periodo(self.usuario, self.SEGUNDA, self.SEGUNDA + timedelta(days=6),
+                                   hoje=self.SEGUNDA + timedelta(days=7)))
+
+        self.assertEqual([d.tipo_dia for d in dias],
+                         ['FERIADO', 'RECESSO', 'TRABALHO', 'FALTA', 'FALTA', 'FALTA', 'FOLGA'])
+        self.assertEqual(dias[2].minutos_trabalhados, 480)
+        self.assertEqual(dias[2].saldo_dia, 120)
+        self.assertEqual(len(dias[2].batidas), 4)
+        self.assertEqual(dias[3].saldo_dia, -360)
+
+    def test_pdf_usa_o_motor(self):
+        jornada_completa(self.usuario, self.SEGUNDA)
+        self.client.force_login(self.usuario)
+        resposta = self.client.post('/api/relatorio-pdf/', {'data_inicio': '2026-03-01', 'data_fim': '2026-03-31'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+
+
+class CalendarioTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Empresa', cnpj='00.000.000/0001-00')
+
+    def test_consulta_e_invalidacao(self):
+        Feriado.objects.create(empresa=self.empresa, data=date(2026, 12, 25), nome='Natal')
+        Recesso.objects.create(empresa=self.empresa, nome='Fim de Ano',
+                               data_inicio=date(2026, 12, 24), data_fim=date(2027, 1, 2))
+
+        cal = obter_calendario(self.empresa.id)
+        self.assertEqual(cal.get(date(2026, 12, 25)), 'FERIADO')
+        self.assertEqual(cal.nome(date(2026, 12, 25)), 'Natal')
+        self.assertEqual(cal.get(date(2027, 1, 2)), 'RECESSO')
+        self.assertIsNone(cal.get(date(2027, 1, 3)))
+
+        # Montado uma vez e servido do cache
+        with self.assertNumQueries(0):
+            self.assertEqual(obter_calendario(self.empresa.id).get(date(2026, 12, 24)), 'RECESSO')
+
+        Feriado.objects.create(empresa=self.empresa, data=date(2026, 11, 20), nome='Consciência Negra')
+        self.assertEqual(obter_calendario(self.empresa.id).get(date(2026, 11, 20)), 'FERIADO')
+
+
+class StatusPontoTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='caio', password='123')
+        self.client.force_login(self.usuario)
+
+    def test_status_em_cache_e_atualizado_na_batida(self):
+        vazio = self.client.get('/api/status/').json()
+        self.assertEqual(vazio['proxima_acao'], 'ENTRADA')
+
+        self.client.post('/api/registrar/', {'tipo': 'ENTRADA'})
+
+        with self.assertNumQueries(2):  # sessão + usuário; nenhuma query de batidas
+            status = self.client.get('/api/status/').json()
+        self.assertEqual(status['proxima_acao'], 'SAIDA_ALMOCO')
+        self.assertEqual(len(status['historico']), 1)
+        self.assertEqual(status['ultimo_registro'], status['historico'][0])
+
+    def test_edicao_pelo_admin_invalida_status(self):
+        self.client.post('/api/registrar/', {'tipo': 'ENTRADA'})
+        RegistroPonto.objects.filter(usuario=self.usuario).get().delete()
+        self.assertEqual(self.client.get('/api/status/').json()['proxima_acao'], 'ENTRADA')
+
+
+class SincronizarPontosTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='davi', password='123')
+        self.client.force_login(self.usuario)
+
+    def _momento(self, dias_atras, hora):
+        dia = timezone.localdate() - timedelta(days=dias_atras)
+        return timezone.make_aware(datetime.combine(dia, time(hora))).isoformat()
+
+    def _enviar(self, *datas_hora):
+        lote = {'registros': [{'id_cliente': str(uuid.uuid4()), 'tipo': 'ENTRADA', 'data_hora': d} for d in datas_hora]}
+        return self.client.post('/api/sincronizar/', lote, content_type='application/json').json()
+
+    def test_lote_idempotente(self):
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        entrada, saida = self._momento(1, 8), self._momento(1, 17)
+        lote = {'registros': [
+            {'id_cliente': ids[0], 'tipo': 'ENTRADA', 'data_hora': entrada},
+            {'id_cliente': ids[1], 'tipo': 'SAIDA', 'data_hora': saida},
+            {'id_cliente': ids[1], 'tipo': 'SAIDA', 'data_hora': saida},
+            {'id_cliente': ids[2], 'tipo': 'INVALIDO', 'data_hora': saida},
+        ]}
+
+        resposta = self.client.post('/api/sincronizar/', lote, content_type='application/json').json()
+        self.assertEqual(resposta['criados'], 2)
+        self.assertEqual([r['status'] for r in resposta['resultados']], ['criado', 'criado', 'duplicado', 'erro'])
+
+        # Reenvio do mesmo lote (ex: app não recebeu a resposta)
+        resposta = self.client.post('/api/sincronizar/', lote, content_type='application/json').json()
+        self.assertEqual(resposta['criados'], 0)
+        self.assertEqual(RegistroPonto.objects.filter(usuario=self.usuario).count(), 2)
+
+    @override_settings(PONTO_OFFLINE_JANELA_DIAS=7, PONTO_OFFLINE_TOLERANCIA_SEGUNDOS=300)
+    def test_rejeita_futuro_e_fora_da_janela(self):
+        agora = timezone.now()
+        resposta = self._enviar(
+            (agora + timedelta(minutes=2)).isoformat(),   # relógio do aparelho um pouco adiantado: aceita
+            (agora + timedelta(hours=1)).isoformat(),
+            self._momento(8, 8),
+        )
+        self.assertEqual([r['status'] for r in resposta['resultados']], ['criado', 'erro', 'erro'])
+        self.assertIn('futuro', resposta['resultados'][1]['erros']['data_hora'][0])
+        self.assertIn('7 dias', resposta['resultados'][2]['erros']['data_hora'][0])
+        self.assertEqual(RegistroPonto.objects.filter(usuario=self.usuario).count(), 1)
+
+    def test_rejeita_periodo_arquivado(self):
+        Usuario.objects.filter(pk=self.usuario.pk).update(arquivado_ate=timezone.localdate() - timedelta(days=2))
+        resposta = self._enviar(self._momento(2, 8), self._momento(1, 8))
+        self.assertEqual([r['status'] for r in resposta['resultados']], ['erro', 'criado'])
+        self.assertIn('arquivado', resposta['resultados'][0]['erros']['data_hora'][0])
+
+
+class GeofenceTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Empresa', cnpj='00.000.000/0001-00')
+        LocalTrabalho.objects.create(empresa=self.empresa, nome='Filial', latitude='-23.550520',
+                                     longitude='-46.633308', raio_permitido_metros=100)
+        self.usuario = Usuario.objects.create_user(username='eva', password='123', empresa=self.empresa)
+
+    def test_valida_pelo_local_mais_proximo(self):
+        self.assertTrue(geofence.localizacao_valida(self.usuario, '-23.550800', '-46.633308'))   # ~30 m
+        self.assertFalse(geofence.localizacao_valida(self.usuario, '-23.560520', '-46.633308'))  # ~1,1 km
+        self.assertFalse(geofence.localizacao_valida(self.usuario, None, None))
+
+        self.usuario.trabalho_hibrido = True
+        self.assertTrue(geofence.localizacao_valida(self.usuario, None, None))
+
+    def test_registrar_calcula_localizacao(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.post('/api/registrar/', {'tipo': 'ENTRADA', 'latitude': '-23.560520', 'longitude': '-46.633308'})
+        self.assertFalse(resposta.json()['localizacao_valida'])
+
+        # Novo local cobre a batida: o comando de revalidação corrige o histórico
+        LocalTrabalho.objects.create(empresa=self.empresa, nome='Obra', latitude='-23.560520',
+                                     longitude='-46.633308', raio_permitido_metros=50)
+        call_command('revalidar_localizacao', stdout=io.StringIO())
+        self.assertTrue(RegistroPonto.objects.get(usuario=self.usuario).localizacao_valida)
+
+    def test_revalidar_atualiza_status_e_etag(self):
+        self.client.force_login(self.usuario)
+        self.client.post('/api/registrar/', {'tipo': 'ENTRADA', 'latitude': '-23.560520', 'longitude': '-46.633308'})
+        antes = self.client.get('/api/status/')
+        self.assertFalse(antes.json()['ultimo_registro']['localizacao_valida'])
+
+        LocalTrabalho.objects.create(empresa=self.empresa, nome='Obra', latitude='-23.560520',
+                                     longitude='-46.633308', raio_permitido_metros=50)
+        call_command('revalidar_localizacao', stdout=io.StringIO())
+        depois = self.client.get('/api/status/', headers={'If-None-Match': antes['ETag']})
+        self.assertEqual(depois.status_code, 200)
+        self.assertTrue(depois.json()['ultimo_registro']['localizacao_valida'])
+
+    def test_revalidar_le_usuarios_no_join_e_filtra_empresa(self):
+        outra = Empresa.objects.create(nome='Outra', cnpj='99')
+        LocalTrabalho.objects.create(empresa=outra, nome='Sede', latitude='0', longitude='0', raio_permitido_metros=10)
+        de_fora = Usuario.objects.create_user(username='ivo', password='123', empresa=outra)
+        for usuario in (self.usuario, de_fora):
+            RegistroPonto.objects.create(usuario=usuario, tipo='ENTRADA', data_hora=timezone.now(),
+                                         latitude='-23.550520', longitude='-46.633308', localizacao_valida=True)
+
+        call_command('revalidar_localizacao', '--empresa', '99', stdout=io.StringIO())
+        self.assertTrue(RegistroPonto.objects.get(usuario=self.usuario).localizacao_valida)
+        self.assertFalse(RegistroPonto.objects.get(usuario=de_fora).localizacao_valida)
+
+        # Sem --empresa: uma leitura sem lista de usuários (nada de um parâmetro por usuário)
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('revalidar_localizacao', '--dry-run', stdout=io.StringIO())
+        self.assertFalse(any('"usuario_id" IN (' in q['sql'] for q in ctx.captured_queries))
+
+
+class PdfStreamingTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='fabio', password='123')
+        self.client.force_login(self.usuario)
+
+    def test_periodo_longo_gera_pdf_em_streaming(self):
+        jornada_completa(self.usuario, date(2026, 3, 2))
+        resposta = self.client.post('/api/relatorio-pdf/', {'data_inicio': '2025-01-01', 'data_fim': '2026-03-31'})
+
+        self.assertTrue(resposta.streaming)
+        conteudo = b''.join(resposta.streaming_content)
+        self.assertTrue(conteudo.startswith(b'%PDF-1.4'))
+        self.assertTrue(conteudo.endswith(b'%%EOF\n'))
+        # ~455 dias / ~50 linhas por página
+        self.assertGreater(conteudo.count(b'/Type /Page '), 8)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FilaRelatoriosTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='gabi', password='123')
+        self.client.force_login(self.usuario)
+        self.pedido = {'data_inicio': '2026-03-01', 'data_fim': '2026-03-31'}
+
+    def test_fluxo_com_cache_por_conteudo(self):
+        jornada_completa(self.usuario, date(2026, 3, 2))
+
+        resposta = self.client.post('/api/relatorios/', self.pedido)
+        self.assertEqual(resposta.status_code, 202)
+        tarefa_id = resposta.json()['id']
+        # Pedido igual enquanto está na fila reaproveita a mesma tarefa
+        self.assertEqual(self.client.post('/api/relatorios/', self.pedido).json()['id'], tarefa_id)
+
+        call_command('processar_relatorios', '--uma-vez', stdout=io.StringIO())
+        self.assertEqual(self.client.get(f'/api/relatorios/{tarefa_id}/').json()['status'], 'CONCLUIDO')
+        download = self.client.get(f'/api/relatorios/{tarefa_id}/download/')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+        # Mesmos dados: já sai concluído, sem passar pela fila
+        self.assertEqual(self.client.post('/api/relatorios/', self.pedido).status_code, 200)
+
+        # Nova batida no período muda a versão dos dados
+        batida(self.usuario, date(2026, 3, 3), 8, 0, 'ENTRADA')
+        self.assertEqual(self.client.post('/api/relatorios/', self.pedido).status_code, 202)
+
+    @override_settings(PONTO_RELATORIO_LEASE=600, PONTO_RELATORIO_TENTATIVAS=3)
+    def test_tarefa_de_worker_morto_volta_para_a_fila(self):
+        tarefa = relatorios.solicitar(self.usuario, date(2026, 3, 1), date(2026, 3, 31))
+        self.assertEqual(relatorios.reservar_proxima().pk, tarefa.pk)
+        self.assertIsNone(relatorios.reservar_proxima())  # ainda dentro do lease
+
+        # O worker morreu: passado o lease, outro retoma a tarefa (e o pedido igual não fica preso)
+        TarefaRelatorio.objects.filter(pk=tarefa.pk).update(iniciado_em=timezone.now() - timedelta(hours=1))
+        retomada = relatorios.reservar_proxima()
+        self.assertEqual((retomada.pk, retomada.tentativas), (tarefa.pk, 2))
+
+        TarefaRelatorio.objects.filter(pk=tarefa.pk).update(iniciado_em=timezone.now() - timedelta(hours=1),
+                                                            tentativas=3)
+        self.assertIsNone(relatorios.reservar_proxima())
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, 'ERRO')
+        self.assertNotEqual(relatorios.solicitar(self.usuario, date(2026, 3, 1), date(2026, 3, 31)).pk, tarefa.pk)
+
+
+class PainelBancoHorasTests(TestCase):
+    SEGUNDA = date(2026, 3, 2)
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Empresa', cnpj='00.000.000/0001-00')
+        self.admin = Usuario.objects.create_user(username='chefe', password='123', empresa=self.empresa, tipo='ADMIN')
+        self.funcionarios = [
+            Usuario.objects.create_user(username=f'func{i}', password='123', empresa=self.empresa) for i in range(5)
+        ]
+        for f in self.funcionarios:
+            jornada_completa(f, self.SEGUNDA, saida=(18, 0))
+
+    def test_painel_em_consultas_fixas(self):
+        self.client.force_login(self.admin)
+        url = '/api/empresa/banco-horas/?data_inicio=2026-03-02&data_fim=2026-03-03'
+        with self.assertNumQueries(6):  # sessão, admin, usuários, batidas, feriados, recessos
+            dados = self.client.get(url).json()
+
+        por_nome = {f['username']: f for f in dados['funcionarios']}
+        self.assertEqual(por_nome['func0']['saldo_minutos'], 60 - 480)
+        self.assertEqual(por_nome['func0']['faltas'], 1)
+        self.assertEqual(por_nome['func0']['horas_trabalhadas'], '09:00')
+
+    def test_apenas_admin(self):
+        self.client.force_login(self.funcionarios[0])
+        self.assertEqual(self.client.get('/api/empresa/banco-horas/').status_code, 403)
+
+    def test_dias_futuros_nao_contam(self):
+        # Hoje é a terça (03/03): o resto da semana ainda não pode virar saldo negativo
+        for via_sql in (False, True):
+            linhas = painel.banco_horas_empresa(self.empresa.pk, self.SEGUNDA, self.SEGUNDA + timedelta(days=4),
+                                                hoje=self.SEGUNDA + timedelta(days=1), via_sql=via_sql)
+            func0 = next(linha for linha in linhas if linha['usuario'] == self.funcionarios[0])
+            self.assertEqual(func0['saldo_minutos'], 60, via_sql)
+            self.assertEqual(func0['faltas'], 0, via_sql)
+
+
+class AgregacaoSqlTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Empresa', cnpj='00.000.000/0001-00')
+        self.usuarios = [
+            Usuario.objects.create_user(username=f'sql{i}', password='123', empresa=self.empresa) for i in range(3)
+        ]
+        # Batidas aleatórias (inclusive dias com número ímpar de batidas e horários perto da meia-noite)
+        aleatorio = random.Random(42)
+        tipos = [t for t, _ in RegistroPonto.TIPO_BATIDA]
+        for usuario in self.usuarios:
+            for _ in range(120):
+                momento = timezone.make_aware(datetime(2026, 3, 1) + timedelta(
+                    minutes=aleatorio.randrange(0, 20 * 24 * 60), seconds=aleatorio.randrange(60),
+                    microseconds=aleatorio.randrange(10 ** 6)))
+                RegistroPonto.objects.create(usuario=usuario, data_hora=momento, tipo=aleatorio.choice(tipos))
+
+    def test_mesmo_resultado_que_o_python(self):
+        inicio, fim = date(2026, 3, 1), date(2026, 3, 21)
+        resumos = agregacao_sql.minutos_por_dia([u.pk for u in self.usuarios], inicio, fim)
+
+        for usuario in self.usuarios:
+            for dia in apurar_periodo(usuario, inicio, fim, hoje=fim):
+                minutos, ultimo_tipo = resumos.get(usuario.pk, {}).get(dia.data, (0, None))
+                self.assertEqual(minutos, dia.minutos_trabalhados, (usuario.username, dia.data))
+                self.assertEqual(ultimo_tipo, dia.batidas[-1][1] if dia.batidas else None)
+
+    def test_painel_via_sql(self):
+        args = (self.empresa.pk, date(2026, 3, 1), date(2026, 3, 21), date(2026, 3, 21))
+        em_python = painel.banco_horas_empresa(*args, via_sql=False)
+        via_sql = painel.banco_horas_empresa(*args, via_sql=True)
+        self.assertEqual(em_python, via_sql)
+
+    def test_microssegundos_na_virada_do_minuto(self):
+        usuario = Usuario.objects.create_user(username='sql_us', password='123', empresa=self.empresa)
+
+        def bater(dia, *momentos):
+            for (h, m, s, us), tipo in zip(momentos, ('ENTRADA', 'SAIDA_ALMOCO', 'VOLTA_ALMOCO', 'SAIDA')):
+                RegistroPonto.objects.create(usuario=usuario, tipo=tipo,
+                                             data_hora=timezone.make_aware(datetime.combine(dia, time(h, m, s, us))))
+
+        dias = [date(2026, 4, 6), date(2026, 4, 7), date(2026, 4, 8)]
+        bater(dias[0], (8, 0, 0, 400000), (8, 1, 0, 399999))                                  # 59,999999 s
+        bater(dias[1], (8, 0, 0, 400000), (8, 1, 0, 400000))                                  # 60 s
+        bater(dias[2], (8, 0, 0, 700001), (8, 0, 30, 0), (9, 0, 0, 0), (9, 0, 30, 700000))  # 59,999999 s
+
+        resumo = agregacao_sql.minutos_por_dia([usuario.pk], dias[0], dias[-1])[usuario.pk]
+        apurados = {d.data: d.minutos_trabalhados for d in apurar_periodo(usuario, dias[0], dias[-1], hoje=dias[-1])}
+        self.assertEqual([resumo[d][0] for d in dias], [0, 1, 0])
+        self.assertEqual([apurados[d] for d in dias], [0, 1, 0])
+
+    def test_banco_sem_agregacao_sql_usa_o_python(self):
+        args = (self.empresa.pk, date(2026, 3, 1), date(2026, 3, 21), date(2026, 3, 21))
+        em_python = painel.banco_horas_empresa(*args, via_sql=False)
+        with mock.patch.object(agregacao_sql, 'DIFERENCA_MICROSSEGUNDOS', {}), \
+                override_settings(PONTO_AGREGACAO_SQL=True):
+            self.assertEqual(painel.banco_horas_empresa(*args), em_python)
+            self.assertEqual([m.id for m in checks.verificar_agregacao_sql(None)], ['core.W001'])
+
+    def test_segue_o_roteador(self):
+        # O SQL puro vai para o banco escolhido pelo roteador (réplica no painel), não para o 'default'
+        with mock.patch.object(agregacao_sql.router, 'db_for_read', return_value='replica') as db_for_read:
+            with self.assertRaises(ConnectionDoesNotExist):
+                agregacao_sql.minutos_por_dia([u.pk for u in self.usuarios], date(2026, 3, 1), date(2026, 3, 21))
+        db_for_read.assert_called_once_with(RegistroPonto)
+
+
+class PopularPontosTests(TestCase):
+    def test_gera_dados_reprodutiveis_respeitando_calendario(self):
+        args = ['--usuarios', '4', '--inicio', '2025-12-01', '--fim', '2026-01-31', '--seed', '7']
+        call_command('popular_pontos', *args, stdout=io.StringIO())
+
+        batidas = RegistroPonto.objects.select_related('usuario__escala')
+        self.assertTrue(batidas.exists())
+        datas = {timezone.localtime(b.data_hora).date() for b in batidas}
+        self.assertNotIn(date(2025, 12, 25), datas)                     # Feriado
+        self.assertFalse(any(date(2025, 12, 26) <= d <= date(2025, 12, 31) for d in datas))  # Recesso
+        self.assertNotIn(6, {d.weekday() for d in datas})              # Domingo
+
+        assinatura = sorted((b.usuario.username, b.data_hora) for b in batidas)
+        call_command('popular_pontos', *args, '--prefixo', 'outro', stdout=io.StringIO())
+        nova = sorted((b.usuario.username.replace('outro', 'sint'), b.data_hora)
+                      for b in batidas.filter(usuario__username__startswith='outro'))
+        self.assertEqual(assinatura, nova)
+
+    def test_prefixo_repetido_ou_longo(self):
+        args = ['--usuarios', '1', '--inicio', '2026-03-02', '--fim', '2026-03-03']
+        call_command('popular_pontos', *args, stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, 'use outro --prefixo'):
+            call_command('popular_pontos', *args, stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, 'no máximo'):
+            call_command('popular_pontos', *args, '--prefixo', 'x' * 21, stdout=io.StringIO())
+
+        # Escalas de uma execução anterior são reaproveitadas; o nome sempre cabe na coluna
+        Usuario.objects.filter(username__startswith='sint').delete()
+        gerar_empresa(0, 1, date(2026, 3, 2), date(2026, 3, 3))
+        gerar_empresa(0, 1, date(2026, 3, 2), date(2026, 3, 3), prefixo='y' * 20)
+        self.assertEqual(Escala.objects.filter(nome__endswith=' - sint0').count(), 3)
+        self.assertTrue(all(len(nome) <= 50 for nome in Escala.objects.values_list('nome', flat=True)))
+
+
+class BenchmarkTests(TestCase):
+    @mock.patch('core.management.commands.benchmark.teardown_test_environment')
+    @mock.patch('core.management.commands.benchmark.setup_test_environment')
+    def test_smoke_saida_e_comparacao(self, *_):
+        saida = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        self.addCleanup(os.remove, saida)
+        args = ['--usuarios', '2', '--repeticoes', '1', '--saida', saida]
+        cache.set('de_outro_worker', 1)
+        # Já estamos no banco de teste: o comando roda nele em vez de criar outro
+        with mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'):
+            call_command('benchmark', *args, stdout=io.StringIO())
+            self.assertEqual(cache.get('de_outro_worker'), 1)  # casos frios limpam só o cache do benchmark
+            with open(saida, encoding='utf-8') as arquivo:
+                resultado = json.load(arquivo)
+            self.assertEqual({r['status'] for r in resultado['resultados']}, {200})
+            self.assertGreater(resultado['batidas'], 0)
+
+            # Base com menos queries em um caso: a comparação acusa a regressão
+            resultado['resultados'][0]['queries'] -= 1
+            base = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+            self.addCleanup(os.remove, base)
+            with open(base, 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo)
+            Usuario.objects.all().delete()  # o banco do benchmark é sempre novo
+            with self.assertRaisesMessage(CommandError, 'Regressões encontradas'):
+                call_command('benchmark', *args, '--comparar', base, '--tolerancia', '1000', stdout=io.StringIO())
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='mel', password='123')
+        self.client.force_login(self.usuario)
+
+    def test_exporta_requisicoes_queries_e_etapas(self):
+        self.client.get('/api/status/')
+        self.client.post('/api/relatorio-pdf/', {'data_inicio': '2026-01-01', 'data_fim': '2026-01-31'})
+
+        texto = self.client.get('/api/metrics').content.decode()
+        self.assertIn('# TYPE ponto_http_latencia_segundos histogram', texto)
+        self.assertIn('ponto_http_requisicoes_total{metodo="GET",rota="/api/status/",status="200"}', texto)
+        self.assertIn('ponto_db_queries_total{rota="/api/status/"}', texto)
+        self.assertIn('ponto_etapa_segundos_count{etapa="status_dia_calcular"}', texto)
+        self.assertIn('ponto_etapa_segundos_count{etapa="pdf_canvas"}', texto)
+
+    @override_settings(METRICAS_TOKEN='segredo')
+    def test_token_obrigatorio_quando_configurado(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 401)
+        resposta = self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(resposta.status_code, 200)
+
+    async def test_queries_contadas_em_views_async(self):
+        # No ASGI as queries rodam em threads do sync_to_async, com conexões próprias
+        def consultar():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                connection.close()
+
+        async def view(request):
+            await sync_to_async(consultar, thread_sensitive=False)()
+            return HttpResponse()
+
+        with mock.patch.object(metricas.QUERIES, 'inc') as inc:
+            await MetricasMiddleware(view)(AsyncRequestFactory().get('/qualquer/'))
+        inc.assert_called_once_with(1, rota='desconhecida')
+
+
+class ViewsAsyncTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='nina', password='123')
+        self.token = Token.objects.create(user=self.usuario)
+        self.fabrica = AsyncRequestFactory()
+
+    def _headers(self, chave=None):
+        return {'Authorization': f'Token {chave or self.token.key}'}
+
+    async def test_registrar_e_status_com_token(self):
+        request = self.fabrica.post('/api/registrar/', {'tipo': 'ENTRADA'}, headers=self._headers())
+        resposta = await views_async.registrar_ponto(request)
+        self.assertEqual(resposta.status_code, 201)
+
+        status = await views_async.status_ponto(self.fabrica.get('/api/status/', headers=self._headers()))
+        corpo = json.loads(status.content)
+        self.assertEqual(corpo['proxima_acao'], 'SAIDA_ALMOCO')
+        self.assertEqual(corpo['historico'][0]['id'], json.loads(resposta.content)['id'])
+
+    async def test_mesmo_payload_da_view_sincrona(self):
+        await views_async.registrar_ponto(
+            self.fabrica.post('/api/registrar/', {'tipo': 'ENTRADA'}, headers=self._headers()))
+        assincrono = json.loads((await views_async.status_ponto(
+            self.fabrica.get('/api/status/', headers=self._headers()))).content)
+        await cache.aclear()
+        sincrono = (await self.async_client.get('/api/status/', headers=self._headers())).json()
+        self.assertEqual(assincrono, sincrono)
+
+    async def test_token_invalido(self):
+        resposta = await views_async.status_ponto(self.fabrica.get('/api/status/', headers=self._headers('x')))
+        self.assertEqual(resposta.status_code, 401)
+
+    async def test_basic_auth_como_no_drf(self):
+        async def anonimo():
+            return AnonymousUser()
+
+        def get(senha):
+            credenciais = base64.b64encode(f'nina:{senha}'.encode()).decode()
+            request = self.fabrica.get('/api/status/', headers={'Authorization': f'Basic {credenciais}'})
+            request.auser = anonimo  # sem sessão (o AuthenticationMiddleware não roda na fábrica)
+            return request
+
+        resposta = await views_async.status_ponto(get('123'))
+        self.assertEqual(resposta.status_code, 200)
+        resposta = await views_async.status_ponto(get('errada'))
+        self.assertEqual(resposta.status_code, 401)
+        self.assertEqual(json.loads(resposta.content)['detail'], 'Invalid username/password.')
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Ótica', cnpj='55')
+        self.escala = Escala.objects.create(nome='Comercial')
+        self.usuario = Usuario.objects.create_user(username='otto', password='123', empresa=self.empresa,
+                                                   escala=self.escala)
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.usuario).key}'}
+
+    def test_requisicao_comum_sem_queries(self):
+        self.client.get('/api/status/', headers=self.headers)
+        with self.assertNumQueries(0):  # token, usuário e status vindos do cache
+            resposta = self.client.get('/api/status/', headers=self.headers)
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_invalidado_quando_usuario_empresa_ou_escala_mudam(self):
+        self.client.get('/api/status/', headers=self.headers)
+
+        self.escala.nome = 'Comercial 2'
+        self.escala.save()
+        with self.assertNumQueries(1):  # token + usuário + empresa + escala num único JOIN
+            self.client.get('/api/status/', headers=self.headers)
+
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertEqual(self.client.get('/api/status/', headers=self.headers).status_code, 401)
+
+    def test_token_apagado_deixa_de_valer(self):
+        self.client.get('/api/status/', headers=self.headers)
+        Token.objects.filter(user=self.usuario).delete()
+        self.assertEqual(self.client.get('/api/status/', headers=self.headers).status_code, 401)
+
+
+REPLICA = {'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+
+
+class RoteadorReplicaTests(TransactionTestCase):
+    # Sem a transação do TestCase: o roteador mantém no primário leituras dentro de atomic()
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='rui', password='123')
+        self.roteador = roteador.RoteadorReplica()
+
+    def test_sem_replica_tudo_no_primario(self):
+        with self.settings(DATABASES={'default': settings.DATABASES['default']}):
+            with roteador.leitura_replica(self.usuario):
+                self.assertIsNone(self.roteador.db_for_read(RegistroPonto))
+
+    def test_leituras_de_relatorio_na_replica(self):
+        with self.settings(DATABASES={**settings.DATABASES, **REPLICA}):
+            self.assertIsNone(self.roteador.db_for_read(RegistroPonto))  # fora das views de leitura
+            with roteador.leitura_replica(self.usuario):
+                self.assertEqual(self.roteador.db_for_read(RegistroPonto), 'replica')
+                self.assertIsNone(self.roteador.db_for_read(SaldoDiario))
+                with transaction.atomic():  # ex: banco_horas.sincronizar
+                    self.assertIsNone(self.roteador.db_for_read(RegistroPonto))
+            self.assertEqual(self.roteador.db_for_write(RegistroPonto), 'default')
+
+    def test_usuario_le_as_proprias_escritas(self):
+        with self.settings(DATABASES={**settings.DATABASES, **REPLICA}):
+            RegistroPonto.objects.create(usuario=self.usuario, tipo='ENTRADA', data_hora=timezone.now())
+            with roteador.leitura_replica(self.usuario):
+                self.assertIsNone(self.roteador.db_for_read(RegistroPonto))
+            outro = Usuario.objects.create_user(username='sara', password='123')
+            with roteador.leitura_replica(outro):
+                self.assertEqual(self.roteador.db_for_read(RegistroPonto), 'replica')
+
+    def test_cache_local_com_varios_workers_fica_no_primario(self):
+        # A marca de escrita gravada por outro worker não seria vista: não dá para usar a réplica
+        with self.settings(DATABASES={**settings.DATABASES, **REPLICA}, PONTO_WORKERS=2,
+                           PONTO_CACHE_COMPARTILHADO=False):
+            with roteador.leitura_replica(self.usuario):
+                self.assertIsNone(self.roteador.db_for_read(RegistroPonto))
+            with roteador.leitura_replica():
+                self.assertEqual(self.roteador.db_for_read(RegistroPonto), 'replica')
+
+
+class ArquivoMensalTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Arquivo', cnpj='66')
+        self.usuario = Usuario.objects.create_user(username='tito', password='123', empresa=self.empresa,
+                                                   data_inicio_apuracao=date(2025, 1, 1))
+        dia = date(2025, 1, 1)
+        while dia <= date(2025, 4, 15):
+            if dia.weekday() < 5:
+                jornada_completa(self.usuario, dia, saida=(17, dia.day % 7))
+            dia += timedelta(days=1)
+        self.periodo = (date(2025, 1, 1), date(2025, 4, 15))
+
+    def test_apuracao_identica_depois_de_arquivar(self):
+        hoje = date(2025, 4, 16)
+        antes = list(apurar_periodo(self.usuario, *self.periodo, hoje=hoje))
+        painel_antes = [painel.banco_horas_empresa(self.empresa.pk, *self.periodo, hoje, via_sql=v) for v in (False, True)]
+
+        call_command('arquivar_pontos', '--meses', '1', stdout=io.StringIO())  # relativo a hoje: tudo de 2025
+
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.arquivado_ate, arquivo.limite_fechamento(1) - timedelta(days=1))
+        self.assertFalse(RegistroPonto.objects.filter(usuario=self.usuario).exists())
+        self.assertEqual(ArquivoMensal.objects.filter(usuario=self.usuario).count(), 4)
+
+        depois = list(apurar_periodo(self.usuario, *self.periodo, hoje=hoje))
+        self.assertEqual(antes, depois)
+        for via_sql, esperado in zip((False, True), painel_antes):
+            self.assertEqual(painel.banco_horas_empresa(self.empresa.pk, *self.periodo, hoje, via_sql=via_sql), esperado)
+
+    @mock.patch.object(arquivo, 'LOTE_EXCLUSAO', 100)
+    def test_batida_gravada_durante_o_arquivamento_nao_se_perde(self):
+        # Sincronização offline grava uma batida retroativa entre a leitura e o DELETE
+        empacotar = arquivo.empacotar
+        concorrente = []
+
+        def empacotar_com_batida_concorrente(batidas):
+            if not concorrente:
+                concorrente.append(batida(self.usuario, date(2025, 2, 1), 9, 0, 'ENTRADA'))
+            return empacotar(batidas)
+
+        with mock.patch.object(arquivo, 'empacotar', empacotar_com_batida_concorrente):
+            arquivo.arquivar_usuario(self.usuario, date(2025, 5, 1))
+        self.assertEqual(list(RegistroPonto.objects.filter(usuario=self.usuario)), concorrente)
+
+    def test_batida_nova_em_mes_arquivado_e_intercalada(self):
+        call_command('arquivar_pontos', '--meses', '1', stdout=io.StringIO())
+        self.usuario.refresh_from_db()
+        # Sábado 01/02/2025 lançado depois do arquivamento: fica na tabela viva e entra na apuração
+        batida(self.usuario, date(2025, 2, 1), 9, 0, 'ENTRADA')
+        batida(self.usuario, date(2025, 2, 1), 10, 0, 'SAIDA')
+        dias = {d.data: d for d in apurar_periodo(self.usuario, date(2025, 1, 31), date(2025, 2, 3), hoje=date(2025, 5, 1))}
+        self.assertEqual(dias[date(2025, 2, 1)].minutos_trabalhados, 60)
+        self.assertEqual(len(dias[date(2025, 1, 31)].batidas), 4)
+
+        call_command('arquivar_pontos', '--meses', '1', stdout=io.StringIO())  # reempacota fevereiro
+        fevereiro = ArquivoMensal.objects.get(usuario=self.usuario, competencia=date(2025, 2, 1))
+        self.assertEqual(len(arquivo.desempacotar(fevereiro.batidas)), fevereiro.qtd_registros)
+        self.assertFalse(RegistroPonto.objects.filter(usuario=self.usuario).exists())
+
+
+class DataLocalTests(TestCase):
+    def test_data_local_no_fuso_configurado_em_save_e_bulk_create(self):
+        usuario = Usuario.objects.create_user(username='ivo', password='123')
+        madrugada_utc = datetime(2026, 3, 3, 1, 30, tzinfo=dt_timezone.utc)  # 22:30 do dia 2 em São Paulo
+        salvo = RegistroPonto.objects.create(usuario=usuario, tipo='SAIDA', data_hora=madrugada_utc)
+        em_lote, = RegistroPonto.objects.bulk_create([
+            RegistroPonto(usuario=usuario, tipo='ENTRADA', data_hora=madrugada_utc + timedelta(hours=12)),
+        ])
+        self.assertEqual(salvo.data_local, date(2026, 3, 2))
+        self.assertEqual(em_lote.data_local, date(2026, 3, 3))
+        self.assertEqual(RegistroPonto.objects.filter(usuario=usuario, data_local=date(2026, 3, 2)).get(), salvo)
+
+
+class EtagTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Etag', cnpj='77')
+        self.usuario = Usuario.objects.create_user(username='eva', password='123', empresa=self.empresa)
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.usuario).key}'}
+
+    def _get(self, url, etag=None):
+        headers = dict(self.headers, **({'If-None-Match': etag} if etag else {}))
+        return self.client.get(url, headers=headers)
+
+    def test_304_sem_apuracao_ate_os_dados_mudarem(self):
+        for url in ('/api/status/', '/api/historico/'):
+            primeira = self._get(url)
+            self.assertEqual(primeira.status_code, 200)
+            with self.assertNumQueries(0):  # nem autenticação, nem apuração
+                self.assertEqual(self._get(url, primeira['ETag']).status_code, 304)
+
+        status = self._get('/api/status/')['ETag']
+        self.client.post('/api/registrar/', {'tipo': 'ENTRADA'}, headers=self.headers)
+        self.assertEqual(self._get('/api/status/', status).status_code, 200)
+
+        historico = self._get('/api/historico/')['ETag']
+        Feriado.objects.create(empresa=self.empresa, data=timezone.localdate(), nome='Feriado')
+        self.assertEqual(self._get('/api/historico/', historico).status_code, 200)
+
+
+class HistoricoPaginadoTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Cursor', cnpj='88')
+        self.admin = Usuario.objects.create_user(username='chefe', password='123', empresa=self.empresa, tipo='ADMIN')
+        self.usuario = Usuario.objects.create_user(username='rui', password='123', empresa=self.empresa)
+        mesmo_instante = timezone.make_aware(datetime(2026, 3, 2, 8, 0))
+        RegistroPonto.objects.bulk_create([
+            RegistroPonto(usuario=self.usuario, tipo='ENTRADA', data_hora=mesmo_instante) for _ in range(3)
+        ])
+        for dia in (date(2026, 3, 3), date(2026, 3, 4)):
+            jornada_completa(self.usuario, dia)
+        batida(self.admin, date(2026, 3, 3), 9, 0, 'ENTRADA')
+
+    def _paginas(self, quem, **params):
+        headers = {'Authorization': f'Token {Token.objects.get_or_create(user=quem)[0].key}'}
+        ids, cursor = [], None
+        while True:
+            resposta = self.client.get('/api/batidas/', dict(params, **({'cursor': cursor} if cursor else {})),
+                                       headers=headers)
+            self.assertEqual(resposta.status_code, 200)
+            ids += [r['id'] for r in resposta.data['resultados']]
+            cursor = resposta.data['proximo']
+            if not cursor:
+                return ids
+
+    def test_percorre_todas_as_paginas_sem_repetir(self):
+        ids = self._paginas(self.usuario, limite=2)
+        esperado = [str(pk) for pk in RegistroPonto.objects.filter(usuario=self.usuario)
+                    .order_by('-data_hora', '-id').values_list('id', flat=True)]
+        self.assertEqual(ids, esperado)
+
+        self.assertEqual(len(self._paginas(self.usuario, limite=2, data_inicio='2026-03-03', data_fim='2026-03-03')), 4)
+
+    def test_admin_ve_equipe_e_funcionario_nao_ve_outros(self):
+        self.assertEqual(len(self._paginas(self.admin, usuario='equipe', limite=3)), 12)
+        self.assertEqual(len(self._paginas(self.admin, usuario=str(self.usuario.pk))), 11)
+
+        headers = {'Authorization': f'Token {Token.objects.create(user=self.usuario).key}'}
+        resposta = self.client.get('/api/batidas/', {'usuario': 'equipe'}, headers=headers)
+        self.assertEqual(resposta.status_code, 403)
+        resposta = self.client.get('/api/batidas/', {'cursor': 'xx'}, headers=headers)
+        self.assertEqual(resposta.status_code, 400)
+
+
+class ExportacaoTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Exporta Ltda', cnpj='12.345.678/0001-90')
+        self.admin = Usuario.objects.create_user(username='gil', password='123', empresa=self.empresa, tipo='ADMIN',
+                                                 cpf='11122233344')
+        self.usuario = Usuario.objects.create_user(username='lia', password='123', empresa=self.empresa,
+                                                   cpf='55566677788')
+        jornada_completa(self.usuario, date(2025, 1, 6))
+        call_command('arquivar_pontos', '--meses', '1', stdout=io.StringIO())  # janeiro/2025 vai para o arquivo
+        jornada_completa(self.admin, date(2025, 1, 6), saida=(16, 0))
+        jornada_completa(self.usuario, date(2025, 2, 3))
+        outra = Empresa.objects.create(nome='Outra', cnpj='99')
+        batida(Usuario.objects.create_user(username='zeca', password='123', empresa=outra), date(2025, 1, 6), 8, 0, 'ENTRADA')
+
+    def test_csv_em_streaming_com_meses_arquivados(self):
+        headers = {'Authorization': f'Token {Token.objects.create(user=self.admin).key}'}
+        resposta = self.client.get('/api/empresa/exportar/', {'data_inicio': '2025-01-01', 'data_fim': '2025-02-28'},
+                                   headers=headers)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        linhas = b''.join(resposta.streaming_content).decode().splitlines()[1:]
+        self.assertEqual(len(linhas), 12)
+        colunas = [linha.split(';') for linha in linhas]
+        self.assertEqual([c[5] for c in colunas], sorted(c[5] for c in colunas))
+        self.assertEqual(sum(c[9] == '1' for c in colunas), 4)  # as do arquivo entram intercaladas
+        self.assertEqual({c[1] for c in colunas}, {'gil', 'lia'})
+
+    def test_afd_pelo_comando(self):
+        with tempfile.NamedTemporaryFile(suffix='.txt') as destino:
+            call_command('exportar_pontos', '--empresa', self.empresa.cnpj, '--desde', '2025-01-01',
+                         '--ate', '2025-01-31', '--saida', destino.name, stdout=io.StringIO())
+            linhas = open(destino.name, encoding='latin-1', newline='').read().split('\r\n')[:-1]
+
+        cabecalho, *marcacoes, trailer = linhas
+        self.assertEqual((len(cabecalho), cabecalho[9], cabecalho[11:25]), (302, '1', '12345678000190'))
+        self.assertEqual(len(marcacoes), 8)
+        self.assertEqual({len(m) for m in marcacoes}, {137})
+        self.assertEqual([m[:9] for m in marcacoes], [f'{n:09d}' for n in range(1, 9)])
+        self.assertEqual(marcacoes[0][10:34], '2025-01-06T08:00:00-0300')
+        self.assertEqual({m[34:46] for m in marcacoes}, {'011122233344', '055566677788'})
+        self.assertEqual(trailer, '999999999' + '0' * 45 + '000000008' + '9')
+
+
+class ImportacaoRelogioTests(TestCase):
+    DIA = date(2026, 3, 2)
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Relógio', cnpj='31')
+        self.usuario = Usuario.objects.create_user(username='ney', password='123', empresa=self.empresa,
+                                                   cpf='12345678901', data_inicio_apuracao=self.DIA)
+
+    def _afd(self, horarios):
+        linhas = ['000000000' + '1' + '1' + '0' * 14 + ' ' * 277]
+        for nsr, (cpf, hora) in enumerate(horarios, 1):
+            linhas.append(f'{nsr:09d}3{self.DIA.isoformat()}T{hora}:00-0300{cpf.zfill(12)}ABCD')
+        linhas.append('000000099' + '3' + 'data-invalida-----------' + '012345678901' + 'ABCD')
+        arquivo = tempfile.NamedTemporaryFile('w', suffix='.txt', encoding='latin-1', newline='', delete=False)
+        with arquivo:
+            arquivo.write('\r\n'.join(linhas) + '\r\n')
+        self.addCleanup(os.remove, arquivo.name)
+        return arquivo.name
+
+    def test_importa_afd_sem_duplicar_e_atualiza_banco_de_horas(self):
+        batida(self.usuario, self.DIA, 8, 0, 'ENTRADA')  # já registrada pelo app
+        banco_horas.sincronizar(self.usuario, self.DIA + timedelta(days=1))
+        caminho = self._afd([('12345678901', '08:00'), ('12345678901', '12:00'), ('99999999999', '12:00'),
+                             ('12345678901', '13:00'), ('12345678901', '17:00')])
+
+        saida = io.StringIO()
+        call_command('importar_relogio', caminho, '--empresa', '31', stdout=saida, stderr=io.StringIO())
+        self.assertIn('5 marcações lidas, 3 criadas, 1 duplicadas, 1 CPFs sem usuário, 1 linhas com erro', saida.getvalue())
+        self.assertEqual(list(RegistroPonto.objects.filter(usuario=self.usuario).order_by('data_hora')
+                              .values_list('tipo', flat=True)), ['ENTRADA', 'SAIDA_ALMOCO', 'VOLTA_ALMOCO', 'SAIDA'])
+
+        banco_horas.sincronizar(self.usuario, self.DIA + timedelta(days=1))
+        self.assertEqual(SaldoDiario.objects.get(usuario=self.usuario, data=self.DIA).minutos_trabalhados, 480)
+
+        call_command('importar_relogio', caminho, '--empresa', '31', stdout=saida, stderr=io.StringIO())
+        self.assertIn('0 criadas, 4 duplicadas', saida.getvalue())
+
+    def test_upload_csv_pelo_admin(self):
+        admin = Usuario.objects.create_superuser(username='root', password='123', email='r@x.com')
+        self.client.force_login(admin)
+        csv_relogio = io.BytesIO('cpf;data;hora\n123.456.789-01;02/03/2026;08:00\n123.456.789-01;02/03/2026;17:00\n'
+                                 .encode())
+        csv_relogio.name = 'relogio.csv'
+        resposta = self.client.post('/admin/core/registroponto/importar/',
+                                    {'empresa': self.empresa.pk, 'arquivo': csv_relogio})
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(list(RegistroPonto.objects.filter(usuario=self.usuario).order_by('data_hora')
+                              .values_list('tipo', flat=True)), ['ENTRADA', 'SAIDA'])
+
+
+class AdminEscalaTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Admin', cnpj='41')
+        self.client.force_login(Usuario.objects.create_superuser(username='root', password='123', email='r@x.com'))
+
+    def _criar(self, n, inicio=0):
+        for i in range(inicio, inicio + n):
+            usuario = Usuario.objects.create_user(username=f'f{i}', password='123', empresa=self.empresa,
+                                                  data_inicio_apuracao=date(2026, 3, 2))
+            jornada_completa(usuario, date(2026, 3, 2), saida=(18, 0))
+            banco_horas.sincronizar(usuario, date(2026, 3, 2))
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(contexto)
+
+    def test_listagens_sem_query_por_linha(self):
+        self._criar(2)
+        poucos = [self._queries('/admin/core/registroponto/'), self._queries('/admin/core/usuario/')]
+        self._criar(8, inicio=2)
+        self.assertEqual([self._queries('/admin/core/registroponto/'), self._queries('/admin/core/usuario/')], poucos)
+
+        pagina = self.client.get('/admin/core/usuario/').content.decode()
+        self.assertIn('+01:00 (até 02/03/2026)', pagina)
+
+    def test_filtro_de_usuario_por_autocomplete(self):
+        self._criar(2)
+        alvo = Usuario.objects.get(username='f1')
+        resposta = self.client.get('/admin/core/registroponto/', {'usuario': str(alvo.pk)})
+        self.assertEqual(resposta.context['cl'].result_count, 4)
+        self.assertIn('data-field-name="usuario"', resposta.content.decode())
+        self.assertEqual({r.usuario_id for r in resposta.context['cl'].result_list}, {alvo.pk})
+
+        resposta = self.client.get('/admin/core/registroponto/', {'usuario': 'abc'})
+        self.assertEqual(resposta.status_code, 302)
+        self.assertTrue(resposta['Location'].endswith('?e=1'))
+
+
+class AnomaliasTests(TestCase):
+    SEGUNDA = date(2026, 3, 2)
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Anomalias', cnpj='51')
+        Feriado.objects.create(empresa=self.empresa, data=self.SEGUNDA + timedelta(days=4), nome='Feriado')
+        self.admin = Usuario.objects.create_user(username='chefe', password='123', empresa=self.empresa, tipo='ADMIN',
+                                                 data_inicio_apuracao=self.SEGUNDA)
+        self.usuario = Usuario.objects.create_user(username='teo', password='123', empresa=self.empresa,
+                                                   data_inicio_apuracao=self.SEGUNDA)
+        for i in range(4):
+            jornada_completa(self.admin, self.SEGUNDA + timedelta(days=i))
+        jornada_completa(self.usuario, self.SEGUNDA)
+        terca, quarta = self.SEGUNDA + timedelta(days=1), self.SEGUNDA + timedelta(days=2)
+        for hora, tipo in ((8, 'ENTRADA'), (12, 'SAIDA_ALMOCO'), (13, 'VOLTA_ALMOCO')):
+            batida(self.usuario, terca, hora, 0, tipo)
+        for hora, tipo in ((8, 'ENTRADA'), (12, 'VOLTA_ALMOCO'), (13, 'SAIDA_ALMOCO'), (17, 'SAIDA')):
+            batida(self.usuario, quarta, hora, 0, tipo)
+
+    def test_varredura_grava_anomalias_e_relatorio_filtra(self):
+        for _ in range(2):  # rodar de novo substitui as do período
+            call_command('verificar_anomalias', '--desde', '2026-03-02', '--ate', '2026-03-08', stdout=io.StringIO())
+        encontradas = sorted((a.data.day, a.tipo) for a in Anomalia.objects.all())
+        self.assertEqual(encontradas, [(3, 'IMPAR'), (3, 'SEM_SAIDA'), (4, 'FORA_DE_ORDEM'), (5, 'FALTA')])
+        self.assertEqual(set(Anomalia.objects.values_list('usuario__username', flat=True)), {'teo'})
+
+        headers = {'Authorization': f'Token {Token.objects.create(user=self.admin).key}'}
+        resposta = self.client.get('/api/empresa/anomalias/', {'data_inicio': '2026-03-01', 'data_fim': '2026-03-31',
+                                                                'tipo': 'FALTA'}, headers=headers)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([(a['data'], a['username']) for a in resposta.data['anomalias']], [(date(2026, 3, 5), 'teo')])
+
+    def test_meses_arquivados_nao_viram_falta(self):
+        inicio = date(2024, 3, 4)
+        for usuario in (self.admin, self.usuario):
+            usuario.data_inicio_apuracao = inicio
+            usuario.save()
+        for i in range(5):
+            jornada_completa(self.usuario, inicio + timedelta(days=i))
+        periodo = (inicio, inicio + timedelta(days=4))
+        self.assertEqual({a.usuario.username for a in anomalias.varrer(*periodo)}, {'chefe'})  # o admin faltou
+
+        arquivo.arquivar_usuario(self.usuario, date(2024, 4, 1))
+        self.assertEqual({a.usuario.username for a in anomalias.varrer(*periodo)}, {'chefe'})
+
+    def test_custo_nao_depende_de_usuarios_vezes_dias(self):
+        for i in range(10):
+            Usuario.objects.create_user(username=f'novo{i}', password='123', empresa=self.empresa,
+                                        data_inicio_apuracao=self.SEGUNDA)
+        with CaptureQueriesContext(connection) as contexto:
+            anomalias.varrer(self.SEGUNDA, self.SEGUNDA + timedelta(days=60))
+        self.assertLessEqual(len(contexto), 4)  # usuários, batidas e o calendário da empresa
+
+
+class CacheCompartilhadoTests(TestCase):
+    def test_check_falha_com_cache_local_e_varios_workers(self):
+        with override_settings(PONTO_WORKERS=2, PONTO_CACHE_COMPARTILHADO=False):
+            with self.assertRaisesMessage(SystemCheckError, 'core.E001'):
+                call_command('check', stdout=io.StringIO())
+        with override_settings(PONTO_WORKERS=2, PONTO_CACHE_COMPARTILHADO=True):
+            call_command('check', stdout=io.StringIO())
+
+    def test_status_em_cache_local_expira_em_segundos(self):
+        usuario = Usuario.objects.create_user(username='kai', password='123')
+        with override_settings(PONTO_WORKERS=2, PONTO_CACHE_COMPARTILHADO=False), \
+                mock.patch.object(status_dia.cache, 'set') as gravar:
+            status_dia.atualizar(usuario)
+        self.assertEqual(gravar.call_args.args[2], status_dia.CACHE_TIMEOUT_LOCAL)
+
+    def test_sem_etag_com_cache_local_e_varios_workers(self):
+        usuario = Usuario.objects.create_user(username='lou', password='123')
+        headers = {'Authorization': f'Token {Token.objects.create(user=usuario).key}'}
+        etag = self.client.get('/api/status/', headers=headers)['ETag']
+        with override_settings(PONTO_WORKERS=2, PONTO_CACHE_COMPARTILHADO=False):
+            resposta = self.client.get('/api/status/', headers=dict(headers, **{'If-None-Match': etag}))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('ETag', resposta)
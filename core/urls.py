@@ -1,9 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from .views import StatusPontoView, RegistrarPontoView, relatorio_mensal, gerar_relatorio_pdf # <--- Adicione o import aqui
+from . import views_async
+from .views import StatusPontoView, RegistrarPontoView, SincronizarPontosView, relatorio_mensal, gerar_relatorio_pdf, solicitar_relatorio, status_relatorio, baixar_relatorio, painel_banco_horas, metricas_prometheus, listar_batidas, exportar_batidas, relatorio_anomalias # <--- Adicione o import aqui
 
 urlpatterns = [
-    path('status/', StatusPontoView.as_view(), name='status-ponto'),
-    path('registrar/', RegistrarPontoView.as_view(), name='registrar-ponto'),
+    # No modo ASGI as rotas mais acessadas (pico das 08:00) usam as views async
+    path('status/', views_async.status_ponto if settings.PONTO_ASGI else StatusPontoView.as_view(), name='status-ponto'),
+    path('registrar/', views_async.registrar_ponto if settings.PONTO_ASGI else RegistrarPontoView.as_view(), name='registrar-ponto'),
+    path('sincronizar/', SincronizarPontosView.as_view(), name='sincronizar-pontos'),
     path('historico/', relatorio_mensal, name='historico'), 
+    path('batidas/', listar_batidas, name='batidas'),
     path('relatorio-pdf/', gerar_relatorio_pdf, name='relatorio_pdf'),
+    path('relatorios/', solicitar_relatorio, name='relatorios'),
+    path('relatorios/<uuid:pk>/', status_relatorio, name='relatorio-status'),
+    path('relatorios/<uuid:pk>/download/', baixar_relatorio, name='relatorio-download'),
+    path('empresa/banco-horas/', painel_banco_horas, name='painel-banco-horas'),
+    path('empresa/exportar/', exportar_batidas, name='exportar-batidas'),
+    path('empresa/anomalias/', relatorio_anomalias, name='anomalias'),
+    path('metrics', metricas_prometheus, name='metricas'),
 ]
\ No newline at end of file
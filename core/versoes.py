@@ -0,0 +1,123 @@
+"""
+Versão dos dados de cada usuário, para GET condicional (ETag / 304) em status e histórico.
+
+Três contadores no cache, incrementados pelos signals:
+- usuário: batidas criadas/editadas/apagadas e mudanças de jornada do próprio usuário;
+- empresa: feriados e recessos;
+- escala: mudanças na escala do usuário.
+O ETag é o hash desses contadores + recurso + dia. Comparar custa uma leitura de cache
+(get_many), antes de qualquer apuração ou serialização.
+
+Os contadores começam em time_ns(): se a chave for descartada pelo cache, o valor novo
+nunca repete um antigo e um ETag velho não casa por acidente.
+
+Um 304 é respondido sem olhar o banco, então os contadores precisam ser os mesmos em
+todos os workers: com cache local por processo e vários workers (ver core/checks.py)
+não há ETag e toda resposta é completa.
+"""
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from .checks import cache_coerente
+
+
+def _chave(escopo, pk):
+    return f'versao:{escopo}:{pk}'
+
+
+def _chaves(usuario):
+    chaves = [_chave('usuario', usuario.pk)]
+    if usuario.empresa_id:
+        chaves.append(_chave('empresa', usuario.empresa_id))
+    if usuario.escala_id:
+        chaves.append(_chave('escala', usuario.escala_id))
+    return chaves
+
+
+def _incrementar(chaves):
+    for chave in chaves:
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, time.time_ns(), None)
+
+
+def incrementar_usuario(*usuario_ids):
+    _incrementar([_chave('usuario', pk) for pk in usuario_ids])
+
+
+def incrementar_empresa(empresa_id):
+    _incrementar([_chave('empresa', empresa_id)])
+
+
+def incrementar_escala(escala_id):
+    _incrementar([_chave('escala', escala_id)])
+
+
+def _montar_etag(usuario, recurso, chaves, valores, hoje):
+    bruto = '|'.join([recurso, str(usuario.pk), str(usuario.empresa_id), str(usuario.escala_id), hoje.isoformat()]
+                     + [str(valores[chave]) for chave in chaves])
+    return '"' + hashlib.sha1(bruto.encode()).hexdigest() + '"'
+
+
+def etag(usuario, recurso, hoje=None):
+    if not cache_coerente():
+        return None
+    chaves = _chaves(usuario)
+    valores = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in valores:
+            cache.add(chave, time.time_ns(), None)
+            valores[chave] = cache.get(chave)
+    return _montar_etag(usuario, recurso, chaves, valores, hoje or timezone.localdate())
+
+
+async def aetag(usuario, recurso, hoje=None):
+    if not cache_coerente():
+        return None
+    chaves = _chaves(usuario)
+    valores = await cache.aget_many(chaves)
+    for chave in chaves:
+        if chave not in valores:
+            await cache.aadd(chave, time.time_ns(), None)
+            valores[chave] = await cache.aget(chave)
+    return _montar_etag(usuario, recurso, chaves, valores, hoje or timezone.localdate())
+
+
+def nao_modificado(request, valor):
+    """Resposta 304 se o cliente já tem a versão `valor`; senão None."""
+    if valor is None:
+        return None
+    enviados = parse_etags(request.headers.get('If-None-Match', ''))
+    if valor in enviados or '*' in enviados:
+        response = HttpResponseNotModified()
+        aplicar(response, valor)
+        return response
+    return None
+
+
+def aplicar(response, valor):
+    # Respostas com "no-store" (ex: erro na apuração) não ganham ETag
+    if valor is not None and response.status_code in (200, 304) and 'no-store' not in response.get('Cache-Control', ''):
+        response['ETag'] = valor
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+def com_etag(recurso):
+    """Decorator para views já autenticadas (em métodos, via method_decorator)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            valor = etag(request.user, recurso)
+            return nao_modificado(request, valor) or aplicar(view(request, *args, **kwargs), valor)
+        return wrapper
+    return decorator
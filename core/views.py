@@ -3,70 +3,41 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import status
+from .permissions import IsAdminEmpresa
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta, datetime, date
-from .models import RegistroPonto, Feriado, Recesso
-from .serializers import RegistroPontoSerializer
-from django.http import HttpResponse
+from django.db import IntegrityError, OperationalError, transaction
+import logging
+import time
+import uuid
+from datetime import datetime
+from .models import Anomalia, RegistroPonto, SaldoDiario, TarefaRelatorio, Usuario
+from .paginacao import LIMITE_MAXIMO, LIMITE_PADRAO, CursorInvalido, paginar
+from .serializers import (RegistroPontoSerializer, RegistroOfflineSerializer, TarefaRelatorioSerializer,
+                          BatidaHistoricoSerializer)
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
+from django.shortcuts import get_object_or_404
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
+from django.utils.decorators import method_decorator
+from . import banco_horas, exportacao, geofence, metricas, painel, relatorios, status_dia
+from .roteador import iterar_na_replica, marcar_escrita, usar_replica
+from .versoes import com_etag, incrementar_usuario
+from .apuracao import formatar_minutos
+from .relatorios import linhas_espelho
+
+logger = logging.getLogger(__name__)
 
 # --- CLASSE 1: STATUS DO DIA ---
 class StatusPontoView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(com_etag('status'))
+    @method_decorator(usar_replica)
     def get(self, request):
-        usuario = request.user
-        hoje = timezone.localdate()
-        
-        registros_hoje = RegistroPonto.objects.filter(
-            usuario=usuario, 
-            data_hora__date=hoje
-        ).order_by('data_hora')
-
-        horas_trabalhadas = timedelta(0)
-        entrada_temp = None
-
-        for registro in registros_hoje:
-            if registro.tipo in ['ENTRADA', 'VOLTA_ALMOCO']:
-                entrada_temp = registro.data_hora
-            elif registro.tipo in ['SAIDA_ALMOCO', 'SAIDA']:
-                if entrada_temp:
-                    delta = registro.data_hora - entrada_temp
-                    horas_trabalhadas += delta
-                    entrada_temp = None
-        
-        total_segundos = int(horas_trabalhadas.total_seconds())
-        horas, remainder = divmod(total_segundos, 3600)
-        minutos, _ = divmod(remainder, 60)
-        horas_formatadas = f"{horas:02}:{minutos:02}"
-
-        ultimo_registro = registros_hoje.last()
-
-        if not ultimo_registro:
-            proximo = 'ENTRADA'
-            mensagem = 'Registrar Entrada'
-        elif ultimo_registro.tipo == 'ENTRADA':
-            proximo = 'SAIDA_ALMOCO'
-            mensagem = 'Sair para o Almoço'
-        elif ultimo_registro.tipo == 'SAIDA_ALMOCO':
-            proximo = 'VOLTA_ALMOCO'
-            mensagem = 'Voltar do Almoço'
-        elif ultimo_registro.tipo == 'VOLTA_ALMOCO':
-            proximo = 'SAIDA'
-            mensagem = 'Encerrar Expediente'
-        else:
-            proximo = 'FIM_DO_DIA'
-            mensagem = 'Expediente Finalizado'
-
-        return Response({
-            'historico': RegistroPontoSerializer(registros_hoje, many=True).data,
-            'ultimo_registro': RegistroPontoSerializer(ultimo_registro).data if ultimo_registro else None,
-            'proxima_acao': proximo,
-            'texto_botao': mensagem,
-            'horas_trabalhadas': horas_formatadas
-        })
+        return Response(status_dia.obter(request.user))
 
 # --- CLASSE 2: REGISTRAR BATIDA ---
 class RegistrarPontoView(APIView):
@@ -86,183 +57,146 @@ class RegistrarPontoView(APIView):
             data_hora=timezone.now(), 
             latitude=lat,
             longitude=long,
-            localizacao_valida=True
+            localizacao_valida=geofence.localizacao_valida(usuario, lat, long)
         )
+        status_dia.atualizar(usuario)
         
         return Response(RegistroPontoSerializer(novo_ponto).data, status=status.HTTP_201_CREATED)
 
+# --- CLASSE 3: SINCRONIZAÇÃO OFFLINE (LOTE) ---
+class SincronizarPontosView(APIView):
+    """
+    Recebe as batidas que o app acumulou sem sinal: {"registros": [{id_cliente, tipo, data_hora, ...}]}.
+    Duplicadas (mesmo id_cliente) são descartadas com uma única query e o resto entra com bulk_create.
+    """
+    permission_classes = [IsAuthenticated]
+    LIMITE_LOTE = 500
+
+    def post(self, request):
+        usuario = request.user
+        itens = request.data.get('registros')
+        if not isinstance(itens, list):
+            return Response({'erro': 'Envie uma lista em "registros".'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(itens) > self.LIMITE_LOTE:
+            return Response({'erro': f'Máximo de {self.LIMITE_LOTE} registros por lote.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # 1. Valida item a item (um registro ruim não derruba o lote)
+        resultados = []
+        validos = {}
+        for item in itens:
+            serializer = RegistroOfflineSerializer(data=item, context={'usuario': usuario})
+            if not serializer.is_valid():
+                id_cliente = item.get('id_cliente') if isinstance(item, dict) else None
+                resultados.append({'id_cliente': id_cliente, 'status': 'erro', 'erros': serializer.errors})
+                continue
+            dados = serializer.validated_data
+            resultado = {'id_cliente': str(dados['id_cliente']), 'status': 'criado'}
+            if dados['id_cliente'] in validos:
+                resultado['status'] = 'duplicado'
+            else:
+                validos[dados['id_cliente']] = (dados, resultado)
+            resultados.append(resultado)
+
+        # 2. Descarta o que já foi sincronizado antes (uma query) e grava o resto (um INSERT em lote)
+        indice = geofence.obter_indice(usuario.empresa_id) if usuario.empresa_id else None
+        for tentativa in range(2):
+            ja_existentes = dict(RegistroPonto.objects.filter(
+                usuario=usuario, id_cliente__in=list(validos)
+            ).values_list('id_cliente', 'id'))
+
+            novos = []
+            for id_cliente, (dados, resultado) in validos.items():
+                if id_cliente in ja_existentes:
+                    resultado['status'] = 'duplicado'
+                    resultado['id'] = str(ja_existentes[id_cliente])
+                    continue
+                novo = RegistroPonto(
+                    usuario=usuario,
+                    id_cliente=id_cliente,
+                    tipo=dados['tipo'],
+                    data_hora=dados['data_hora'],
+                    latitude=dados.get('latitude'),
+                    longitude=dados.get('longitude'),
+                    localizacao_valida=geofence.localizacao_valida(
+                        usuario, dados.get('latitude'), dados.get('longitude'), indice
+                    ),
+                )
+                resultado['id'] = str(novo.id)
+                novos.append(novo)
+
+            try:
+                with transaction.atomic():
+                    RegistroPonto.objects.bulk_create(novos)
+                break
+            except IntegrityError:
+                # Outro envio do mesmo lote chegou junto: refaz a deduplicação uma vez
+                if tentativa:
+                    raise
+
+        # 3. bulk_create não dispara signals: atualiza banco de horas e status dos dias afetados
+        for data in sorted({n.data_local for n in novos}):
+            banco_horas.atualizar_dia(usuario, data)
+            status_dia.invalidar(usuario.pk, data)
+        if novos:
+            marcar_escrita(usuario.pk)
+            incrementar_usuario(usuario.pk)
+
+        return Response({'criados': len(novos), 'resultados': resultados})
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@com_etag('historico')
+@usar_replica
 def relatorio_mensal(request):
     try:
         usuario = request.user
         hoje = timezone.localdate()
-        
-        # 1. Define o Início (Data de Apuração ou Padrão)
-        cursor_data = date(2025, 1, 1) # Data de segurança antiga
-        if usuario.data_inicio_apuracao:
-            cursor_data = usuario.data_inicio_apuracao
-        
-        # 2. Busca TUDO do banco a partir da data de início
-        # Otimização: Trazemos tudo para a memória para não consultar o banco dentro do loop
-        registros_banco = RegistroPonto.objects.filter(
-            usuario=usuario,
-            data_hora__date__gte=cursor_data
-        ).order_by('data_hora')
-        
-        # Organiza em dicionário para acesso rápido: {'2026-01-20': [Ponto1, Ponto2]}
-        mapa_pontos = {}
-        for p in registros_banco:
-            d_str = p.data_hora.astimezone().strftime('%Y-%m-%d')
-            if d_str not in mapa_pontos: mapa_pontos[d_str] = []
-            mapa_pontos[d_str].append(p)
-
-        # 3. Busca Exceções (Feriados/Recessos)
-        lista_feriados = []
-        lista_recessos = []
-        if usuario.empresa:
-            lista_feriados = Feriado.objects.filter(empresa=usuario.empresa).values_list('data', flat=True)
-            lista_recessos = Recesso.objects.filter(empresa=usuario.empresa)
-
-        # 4. Configura Regras de Jornada (Meta Diária)
-        meta_padrao = 480 # 8 horas em minutos
-        dias_trabalho = [0, 1, 2, 3, 4] # Seg-Sex
-
-        if usuario.usar_configuracao_individual:
-            dias_trabalho = []
-            if usuario.trab_seg: dias_trabalho.append(0)
-            if usuario.trab_ter: dias_trabalho.append(1)
-            if usuario.trab_qua: dias_trabalho.append(2)
-            if usuario.trab_qui: dias_trabalho.append(3)
-            if usuario.trab_sex: dias_trabalho.append(4)
-            if usuario.trab_sab: dias_trabalho.append(5)
-            if usuario.trab_dom: dias_trabalho.append(6)
-            if usuario.carga_horaria_diaria:
-                meta_padrao = int(usuario.carga_horaria_diaria.total_seconds() // 60)
-        elif usuario.escala:
-            esc = usuario.escala
-            dias_trabalho = []
-            if esc.trabalha_segunda: dias_trabalho.append(0)
-            if esc.trabalha_terca: dias_trabalho.append(1)
-            if esc.trabalha_quarta: dias_trabalho.append(2)
-            if esc.trabalha_quinta: dias_trabalho.append(3)
-            if esc.trabalha_sexta: dias_trabalho.append(4)
-            if esc.trabalha_sabado: dias_trabalho.append(5)
-            if esc.trabalha_domingo: dias_trabalho.append(6)
-            if usuario.carga_horaria_diaria:
-                meta_padrao = int(usuario.carga_horaria_diaria.total_seconds() // 60)
-            elif esc.carga_horaria_diaria:
-                meta_padrao = int(esc.carga_horaria_diaria.total_seconds() // 60)
-        elif usuario.carga_horaria_diaria:
-             meta_padrao = int(usuario.carga_horaria_diaria.total_seconds() // 60)
-
-        # === LOOP PRINCIPAL: Percorre CADA DIA do calendário até hoje ===
+
+        # 1. Completa o banco de horas materializado (normalmente só o dia de hoje)
+        banco_horas.sincronizar(usuario, hoje)
+
+        # 2. Saldo total = acumulado da última linha; lista = linhas do mês atual
+        saldos = SaldoDiario.objects.filter(usuario=usuario)
+        ultimo = saldos.order_by('-data').values_list('saldo_acumulado', flat=True).first()
+        saldo_total = ultimo or 0
+
+        dias_mes = saldos.filter(data__gte=hoje.replace(day=1), data__lte=hoje).order_by('-data')
+
         lista_final = []
-        saldo_total = 0
-        
-        # Enquanto a data do cursor não passar de hoje...
-        while cursor_data <= hoje:
-            data_str = cursor_data.strftime('%Y-%m-%d')
-            dia_semana = cursor_data.weekday()
-            
-            # A. Verifica Folga/Feriado
-            eh_folga = False
-            nome_motivo = ""
-            
-            if cursor_data in lista_feriados:
-                eh_folga = True; nome_motivo = "(Feriado)"
-            
-            if not eh_folga:
-                for recesso in lista_recessos:
-                    if recesso.data_inicio <= cursor_data <= recesso.data_fim:
-                        eh_folga = True; nome_motivo = "(Recesso)"; break
-
-            # B. Define Meta do Dia
-            if eh_folga: 
-                meta_dia = 0
-            elif dia_semana in dias_trabalho: 
-                meta_dia = meta_padrao
-            else: 
-                meta_dia = 0
-
-            # C. Calcula Trabalhado (Busca no dicionário se houve registro nesse dia)
-            pontos_dia = mapa_pontos.get(data_str, [])
-            horarios = [p.data_hora for p in pontos_dia]
-            horarios.sort()
-            
-            minutos_trabalhados = 0
-            for i in range(0, len(horarios), 2):
-                if i+1 < len(horarios):
-                    delta = (horarios[i+1] - horarios[i]).total_seconds() / 60
-                    minutos_trabalhados += delta
-
-            # D. Calcula Saldo do Dia
-            saldo_str = "Em andamento"
-            calcular_saldo = True
-            
-            # Regra para HOJE: Só desconta se já tiver batido a saída ou se não tiver registro nenhum (mas dia ainda não acabou)
-            if cursor_data == hoje:
-                if not pontos_dia: 
-                    # Se não tem ponto hoje, não calcula saldo ainda (espera acabar o dia)
-                    calcular_saldo = False 
-                elif pontos_dia[-1].tipo != 'SAIDA': 
-                    # Se tem ponto mas o último não é saída (ainda está trabalhando)
-                    calcular_saldo = False 
-
-            if calcular_saldo:
-                saldo = minutos_trabalhados - meta_dia
-                saldo_total += saldo
-                
-                sinal = "+" if saldo >= 0 else "-"
-                saldo_abs = abs(saldo)
-                saldo_str = f"{sinal}{int(saldo_abs//60):02d}:{int(saldo_abs%60):02d}"
-
-            # E. Monta a Lista Visual (Apenas Mês Atual)
+        for dia in dias_mes:
             # Regra de Exibição: Mostra se tiver ponto OU se for Falta OU se for Folga
-            deve_mostrar_na_lista = False
-            if cursor_data.month == hoje.month and cursor_data.year == hoje.year:
-                deve_mostrar_na_lista = True
-            
-            # Detecta Falta: Deveria trabalhar (meta > 0), Trabalhou 0, e dia já passou (< hoje)
-            eh_falta = (meta_dia > 0 and minutos_trabalhados == 0 and cursor_data < hoje)
-            tem_registro = len(pontos_dia) > 0
-            
-            if deve_mostrar_na_lista and (tem_registro or eh_falta or eh_folga):
-                h_trab = int(minutos_trabalhados // 60)
-                m_trab = int(minutos_trabalhados % 60)
-                str_trabalhado = f"{h_trab:02d}:{m_trab:02d}"
-                
-                label_data = cursor_data.strftime('%d/%m')
-                # Adiciona etiqueta visual
-                if eh_folga: label_data += f" {nome_motivo}"
-                elif eh_falta: label_data += " (Falta)"
-
-                lista_final.append({
-                    "data": label_data,
-                    "horas_trabalhadas": str_trabalhado,
-                    "saldo_dia": saldo_str if calcular_saldo else "..."
-                })
-
-            # AVANÇA PARA O PRÓXIMO DIA
-            cursor_data += timedelta(days=1) 
-
-        # Formatação Final do Saldo Total
-        sinal_t = "+" if saldo_total >= 0 else "-"
-        total_abs = abs(saldo_total)
-        total_str = f"{sinal_t}{int(total_abs//60):02d}:{int(total_abs%60):02d}"
-        
-        # Ordena visualmente do mais recente para o antigo
-        lista_final.sort(key=lambda x: datetime.strptime(x['data'].split(' ')[0] + '/' + str(hoje.year), '%d/%m/%Y'), reverse=True)
+            eh_folga = dia.tipo_dia in ('FERIADO', 'RECESSO')
+            eh_falta = dia.tipo_dia == 'FALTA'
+            if not (dia.qtd_registros or eh_falta or eh_folga):
+                continue
+
+            label_data = dia.data.strftime('%d/%m')
+            if dia.tipo_dia == 'FERIADO': label_data += " (Feriado)"
+            elif dia.tipo_dia == 'RECESSO': label_data += " (Recesso)"
+            elif eh_falta: label_data += " (Falta)"
+
+            lista_final.append({
+                "data": label_data,
+                "horas_trabalhadas": formatar_minutos(dia.minutos_trabalhados, sinal=False),
+                "saldo_dia": "..." if dia.em_andamento else formatar_minutos(dia.saldo_dia),
+            })
 
-        return Response({"saldo_banco_horas": total_str, "historico": lista_final})
+        return Response({"saldo_banco_horas": formatar_minutos(saldo_total), "historico": lista_final})
+
+    except OperationalError:
+        # Banco indisponível/lock (ex: réplica fora do ar): o app mostra "ERRO" e tenta de novo.
+        # Erros de integridade do banco de horas não caem aqui: viram 500 e aparecem no log.
+        logger.exception('Relatório mensal indisponível para o usuário %s', request.user.pk)
+        return Response({"saldo_banco_horas": "ERRO", "historico": []}, headers={'Cache-Control': 'no-store'})
+
+# Acima disso o PDF é gerado em streaming (página a página, memória constante)
+LIMITE_DIAS_PDF_EM_MEMORIA = 62
 
-    except Exception as e:
-        import traceback
-        print(traceback.format_exc())
-        return Response({"saldo_banco_horas": "ERRO", "historico": []})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@usar_replica
 def gerar_relatorio_pdf(request):
     usuario = request.user
     data_inicio_str = request.data.get('data_inicio')
@@ -272,10 +206,21 @@ def gerar_relatorio_pdf(request):
     d_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
     d_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
 
+    filename = f"ponto_{usuario.username}_{d_inicio}_{d_fim}.pdf"
+    titulo = f"Espelho de Ponto: {usuario.username}"
+    periodo = f"Período: {d_inicio.strftime('%d/%m/%Y')} a {d_fim.strftime('%d/%m/%Y')}"
+
+    streaming = str(request.data.get('streaming', '')).lower() in ('1', 'true')
+    if streaming or (d_fim - d_inicio).days > LIMITE_DIAS_PDF_EM_MEMORIA:
+        # Batidas lidas em blocos (só data_hora/tipo) e páginas enviadas conforme ficam prontas
+        # Consumido depois que a view retorna: a réplica é ativada pedaço a pedaço
+        pdf = iterar_na_replica(relatorios.gerar_pdf(usuario, d_inicio, d_fim), usuario)
+        response = StreamingHttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     # Configura Response como PDF
     response = HttpResponse(content_type='application/pdf')
-    # Adicionei timestamp para evitar cache
-    filename = f"ponto_{usuario.username}_{d_inicio}_{d_fim}.pdf"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     
     # Cria o Canvas
@@ -285,10 +230,10 @@ def gerar_relatorio_pdf(request):
 
     # --- 1. CABEÇALHO ---
     p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, y, f"Espelho de Ponto: {usuario.username}")
+    p.drawString(50, y, titulo)
     y -= 25
     p.setFont("Helvetica", 12)
-    p.drawString(50, y, f"Período: {d_inicio.strftime('%d/%m/%Y')} a {d_fim.strftime('%d/%m/%Y')}")
+    p.drawString(50, y, periodo)
     y -= 30
     
     # --- 2. COLUNAS ---
@@ -301,124 +246,11 @@ def gerar_relatorio_pdf(request):
     p.line(40, y, 550, y)
     y -= 15
     
-    # --- 3. PREPARAÇÃO DOS DADOS (Igual ao App) ---
-    # Busca registros do período
-    registros_banco = RegistroPonto.objects.filter(
-        usuario=usuario,
-        data_hora__date__gte=d_inicio,
-        data_hora__date__lte=d_fim
-    ).order_by('data_hora')
-    
-    mapa_pontos = {}
-    for r in registros_banco:
-        d_str = r.data_hora.astimezone().strftime('%Y-%m-%d')
-        if d_str not in mapa_pontos: mapa_pontos[d_str] = []
-        mapa_pontos[d_str].append(r)
-
-    # Busca Exceções
-    lista_feriados = []
-    lista_recessos = []
-    if usuario.empresa:
-        lista_feriados = Feriado.objects.filter(empresa=usuario.empresa).values_list('data', flat=True)
-        lista_recessos = Recesso.objects.filter(empresa=usuario.empresa)
-
-    # Regras de Jornada
-    meta_padrao = 480 
-    dias_trabalho = [0, 1, 2, 3, 4] 
-
-    if usuario.usar_configuracao_individual:
-        dias_trabalho = []
-        if usuario.trab_seg: dias_trabalho.append(0)
-        if usuario.trab_ter: dias_trabalho.append(1)
-        if usuario.trab_qua: dias_trabalho.append(2)
-        if usuario.trab_qui: dias_trabalho.append(3)
-        if usuario.trab_sex: dias_trabalho.append(4)
-        if usuario.trab_sab: dias_trabalho.append(5)
-        if usuario.trab_dom: dias_trabalho.append(6)
-        if usuario.carga_horaria_diaria:
-            meta_padrao = int(usuario.carga_horaria_diaria.total_seconds() // 60)
-    elif usuario.escala:
-        esc = usuario.escala
-        dias_trabalho = []
-        if esc.trabalha_segunda: dias_trabalho.append(0)
-        if esc.trabalha_terca: dias_trabalho.append(1)
-        if esc.trabalha_quarta: dias_trabalho.append(2)
-        if esc.trabalha_quinta: dias_trabalho.append(3)
-        if esc.trabalha_sexta: dias_trabalho.append(4)
-        if esc.trabalha_sabado: dias_trabalho.append(5)
-        if esc.trabalha_domingo: dias_trabalho.append(6)
-        if usuario.carga_horaria_diaria:
-            meta_padrao = int(usuario.carga_horaria_diaria.total_seconds() // 60)
-        elif esc.carga_horaria_diaria:
-            meta_padrao = int(esc.carga_horaria_diaria.total_seconds() // 60)
-    elif usuario.carga_horaria_diaria:
-            meta_padrao = int(usuario.carga_horaria_diaria.total_seconds() // 60)
-
-    # --- 4. LOOP DE IMPRESSÃO (Dia a Dia) ---
+    # --- 3. LOOP DE IMPRESSÃO (Dia a Dia, pelo motor de apuração) ---
     p.setFont("Helvetica", 9) # Fonte menor para caber tudo
-    cursor = d_inicio
-    
-    while cursor <= d_fim:
-        data_str = cursor.strftime('%Y-%m-%d')
-        dia_semana = cursor.weekday()
-        
-        # A. Verifica Exceções
-        eh_folga = False
-        motivo = ""
-        if cursor in lista_feriados: eh_folga = True; motivo = "(Feriado)"
-        if not eh_folga:
-            for rec in lista_recessos:
-                if rec.data_inicio <= cursor <= rec.data_fim: eh_folga = True; motivo = "(Recesso)"; break
-        
-        # B. Define Meta
-        if eh_folga: meta_dia = 0
-        elif dia_semana in dias_trabalho: meta_dia = meta_padrao
-        else: meta_dia = 0
-
-        # C. Calcula Horas
-        pontos = mapa_pontos.get(data_str, [])
-        horarios_dt = [pt.data_hora for pt in pontos]
-        horarios_dt.sort()
-        
-        minutos_trab = 0
-        horarios_texto = [] # Para imprimir na coluna 2
-        
-        # Formata horários para texto (ex: "08:00 | 12:00")
-        for pt in pontos:
-            horarios_texto.append(pt.data_hora.astimezone().strftime('%H:%M'))
-        
-        # Cálculo matemático
-        for i in range(0, len(horarios_dt), 2):
-            if i+1 < len(horarios_dt):
-                delta = (horarios_dt[i+1] - horarios_dt[i]).total_seconds() / 60
-                minutos_trab += delta
-
-        # D. Lógica de Falta / Saldo
-        saldo = minutos_trab - meta_dia
-        eh_falta = (meta_dia > 0 and minutos_trab == 0 and cursor < date.today())
-        
-        # Textos Finais
-        str_data = cursor.strftime('%d/%m/%Y')
-        str_batidas = " | ".join(horarios_texto)
-        str_trab = f"{int(minutos_trab//60):02d}:{int(minutos_trab%60):02d}"
-        
-        sinal = "+" if saldo >= 0 else "-"
-        saldo_abs = abs(saldo)
-        str_saldo = f"{sinal}{int(saldo_abs//60):02d}:{int(saldo_abs%60):02d}"
-
-        # Ajustes Visuais para Exceções
-        cor_linha = colors.black
-        if eh_folga:
-            str_batidas = motivo # Escreve "Feriado" no lugar das horas
-            str_trab = "-"
-            str_saldo = "-"
-            cor_linha = colors.blue
-        elif eh_falta:
-            str_batidas = "FALTA"
-            str_trab = "00:00"
-            # Saldo já calculado como negativo ali em cima
-            cor_linha = colors.red
+    inicio_render = time.perf_counter()
 
+    for str_data, str_batidas, str_trab, str_saldo, cor_linha in linhas_espelho(usuario, d_inicio, d_fim):
         # --- IMPRESSÃO NO PDF ---
         # Verifica quebra de página
         if y < 50:
@@ -436,8 +268,222 @@ def gerar_relatorio_pdf(request):
         p.setFillColor(colors.black) # Reseta cor
         p.line(40, y+12, 550, y+12) # Linha divisória fina
 
-        cursor += timedelta(days=1)
-
     p.showPage()
     p.save()
-    return response
\ No newline at end of file
+    metricas.ETAPAS.observar(time.perf_counter() - inicio_render, etapa='pdf_canvas')
+    return response
+
+
+# --- RELATÓRIOS EM BACKGROUND (fila + cache de PDFs) ---
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def solicitar_relatorio(request):
+    """Enfileira o espelho de ponto; o PDF é gerado pelo worker (manage.py processar_relatorios)."""
+    try:
+        d_inicio = datetime.strptime(request.data.get('data_inicio'), '%Y-%m-%d').date()
+        d_fim = datetime.strptime(request.data.get('data_fim'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return Response({'erro': 'Informe data_inicio e data_fim (AAAA-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+    if d_fim < d_inicio:
+        return Response({'erro': 'data_fim anterior a data_inicio.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    tarefa = relatorios.solicitar(request.user, d_inicio, d_fim)
+    codigo = status.HTTP_200_OK if tarefa.status == 'CONCLUIDO' else status.HTTP_202_ACCEPTED
+    return Response(TarefaRelatorioSerializer(tarefa).data, status=codigo)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def status_relatorio(request, pk):
+    tarefa = get_object_or_404(TarefaRelatorio, pk=pk, usuario=request.user)
+    return Response(TarefaRelatorioSerializer(tarefa).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def baixar_relatorio(request, pk):
+    tarefa = get_object_or_404(TarefaRelatorio, pk=pk, usuario=request.user)
+    if tarefa.status != 'CONCLUIDO':
+        return Response(TarefaRelatorioSerializer(tarefa).data, status=status.HTTP_409_CONFLICT)
+
+    filename = f"ponto_{request.user.username}_{tarefa.data_inicio}_{tarefa.data_fim}.pdf"
+    return FileResponse(default_storage.open(tarefa.arquivo, 'rb'), as_attachment=True,
+                        filename=filename, content_type='application/pdf')
+
+
+# --- HISTÓRICO DE BATIDAS (PAGINADO POR CURSOR) ---
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@usar_replica
+def listar_batidas(request):
+    """
+    Batidas do usuário em qualquer período, da mais recente para a mais antiga.
+    Parâmetros: data_inicio, data_fim (AAAA-MM-DD, opcionais), limite, cursor (devolvido em "proximo").
+    ADMIN pode passar usuario=<id> de um funcionário da empresa ou usuario=equipe para todos.
+    """
+    params = request.query_params
+    usuario = request.user
+    try:
+        limite = min(max(int(params.get('limite', LIMITE_PADRAO)), 1), LIMITE_MAXIMO)
+        d_inicio = datetime.strptime(params['data_inicio'], '%Y-%m-%d').date() if 'data_inicio' in params else None
+        d_fim = datetime.strptime(params['data_fim'], '%Y-%m-%d').date() if 'data_fim' in params else None
+    except ValueError:
+        return Response({'erro': 'Datas no formato AAAA-MM-DD e limite numérico.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    alvo = params.get('usuario')
+    registros = RegistroPonto.objects.select_related('usuario')
+    arquivado_ate = usuario.arquivado_ate
+    if alvo and alvo != str(usuario.pk):
+        if usuario.tipo != 'ADMIN' or not usuario.empresa_id:
+            return Response({'erro': 'Apenas administradores da empresa podem ver outros usuários.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        if alvo == 'equipe':
+            registros = registros.filter(usuario__empresa_id=usuario.empresa_id)
+            arquivado_ate = None
+        else:
+            funcionario = Usuario.objects.filter(pk=alvo, empresa_id=usuario.empresa_id).only('arquivado_ate').first() \
+                if _uuid_valido(alvo) else None
+            if funcionario is None:
+                return Response({'erro': 'Funcionário não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            registros = registros.filter(usuario=funcionario)
+            arquivado_ate = funcionario.arquivado_ate
+    else:
+        registros = registros.filter(usuario=usuario)
+
+    if d_inicio:
+        registros = registros.filter(data_local__gte=d_inicio)
+    if d_fim:
+        registros = registros.filter(data_local__lte=d_fim)
+
+    try:
+        pagina, proximo = paginar(registros, params.get('cursor'), limite)
+    except CursorInvalido:
+        return Response({'erro': 'Cursor inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'resultados': BatidaHistoricoSerializer(pagina, many=True).data,
+        'proximo': proximo,
+        # Meses anteriores foram para o arquivo compacto: disponíveis no espelho de ponto (PDF)
+        'arquivado_ate': arquivado_ate,
+    })
+
+
+def _uuid_valido(texto):
+    try:
+        uuid.UUID(texto)
+    except ValueError:
+        return False
+    return True
+
+
+# --- EXPORTAÇÃO AFD / CSV DA EMPRESA (ADMIN) ---
+@api_view(['GET'])
+@permission_classes([IsAdminEmpresa])
+def exportar_batidas(request):
+    """
+    Todas as batidas da empresa no período, em streaming.
+    Parâmetros: formato (afd | csv, padrão csv), data_inicio e data_fim (padrão: mês atual).
+    """
+    params = request.query_params
+    formato = params.get('formato', 'csv')
+    if formato not in exportacao.FORMATOS:
+        return Response({'erro': 'Formato deve ser afd ou csv.'}, status=status.HTTP_400_BAD_REQUEST)
+    hoje = timezone.localdate()
+    try:
+        d_inicio = datetime.strptime(params['data_inicio'], '%Y-%m-%d').date() \
+            if 'data_inicio' in params else hoje.replace(day=1)
+        d_fim = datetime.strptime(params['data_fim'], '%Y-%m-%d').date() if 'data_fim' in params else hoje
+    except ValueError:
+        return Response({'erro': 'Datas no formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    empresa = request.user.empresa
+    gerador, content_type, _, encoding = exportacao.FORMATOS[formato]
+    # Consumido depois que a view retorna: a réplica é ativada pedaço a pedaço
+    pedacos = iterar_na_replica(gerador(empresa, d_inicio, d_fim), request.user)
+    conteudo = (pedaco.encode(encoding, 'replace') for pedaco in metricas.cronometrar_gerador('exportacao', pedacos))
+    response = StreamingHttpResponse(conteudo, content_type=content_type)
+    response['Content-Disposition'] = \
+        f'attachment; filename="{exportacao.nome_arquivo(empresa, formato, d_inicio, d_fim)}"'
+    return response
+
+
+# --- ANOMALIAS DE PONTO DA EMPRESA (ADMIN) ---
+@api_view(['GET'])
+@permission_classes([IsAdminEmpresa])
+@usar_replica
+def relatorio_anomalias(request):
+    """
+    Anomalias gravadas pela varredura noturna (manage.py verificar_anomalias).
+    Parâmetros: data_inicio, data_fim (padrão: mês atual), tipo e usuario (opcionais).
+    """
+    params = request.query_params
+    hoje = timezone.localdate()
+    try:
+        d_inicio = datetime.strptime(params['data_inicio'], '%Y-%m-%d').date() \
+            if 'data_inicio' in params else hoje.replace(day=1)
+        d_fim = datetime.strptime(params['data_fim'], '%Y-%m-%d').date() if 'data_fim' in params else hoje
+    except ValueError:
+        return Response({'erro': 'Datas no formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    anomalias = Anomalia.objects.filter(
+        empresa_id=request.user.empresa_id, data__gte=d_inicio, data__lte=d_fim,
+    ).select_related('usuario').order_by('data', 'usuario__username', 'tipo')
+    if params.get('tipo'):
+        anomalias = anomalias.filter(tipo=params['tipo'])
+    if params.get('usuario'):
+        if not _uuid_valido(params['usuario']):
+            return Response({'erro': 'Usuário inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        anomalias = anomalias.filter(usuario_id=params['usuario'])
+
+    linhas = [{
+        'data': a.data,
+        'usuario': a.usuario_id,
+        'username': a.usuario.username,
+        'tipo': a.tipo,
+        'descricao': a.get_tipo_display(),
+        'detalhe': a.detalhe,
+    } for a in anomalias]
+    totais = {}
+    for linha in linhas:
+        totais[linha['tipo']] = totais.get(linha['tipo'], 0) + 1
+    return Response({'data_inicio': d_inicio, 'data_fim': d_fim, 'totais': totais, 'anomalias': linhas})
+
+
+# --- PAINEL DA EMPRESA (ADMIN) ---
+@api_view(['GET'])
+@permission_classes([IsAdminEmpresa])
+@usar_replica
+def painel_banco_horas(request):
+    """Saldo, faltas e horas trabalhadas de todos os funcionários da empresa no período (padrão: mês atual)."""
+    hoje = timezone.localdate()
+    try:
+        d_inicio = datetime.strptime(request.query_params['data_inicio'], '%Y-%m-%d').date() \
+            if 'data_inicio' in request.query_params else hoje.replace(day=1)
+        d_fim = datetime.strptime(request.query_params['data_fim'], '%Y-%m-%d').date() \
+            if 'data_fim' in request.query_params else hoje
+    except ValueError:
+        return Response({'erro': 'Datas no formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    linhas = painel.banco_horas_empresa(request.user.empresa_id, d_inicio, d_fim, hoje)
+    return Response({
+        'data_inicio': d_inicio,
+        'data_fim': d_fim,
+        'funcionarios': [{
+            'id': linha['usuario'].pk,
+            'username': linha['usuario'].username,
+            'nome': linha['usuario'].get_full_name(),
+            'horas_trabalhadas': formatar_minutos(linha['minutos_trabalhados'], sinal=False),
+            'saldo': formatar_minutos(linha['saldo_minutos']),
+            'saldo_minutos': linha['saldo_minutos'],
+            'faltas': linha['faltas'],
+        } for linha in linhas],
+    })
+
+
+# --- MÉTRICAS (PROMETHEUS) ---
+def metricas_prometheus(request):
+    """Métricas do processo no formato texto do Prometheus. Protegida por METRICAS_TOKEN, se definido."""
+    token = settings.METRICAS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
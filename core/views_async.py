@@ -0,0 +1,136 @@
+"""
+Versões assíncronas de StatusPontoView e RegistrarPontoView (modo ASGI, PONTO_ASGI=1).
+
+Rodam direto no event loop com a API assíncrona do ORM e do cache: uma requisição
+esperando o banco não prende uma thread do worker, então um processo atende centenas
+de batidas simultâneas no pico das 08:00. As respostas são iguais às das views do DRF.
+Veja config/asgi.py para o deploy.
+"""
+import base64
+import binascii
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate, get_user_model
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.authentication import CSRFCheck
+
+from . import geofence, status_dia, versoes
+from .autenticacao import aobter_token
+from .models import RegistroPonto
+from .roteador import leitura_replica
+from .serializers import RegistroPontoSerializer
+
+
+def _erro_autenticacao(mensagem, status=401):
+    response = JsonResponse({'detail': mensagem}, status=status)
+    if status == 401:
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+async def _autenticar_basic(request, partes):
+    """Como a BasicAuthentication do DRF (mesmas mensagens de erro)."""
+    if len(partes) == 1:
+        return None, _erro_autenticacao('Invalid basic header. No credentials provided.')
+    if len(partes) > 2:
+        return None, _erro_autenticacao('Invalid basic header. Credentials string should not contain spaces.')
+    try:
+        decodificado = base64.b64decode(partes[1])
+        try:
+            credenciais = decodificado.decode('utf-8')
+        except UnicodeDecodeError:
+            credenciais = decodificado.decode('latin-1')
+    except (TypeError, binascii.Error):
+        return None, _erro_autenticacao('Invalid basic header. Credentials not correctly base64 encoded.')
+    nome, _, senha = credenciais.partition(':')
+    usuario = await aauthenticate(request, **{get_user_model().USERNAME_FIELD: nome, 'password': senha})
+    if usuario is None:
+        return None, _erro_autenticacao('Invalid username/password.')
+    if not usuario.is_active:
+        return None, _erro_autenticacao('User inactive or deleted.')
+    return usuario, None
+
+
+async def autenticar(request):
+    """
+    Mesmas regras do DRF (TokenAuthentication, SessionAuthentication e BasicAuthentication,
+    nessa ordem), sem bloquear: retorna (usuario, None) ou (None, resposta de erro).
+    """
+    partes = request.headers.get('Authorization', '').split()
+    if partes and partes[0].lower() == 'token':
+        if len(partes) != 2:
+            return None, _erro_autenticacao('Invalid token header.')
+        token = await aobter_token(partes[1])
+        if token is None:
+            return None, _erro_autenticacao('Invalid token.')
+        if not token.user.is_active:
+            return None, _erro_autenticacao('User inactive or deleted.')
+        return token.user, None
+
+    usuario = await request.auser()
+    if not usuario.is_authenticated:
+        if partes and partes[0].lower() == 'basic':
+            return await _autenticar_basic(request, partes)
+        return None, _erro_autenticacao('Authentication credentials were not provided.')
+
+    # Sessão (navegador) exige CSRF, como na SessionAuthentication
+    verificacao = CSRFCheck(lambda req: None)
+    verificacao.process_request(request)
+    motivo = verificacao.process_view(request, None, (), {})
+    if motivo:
+        return None, _erro_autenticacao(f'CSRF Failed: {motivo}', status=403)
+    return usuario, None
+
+
+def _dados(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST
+
+
+@csrf_exempt
+@require_GET
+async def status_ponto(request):
+    usuario, erro = await autenticar(request)
+    if erro:
+        return erro
+    etag = await versoes.aetag(usuario, 'status')
+    nao_modificado = versoes.nao_modificado(request, etag)
+    if nao_modificado:
+        return nao_modificado
+    with await sync_to_async(leitura_replica)(usuario):
+        payload = await status_dia.aobter(usuario)
+    return versoes.aplicar(JsonResponse(payload), etag)
+
+
+@csrf_exempt
+@require_POST
+async def registrar_ponto(request):
+    usuario, erro = await autenticar(request)
+    if erro:
+        return erro
+    dados = _dados(request)
+
+    lat = dados.get('latitude')
+    long = dados.get('longitude')
+    # Índice geográfico vem do cache; só monta (queries) na primeira batida da empresa
+    localizacao_valida = await sync_to_async(geofence.localizacao_valida)(usuario, lat, long)
+
+    novo_ponto = await RegistroPonto.objects.acreate(
+        usuario=usuario,
+        tipo=dados.get('tipo'),
+        data_hora=timezone.now(),
+        latitude=lat,
+        longitude=long,
+        localizacao_valida=localizacao_valida,
+    )
+    await status_dia.aatualizar(usuario)
+
+    return JsonResponse(RegistroPontoSerializer(novo_ponto).data, status=201)